@@ -0,0 +1,41 @@
+"""
+Benchmark a cache miss for growing argument payloads, counting serializer (cloudpickle) invocations per call.
+
+    python benchmarks/bench_miss.py [--number 20]
+"""
+import argparse
+import time
+from unittest import mock
+
+import cloudpickle
+
+from deche import Cache
+
+
+def identity(payload):
+    return payload
+
+
+def run(number):
+    cache = Cache(fs_protocol="memory", prefix="/bench")
+    dump = cloudpickle.CloudPickler.dump
+    print(f"{'payload bytes':<16}{'dumps/miss':>12}{'dumps/hit':>12}{'ms/miss':>12}")
+    for size in (10, 10_000, 10_000_000):
+        cached = cache(identity)
+        with mock.patch.object(cloudpickle.CloudPickler, "dump", autospec=True, side_effect=dump) as mock_dump:
+            start = time.perf_counter()
+            for i in range(number):
+                cached(b"x" * size + str(i).encode())
+            elapsed = time.perf_counter() - start
+            misses = mock_dump.call_count / number
+            mock_dump.reset_mock()
+            cached(b"x" * size + b"0")
+            hits = mock_dump.call_count
+        print(f"{size:<16}{misses:>12.1f}{hits:>12.1f}{elapsed / number * 1e3:>12.2f}")
+        cache.fs.rm(cached.path(), recursive=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=20)
+    run(number=parser.parse_args().number)
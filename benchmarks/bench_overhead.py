@@ -0,0 +1,41 @@
+"""
+Micro-benchmark of the per-call overhead deche adds on a cache hit.
+
+    python benchmarks/bench_overhead.py [--number 10000]
+"""
+import argparse
+import timeit
+
+from deche import Cache
+from deche.inspection import args_kwargs_to_kwargs
+
+
+def add(a, b, c=1, **kwargs):
+    return a + b + c
+
+
+def run(number):
+    cache = Cache(fs_protocol="memory", prefix="/bench")
+    cached = cache(add)
+    cached_memory_tier = cache.replace(memory_tier_max_entries=1024)(add)
+    cached(1, 2, x=3)
+    cached_memory_tier(1, 2, x=3)
+
+    cases = {
+        "undecorated": lambda: add(1, 2, x=3),
+        "args_kwargs_to_kwargs": lambda: args_kwargs_to_kwargs(func=add, args=(1, 2), kwargs={"x": 3}),
+        "tokenize": lambda: cached.tokenize(1, 2, x=3),
+        "hit": lambda: cached(1, 2, x=3),
+        "hit (memory tier)": lambda: cached_memory_tier(1, 2, x=3),
+    }
+    baseline = None
+    for name, stmt in cases.items():
+        per_call_us = min(timeit.repeat(stmt, number=number, repeat=3)) / number * 1e6
+        baseline = per_call_us if baseline is None else baseline
+        print(f"{name:<24}{per_call_us:>10.2f} us/call{per_call_us - baseline:>12.2f} us overhead")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=10_000)
+    run(number=parser.parse_args().number)
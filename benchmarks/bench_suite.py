@@ -0,0 +1,249 @@
+"""
+Benchmark the decorator hot paths - cold miss, warm hit, exception hit and listing - across filesystems, sweeping
+argument, output and cache sizes, and report the per-call overhead versus the undecorated function as JSON.
+
+    python benchmarks/bench_suite.py --output results.json
+    python benchmarks/bench_suite.py --backends memory file --compare results.json    # exit 1 on a regression
+
+The `s3` backend runs against a local moto server, and needs `moto[server]` (a dev dependency) and `s3fs` (the `s3`
+extra, i.e. `poetry install -E s3`); it's skipped if they can't be imported.
+"""
+import argparse
+import contextlib
+import datetime
+import importlib
+import itertools
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+from deche import Cache
+from deche.inspection import args_kwargs_to_kwargs
+
+
+BACKENDS = ("memory", "file", "s3")
+# Modules a backend needs beyond deche's own dependencies
+BACKEND_REQUIREMENTS = {"s3": ("moto.server", "s3fs")}
+ARG_SIZES = (10, 10_000, 1_000_000)
+OUTPUT_SIZES = (10, 10_000, 1_000_000)
+CACHE_SIZES = (10, 100, 1000)
+
+# Cases that touch the filesystem run fewer times than the in-process ones
+IO_NUMBER_DIVISOR = 100
+
+
+def produce(payload, output_size):
+    return b"x" * output_size
+
+
+def fail(payload):
+    raise ValueError("benchmark")
+
+
+def missing_requirements(backend: str) -> list:
+    missing = []
+    for module in BACKEND_REQUIREMENTS.get(backend, ()):
+        try:
+            importlib.import_module(module)
+        except ImportError:
+            missing.append(module)
+    return missing
+
+
+@contextlib.contextmanager
+def backend_cache(backend: str):
+    """A Cache rooted in a fresh, empty location on `backend`"""
+    if backend == "memory":
+        prefix = f"/deche-bench/{uuid.uuid4().hex}"
+        cache = Cache(fs_protocol="memory", prefix=prefix)
+        try:
+            yield cache
+        finally:
+            cache.fs.rm(prefix, recursive=True)
+    elif backend == "file":
+        with tempfile.TemporaryDirectory(prefix="deche-bench-") as prefix:
+            yield Cache(fs_protocol="file", prefix=prefix)
+    elif backend == "s3":
+        from moto.server import ThreadedMotoServer
+
+        server = ThreadedMotoServer(ip_address="127.0.0.1", port=0)
+        server.start()
+        try:
+            host, port = server.get_host_and_port()
+            storage_options = {
+                "key": "bench",
+                "secret": "bench",
+                "client_kwargs": {"endpoint_url": f"http://{host}:{port}"},
+            }
+            cache = Cache(fs_protocol="s3", fs_storage_options=storage_options, prefix="deche-bench/cache")
+            cache.fs.mkdir("deche-bench")
+            yield cache
+        finally:
+            server.stop()
+    else:
+        raise ValueError(f"Unknown backend {backend!r}, expected one of {BACKENDS}")
+
+
+def per_call_us(timings: list, number: int) -> dict:
+    per_call = [t / number * 1e6 for t in timings]
+    return {"min_us": min(per_call), "median_us": statistics.median(per_call)}
+
+
+def time_repeated(stmt, number: int, repeat: int) -> dict:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            stmt()
+        timings.append(time.perf_counter() - start)
+    return per_call_us(timings, number)
+
+
+def time_each(stmt, args: list, repeat: int) -> dict:
+    """Time `stmt(arg)` once per arg, i.e. for cold misses that can't repeat the same arguments"""
+    timings = []
+    for chunk in range(repeat):
+        chunk_args = args[chunk::repeat]
+        start = time.perf_counter()
+        for arg in chunk_args:
+            stmt(arg)
+        timings.append((time.perf_counter() - start) / len(chunk_args))
+    return per_call_us(timings, 1)
+
+
+def raises(func, *args):
+    try:
+        func(*args)
+    except ValueError:
+        pass
+
+
+def bench_calls(cache: Cache, arg_size: int, output_size: int, number: int, repeat: int) -> list:
+    payload = b"a" * arg_size
+    io_number = max(number // IO_NUMBER_DIVISOR, 1)
+    cached = cache.replace(prefix=f"{cache.prefix}/calls-{arg_size}-{output_size}")(produce)
+    cached_fail = cache.replace(prefix=f"{cache.prefix}/fail-{arg_size}")(fail)
+    cached(payload, output_size)
+    raises(cached_fail, payload)
+    miss_payloads = [payload + str(i).encode() for i in range(io_number * repeat)]
+
+    cases = {
+        "undecorated": time_repeated(lambda: produce(payload, output_size), number, repeat),
+        "args_kwargs_to_kwargs": time_repeated(
+            lambda: args_kwargs_to_kwargs(func=produce, args=(payload, output_size), kwargs={}), number, repeat
+        ),
+        "tokenize": time_repeated(lambda: cached.tokenize(payload, output_size), number, repeat),
+        "cold_miss": time_each(lambda p: cached(p, output_size), miss_payloads, repeat),
+        "warm_hit": time_repeated(lambda: cached(payload, output_size), io_number, repeat),
+        "exception_hit": time_repeated(lambda: raises(cached_fail, payload), io_number, repeat),
+    }
+    baseline = cases["undecorated"]["min_us"]
+    return [
+        {
+            "case": case,
+            "arg_bytes": arg_size,
+            "output_bytes": output_size,
+            **timing,
+            "overhead_us": timing["min_us"] - baseline,
+        }
+        for case, timing in cases.items()
+    ]
+
+
+def bench_listing(cache: Cache, entries: int, repeat: int) -> list:
+    cached = cache.replace(prefix=f"{cache.prefix}/listing-{entries}")(produce)
+    for i in range(entries):
+        cached(str(i).encode(), 10)
+    cases = {
+        "list_cached_data": time_repeated(cached.list_cached_data, 1, repeat),
+        "list_cached_inputs": time_repeated(cached.list_cached_inputs, 1, repeat),
+    }
+    return [{"case": case, "entries": entries, **timing} for case, timing in cases.items()]
+
+
+def run(backends, arg_sizes, output_sizes, cache_sizes, number: int, repeat: int) -> dict:
+    results = []
+    for backend in backends:
+        missing = missing_requirements(backend)
+        if missing:
+            print(f"Skipping the {backend} backend, which needs {', '.join(missing)}", file=sys.stderr)
+            continue
+        with backend_cache(backend) as cache:
+            for arg_size, output_size in itertools.product(arg_sizes, output_sizes):
+                for result in bench_calls(cache, arg_size, output_size, number=number, repeat=repeat):
+                    results.append({"backend": backend, **result})
+                    print_result(results[-1])
+            for entries in cache_sizes:
+                for result in bench_listing(cache, entries, repeat=repeat):
+                    results.append({"backend": backend, **result})
+                    print_result(results[-1])
+    return {
+        "meta": {
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "number": number,
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def result_id(result: dict) -> tuple:
+    return tuple(result.get(k) for k in ("backend", "case", "arg_bytes", "output_bytes", "entries"))
+
+
+def print_result(result: dict):
+    name = " ".join(
+        f"{k}={v}" for k, v in zip(("backend", "case", "arg", "output", "entries"), result_id(result)) if v is not None
+    )
+    overhead = f"{result['overhead_us']:>12.2f} us overhead" if "overhead_us" in result else ""
+    print(f"{name:<64}{result['min_us']:>14.2f} us/call{overhead}", file=sys.stderr)
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list:
+    """Results whose best time is more than `threshold` times the baseline's"""
+    previous = {result_id(r): r for r in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        before = previous.get(result_id(result))
+        if before is not None and result["min_us"] > before["min_us"] * threshold:
+            regressions.append(
+                {**result, "baseline_min_us": before["min_us"], "ratio": result["min_us"] / before["min_us"]}
+            )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=["memory", "file"])
+    parser.add_argument("--arg-sizes", nargs="+", type=int, default=ARG_SIZES)
+    parser.add_argument("--output-sizes", nargs="+", type=int, default=OUTPUT_SIZES)
+    parser.add_argument("--cache-sizes", nargs="+", type=int, default=CACHE_SIZES)
+    parser.add_argument("--number", type=int, default=1000, help="Calls per timing for in-process cases")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="Write results as JSON to this path (default: stdout)")
+    parser.add_argument("--compare", help="Baseline results JSON; exit with status 1 on a regression")
+    parser.add_argument("--threshold", type=float, default=1.25, help="Slowdown ratio counted as a regression")
+    args = parser.parse_args(argv)
+
+    results = run(args.backends, args.arg_sizes, args.output_sizes, args.cache_sizes, args.number, args.repeat)
+    if args.compare:
+        with open(args.compare) as f:
+            results["regressions"] = compare(json.load(f), results, args.threshold)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+    for regression in results.get("regressions", []):
+        print(f"REGRESSION {result_id(regression)}: {regression['ratio']:.2f}x baseline", file=sys.stderr)
+    return 1 if results.get("regressions") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Optional
+
+from fsspec import AbstractFileSystem
+from fsspec.asyn import sync
+
+
+def is_async_fs(fs: AbstractFileSystem) -> bool:
+    return bool(getattr(fs, "async_impl", False))
+
+
+async def run_fs(fs: AbstractFileSystem, method: str, *args, **kwargs):
+    """
+    Run the fsspec operation `method` (i.e. "cat_file") without blocking the running event loop.
+
+    Async filesystems run their coroutine (`_cat_file`) directly - on their own IO loop unless they were created with
+    `asynchronous=True` - while sync filesystems are offloaded to the default thread pool.
+    """
+    if is_async_fs(fs):
+        coro = getattr(fs, f"_{method}")(*args, **kwargs)
+        if getattr(fs, "asynchronous", False):
+            return await coro
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, fs.loop))
+    return await run_in_thread(getattr(fs, method), *args, **kwargs)
+
+
+async def run_in_thread(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, functools.partial(func, *args, **kwargs))
+
+
+DEFAULT_BATCH_SIZE = 32
+
+
+def cat_many(fs: AbstractFileSystem, paths: list, max_workers: Optional[int] = None) -> list:
+    """
+    Fetch `paths` concurrently from sync code, returning the data (or the exception raised) for each path in order.
+    Async filesystems gather their `_cat_file` coroutines on the filesystem's IO loop, sync filesystems use threads.
+    """
+    if is_async_fs(fs):
+        return sync(fs.loop, _gather, [partial(fs._cat_file, path) for path in paths], max_workers)
+    return thread_map(fs.cat_file, paths, max_workers)
+
+
+def info_many(fs: AbstractFileSystem, paths: list, max_workers: Optional[int] = None) -> list:
+    """The `fs.info` of `paths` concurrently (see `cat_many`), or the exception raised (i.e. FileNotFoundError)"""
+    if is_async_fs(fs):
+        return sync(fs.loop, _gather, [partial(fs._info, path) for path in paths], max_workers)
+    return thread_map(fs.info, paths, max_workers)
+
+
+def pipe_many(fs: AbstractFileSystem, data: dict, max_workers: Optional[int] = None) -> None:
+    """Write the `{path: bytes}` in `data` concurrently (see `cat_many`), raising the first error encountered"""
+    if is_async_fs(fs):
+        results = sync(fs.loop, _gather, [partial(fs._pipe_file, p, value) for p, value in data.items()], max_workers)
+    else:
+        results = thread_map(lambda item: fs.pipe_file(*item), list(data.items()), max_workers)
+    for result in results:
+        if isinstance(result, Exception):
+            raise result
+
+
+async def _gather(funcs: list, max_workers: Optional[int] = None) -> list:
+    semaphore = asyncio.Semaphore(max_workers or DEFAULT_BATCH_SIZE)
+
+    async def run(func):
+        async with semaphore:
+            return await func()
+
+    return await asyncio.gather(*(run(func) for func in funcs), return_exceptions=True)
+
+
+def thread_map(func, items: list, max_workers: Optional[int] = None) -> list:
+    def run(item):
+        try:
+            return func(item)
+        except Exception as e:
+            return e
+
+    if len(items) <= 1:
+        return [run(item) for item in items]
+    with ThreadPoolExecutor(max_workers=max_workers or DEFAULT_BATCH_SIZE) as pool:
+        return list(pool.map(run, items))
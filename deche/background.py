@@ -0,0 +1,85 @@
+import logging
+import threading
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
+from typing import Optional
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_PENDING = 64
+
+_local = threading.local()
+
+
+class BackgroundWriter:
+    """
+    Runs writes on a pool of threads. `submit` blocks while `max_pending` writes are queued or running, so a producer
+    that outpaces the store is slowed down rather than buffering without bound.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, max_pending: int = DEFAULT_MAX_PENDING):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="deche-write")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._futures: set = set()
+        self._failed: set = set()
+
+    @property
+    def pending(self) -> int:
+        return len(self._futures)
+
+    def submit(self, fn, *args, **kwargs) -> Optional[Future]:
+        if getattr(_local, "writer", None) is self:
+            # A write submitting another (i.e. a tier's write-back) would deadlock waiting for a slot; run it inline
+            fn(*args, **kwargs)
+            return None
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(self._run, fn, *args, **kwargs)
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._futures.add(future)
+        future.add_done_callback(self._done)
+        return future
+
+    def _run(self, fn, *args, **kwargs):
+        _local.writer = self
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _local.writer = None
+
+    def _done(self, future: Future):
+        self._slots.release()
+        with self._lock:
+            self._futures.discard(future)
+            if future.exception() is not None:
+                self._failed.add(future)
+        if future.exception() is not None:
+            logger.warning(f"Background write failed: {future.exception()!r}")
+
+    def wait(self) -> list:
+        """Wait for every write submitted so far, returning their futures"""
+        with self._lock:
+            futures = list(self._futures)
+        wait(futures)
+        return futures
+
+    def flush(self):
+        """`wait`, raising the first write that failed since the last `flush`"""
+        futures = self.wait()
+        with self._lock:
+            failed = self._failed | {future for future in futures if future.exception() is not None}
+            self._failed = set()
+        for future in failed:
+            raise future.exception()
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self._executor.shutdown(wait=True)
@@ -0,0 +1,58 @@
+import contextlib
+import mmap
+import os
+import uuid
+from typing import Optional
+
+from fsspec import AbstractFileSystem
+from fsspec.implementations.local import LocalFileSystem
+from fsspec.implementations.memory import MemoryFileSystem
+
+
+TEMP_SUFFIX = ".tmp"
+
+
+def open_buffer(fs: AbstractFileSystem, path: str) -> Optional[memoryview]:
+    """
+    A read-only view of the whole file at `path` without copying it: local files are memory-mapped (so processes on
+    one host share a single page-cache copy) and memory filesystem files expose their underlying buffer.
+
+    Returns None if `fs` does not support this (or the file is empty and cannot be mapped), in which case callers
+    should fall back to reading the file.
+    """
+    if isinstance(fs, LocalFileSystem):
+        with open(fs._strip_protocol(path), mode="rb") as f:
+            try:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # Empty file
+                return None
+        return memoryview(mapped)
+    if isinstance(fs, MemoryFileSystem):
+        try:
+            f = fs.store[fs._strip_protocol(path)]
+        except KeyError:
+            raise FileNotFoundError(path)
+        return f.getbuffer().toreadonly()
+    return None
+
+
+@contextlib.contextmanager
+def open_replace(fs: AbstractFileSystem, path: str):
+    """
+    Open `path` for writing such that, for local files, a new file atomically replaces any existing one on close rather
+    than it being truncated in place - truncating a file that is memory-mapped elsewhere invalidates those mappings.
+    """
+    if not isinstance(fs, LocalFileSystem):
+        with fs.open(path, mode="wb") as f:
+            yield f
+        return
+    temp = f"{path}.{uuid.uuid4().hex}{TEMP_SUFFIX}"
+    try:
+        with fs.open(temp, mode="wb") as f:
+            yield f
+        os.replace(fs._strip_protocol(temp), fs._strip_protocol(path))
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            fs.rm(temp)
+        raise
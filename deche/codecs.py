@@ -0,0 +1,206 @@
+import contextlib
+import gzip
+from typing import IO, Optional, Union
+
+
+# Encoded payloads start with MAGIC and a one byte codec id, so readers can pick the decompressor (and tell them apart
+# from raw pickles, which start with b"\x80")
+MAGIC = b"\x00DCZ"
+HEADER_SIZE = len(MAGIC) + 1
+
+# Payloads larger than this are (de)serialized and (de)compressed on a worker thread by the async wrapper, and are
+# the default threshold for `deche.serializers.OffloadedSerializer`
+OFFLOAD_THRESHOLD = 1 << 20
+
+CODECS: dict = {}
+
+
+def register_codec(cls):
+    """Register a `Codec` subclass under its `id` and `name`"""
+    assert 0 < cls.id < 256, "Codec id must fit in a single byte"
+    CODECS[cls.id] = CODECS[cls.name] = cls
+    return cls
+
+
+class Codec:
+    """
+    A compression codec for cached payloads. Subclasses set a unique `name` and single byte `id` and implement
+    `compress`/`decompress` for bytes, plus `writer`/`reader` to (de)compress a file object as a stream. The two
+    must produce the same format, as either may be used to read a payload.
+    """
+
+    name: str = ""
+    id: int = 0
+
+    def compress(self, data: bytes) -> bytes:
+        raise NotImplementedError
+
+    def decompress(self, data: bytes) -> bytes:
+        raise NotImplementedError
+
+    def writer(self, f: IO[bytes]) -> IO[bytes]:
+        """A file object that compresses into `f`, and leaves it open when closed"""
+        raise NotImplementedError
+
+    def reader(self, f: IO[bytes]) -> IO[bytes]:
+        """A file object that decompresses from `f`, and leaves it open when closed"""
+        raise NotImplementedError
+
+    @property
+    def header(self) -> bytes:
+        return MAGIC + bytes([self.id])
+
+    def encode(self, data: bytes) -> bytes:
+        return self.header + self.compress(data)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.__dict__})"
+
+
+@register_codec
+class GzipCodec(Codec):
+    """gzip from the standard library; slower than zstd or lz4, but always available"""
+
+    name = "gzip"
+    id = 1
+
+    def __init__(self, level: int = 6):
+        self.level = level
+
+    def compress(self, data):
+        return gzip.compress(data, compresslevel=self.level, mtime=0)
+
+    def decompress(self, data):
+        return gzip.decompress(data)
+
+    def writer(self, f):
+        return gzip.GzipFile(fileobj=f, mode="wb", compresslevel=self.level, mtime=0)
+
+    def reader(self, f):
+        return gzip.GzipFile(fileobj=f, mode="rb")
+
+
+@register_codec
+class ZstdCodec(Codec):
+    """
+    Zstandard, optionally with a pre-trained `dictionary` (see `ZstdCodec.train`), which greatly improves the ratio
+    for many small payloads such as `.inputs` files. Payloads compressed with a dictionary can only be read by a Cache
+    configured with a codec holding the same dictionary. Requires `zstandard`.
+    """
+
+    name = "zstd"
+    id = 2
+
+    def __init__(self, level: int = 3, dictionary: Optional[bytes] = None, threads: int = 0):
+        self.level = level
+        self.dictionary = dictionary
+        self.threads = threads
+
+    @classmethod
+    def train(cls, samples: list[bytes], dict_size: int = 1 << 16, **kwargs) -> "ZstdCodec":
+        """A codec with a dictionary trained on `samples` (i.e. the contents of existing `.inputs` files)"""
+        import zstandard
+
+        return cls(dictionary=zstandard.train_dictionary(dict_size, samples).as_bytes(), **kwargs)
+
+    def _dict_data(self):
+        import zstandard
+
+        return zstandard.ZstdCompressionDict(self.dictionary) if self.dictionary is not None else None
+
+    def _compressor(self):
+        import zstandard
+
+        return zstandard.ZstdCompressor(level=self.level, dict_data=self._dict_data(), threads=self.threads)
+
+    def _decompressor(self):
+        import zstandard
+
+        return zstandard.ZstdDecompressor(dict_data=self._dict_data())
+
+    def compress(self, data):
+        return self._compressor().compress(data)
+
+    def decompress(self, data):
+        return self._decompressor().decompress(data)
+
+    def writer(self, f):
+        return self._compressor().stream_writer(f, closefd=False)
+
+    def reader(self, f):
+        return self._decompressor().stream_reader(f, closefd=False)
+
+
+@register_codec
+class Lz4Codec(Codec):
+    """LZ4 frames; the fastest to decompress, at a lower ratio. Requires `lz4`."""
+
+    name = "lz4"
+    id = 3
+
+    def __init__(self, level: int = 0):
+        self.level = level
+
+    def compress(self, data):
+        import lz4.frame
+
+        return lz4.frame.compress(data, compression_level=self.level)
+
+    def decompress(self, data):
+        import lz4.frame
+
+        return lz4.frame.decompress(data)
+
+    def writer(self, f):
+        import lz4.frame
+
+        return lz4.frame.LZ4FrameFile(f, mode="wb", compression_level=self.level)
+
+    def reader(self, f):
+        import lz4.frame
+
+        return lz4.frame.LZ4FrameFile(f, mode="rb")
+
+
+def get_codec(codec: Union[str, Codec, None]) -> Optional[Codec]:
+    """A codec instance from a codec or registered name, i.e. "zstd" """
+    if codec is None or isinstance(codec, Codec):
+        return codec
+    try:
+        return CODECS[codec]()
+    except KeyError:
+        raise ValueError(f"Unknown codec {codec!r}, expected one of {[k for k in CODECS if isinstance(k, str)]}")
+
+
+def is_encoded(data) -> bool:
+    return data[: len(MAGIC)] == MAGIC
+
+
+def _resolve(codec_id: int, codecs: tuple = ()) -> Codec:
+    # Prefer a configured instance, which may hold state needed to decompress (i.e. a zstd dictionary)
+    for codec in codecs:
+        if codec.id == codec_id:
+            return codec
+    try:
+        return CODECS[codec_id]()
+    except KeyError:
+        raise ValueError(f"Payload encoded with unknown codec id {codec_id}")
+
+
+def decode(data: bytes, codecs: tuple = ()) -> bytes:
+    """Decompress `data` if it was encoded by a codec, otherwise (i.e. entries written raw) return it unchanged"""
+    if not is_encoded(data):
+        return data
+    return _resolve(data[len(MAGIC)], codecs).decompress(data[HEADER_SIZE:])
+
+
+@contextlib.contextmanager
+def open_decoded(f: IO[bytes], codecs: tuple = ()):
+    """Wrap the open file `f` to decompress it if it was written by a codec, otherwise rewind and return it"""
+    head = f.read(HEADER_SIZE)
+    if not is_encoded(head):
+        f.seek(0)
+        yield f
+        return
+    with _resolve(head[len(MAGIC)], codecs).reader(f) as reader:
+        yield reader
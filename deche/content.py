@@ -0,0 +1,40 @@
+"""
+Content-addressed output storage (`Cache(content_addressed=True)`): each distinct output is stored once as a blob named
+by its SHA-256, under its function's `{directory}/.blobs/`, and every key stores a small pointer to it instead.
+
+Blobs are only removed by `deche.sweep.sweep` once no pointer refers to them; eviction (`store_max_bytes`) removes pointers
+and doesn't count blob sizes. A pointer whose blob is missing reads as a miss, and recomputing it rewrites the blob.
+"""
+import hashlib
+from typing import Optional
+
+
+BLOB_DIR = ".blobs"
+
+# Distinct from the codec header (see `deche.codecs.MAGIC`), and never the start of a pickle
+POINTER_MAGIC = b"\x00DCA"
+POINTER_SIZE = len(POINTER_MAGIC) + 64
+
+
+class DanglingPointer(FileNotFoundError):
+    """A pointer's blob doesn't exist (i.e. a sweep removed it), which lookups treat as a miss"""
+
+
+def content_digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def make_pointer(digest: str) -> bytes:
+    return POINTER_MAGIC + digest.encode()
+
+
+def pointer_digest(data) -> Optional[str]:
+    """The blob digest `data` points to, or None if `data` isn't a pointer"""
+    if len(data) != POINTER_SIZE or bytes(data[: len(POINTER_MAGIC)]) != POINTER_MAGIC:
+        return None
+    return bytes(data[len(POINTER_MAGIC) :]).decode()
+
+
+def blob_path(directory: str, digest: str) -> str:
+    """The path of the blob `digest` for the function directory `directory`"""
+    return f"{directory}/{BLOB_DIR}/{digest[:2]}/{digest}"
@@ -1,3 +1,5 @@
+import asyncio
+import atexit
 import datetime
 import functools
 import hashlib
@@ -5,8 +7,16 @@ import inspect
 import logging
 import pathlib
 import pickle
+import shutil
+import threading
 import time
+import weakref
 from collections.abc import Callable
+from collections.abc import Iterable
+from concurrent.futures import Executor
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import as_completed
 from dataclasses import dataclass
 from enum import Enum
 from functools import partial
@@ -16,14 +26,68 @@ import cloudpickle
 from fsspec import filesystem
 
 from deche import config
-from deche.inspection import args_kwargs_to_kwargs
+from deche.aio import DEFAULT_BATCH_SIZE
+from deche.aio import cat_many
+from deche.aio import info_many
+from deche.aio import is_async_fs
+from deche.aio import pipe_many
+from deche.aio import run_fs
+from deche.aio import run_in_thread
+from deche.aio import thread_map
+from deche.background import DEFAULT_MAX_PENDING
+from deche.background import BackgroundWriter
+from deche.buffers import TEMP_SUFFIX
+from deche.buffers import open_buffer
+from deche.buffers import open_replace
+from deche.codecs import OFFLOAD_THRESHOLD
+from deche.codecs import Codec
+from deche.codecs import decode
+from deche.codecs import get_codec
+from deche.codecs import is_encoded
+from deche.codecs import open_decoded
+from deche.content import DanglingPointer
+from deche.content import blob_path
+from deche.content import content_digest
+from deche.content import make_pointer
+from deche.content import pointer_digest
+from deche.eviction import POLICIES
+from deche.eviction import AccessLog
+from deche.eviction import Evictor
+from deche.eviction import collect_entries
+from deche.eviction import load_access
+from deche.eviction import select_victims
+from deche.hashing import StructuralHasher
+from deche.inspection import kwargs_binder
+from deche.locking import Lease
+from deche.locking import SingleFlight
+from deche.manifest import Kind
+from deche.manifest import Manifest
+from deche.manifest import match_summary
+from deche.manifest import match_value
+from deche.manifest import summarize_inputs
+from deche.memory import MISSING
+from deche.memory import ExceptionIndex
+from deche.memory import MemoryTier
+from deche.metrics import REGISTRY
+from deche.metrics import Exporter
+from deche.serializers import OffloadedSerializer
+from deche.serializers import StreamSerializer
+from deche.serializers import ZeroCopyPickleSerializer
+from deche.serializers import payload_nbytes
+from deche.tiers import Tier
+from deche.tiers import WritePolicy
+from deche.tiers import can_set_mtime
+from deche.tiers import set_mtime
 from deche.util import ValidationError
 from deche.util import ensure_path
 from deche.util import frozendict
+from deche.util import has_hidden_part
 from deche.util import identity
 from deche.util import is_class_instance
 from deche.util import is_input_filename
+from deche.util import modified_time
 from deche.util import not_cache_append_file
+from deche.util import shard_key
 from deche.util import wrapped_partial
 from deche.validators import exists
 from deche.validators import has_passed_cache_ttl
@@ -31,6 +95,23 @@ from deche.validators import has_passed_cache_ttl
 
 logger = logging.getLogger(__name__)
 
+# Caches that have written in the background, to drain before the interpreter exits
+# (as weak references; a Cache isn't hashable)
+_BACKGROUND_CACHES: list = []
+
+
+@atexit.register
+def _flush_background_writes():
+    for ref in _BACKGROUND_CACHES:
+        cache = ref()
+        if cache is None:
+            continue
+        try:
+            cache.flush()
+        except Exception as e:
+            logger.warning(f"Failed to flush background writes: {e!r}")
+
+
 DEFAULT_SERIALIZER = partial(cloudpickle.dumps, protocol=pickle.DEFAULT_PROTOCOL)
 DEFAULT_DESERIALIZER = partial(cloudpickle.loads)
 
@@ -41,11 +122,19 @@ def tokenize(obj: object, serializer: Callable = DEFAULT_SERIALIZER) -> tuple[st
     return key, value
 
 
-def tokenize_func(func, ignore=None, cls_attrs=None):
+def tokenize_key(obj: object) -> str:
+    """The default (sha256 of cloudpickle) key for `obj`"""
+    key, _ = tokenize(obj=obj)
+    return key
+
+
+def tokenize_func(func, ignore=None, cls_attrs=None, binder=None, hasher=None):
+    binder = binder or kwargs_binder(func)
+    hasher = hasher or tokenize_key
+
     def inner(*args, **kwargs):
-        full_kwargs = args_kwargs_to_kwargs(func=func, args=args, kwargs=kwargs)
-        key, value = tokenize(obj=prepare_full_kwargs(all_kwargs=full_kwargs, ignore=ignore, cls_attrs=cls_attrs))
-        return key
+        full_kwargs = binder(args, kwargs)
+        return hasher(prepare_full_kwargs(all_kwargs=full_kwargs, ignore=ignore, cls_attrs=cls_attrs))
 
     return inner
 
@@ -59,12 +148,25 @@ def prepare_full_kwargs(all_kwargs: dict, ignore=None, cls_attrs=None):
     return frozendict(all_kwargs)
 
 
+def _call_timed(func: Callable, kwargs: dict) -> tuple:
+    """Call `func`, returning its output and how long the call took (measured where it ran, not queue time)"""
+    start = time.perf_counter()
+    output = func(**kwargs)
+    return output, time.perf_counter() - start
+
+
+def _call_pickled(payload: bytes, kwargs: dict) -> tuple:
+    """`_call_timed` for a cloudpickled function, so that decorated functions can be run on a process pool"""
+    return _call_timed(cloudpickle.loads(payload), kwargs)
+
+
 DEFAULT_VALIDATORS = (exists,)
 
 
 class Extensions:
     inputs = ".inputs"
     exception = ".exc"
+    lock = ".lock"
 
 
 class CacheExpiryMode(Enum):
@@ -77,7 +179,24 @@ class CacheExpiryMode(Enum):
 
 
 def data_filter(f):
-    return not (f.endswith(Extensions.inputs) or f.endswith(Extensions.exception))
+    if f.rstrip("/").rsplit("/", 1)[-1].startswith("."):
+        # i.e. the manifest directory
+        return False
+    return not f.endswith((Extensions.inputs, Extensions.exception, Extensions.lock, TEMP_SUFFIX))
+
+
+EXTENSION_KINDS = {None: Kind.data, Extensions.inputs: Kind.inputs, Extensions.exception: Kind.exception}
+KIND_EXTENSIONS = {kind: ext for ext, kind in EXTENSION_KINDS.items() if ext is not None}
+
+
+def entry_kind(name: str) -> tuple[str, str]:
+    """The (key, manifest Kind) of the cache file `name`"""
+    for ext in (Extensions.inputs, Extensions.exception):
+        if name.endswith(ext):
+            return name[: -len(ext)], EXTENSION_KINDS[ext]
+    if not not_cache_append_file(name):
+        return name, Kind.append
+    return name, Kind.data
 
 
 @dataclass
@@ -89,6 +208,9 @@ class Cache:
     input_deserializer: Callable = DEFAULT_DESERIALIZER
     output_serializer: Callable = DEFAULT_SERIALIZER
     output_deserializer: Callable = DEFAULT_DESERIALIZER
+    output_stream_serializer: Optional[StreamSerializer] = None
+    input_codec: Optional[Union[str, Codec]] = None
+    output_codec: Optional[Union[str, Codec]] = None
     cache_ttl: Optional[Union[datetime.timedelta, datetime.datetime, int]] = None
     cache_expiry_mode: CacheExpiryMode = CacheExpiryMode.REMOVE
     cache_validators: tuple[Callable] = None
@@ -96,8 +218,36 @@ class Cache:
     cls_attrs: Optional[tuple[str]] = None
     path_callable: Optional[Callable[[Callable, dict], str]] = None
     result_validator: Optional[Callable[[Any], None]] = None
+    memory_tier_max_bytes: Optional[int] = None
+    memory_tier_max_entries: Optional[int] = None
+    key_hasher: Optional[Union[str, Callable[[Any], str]]] = None
+    optimistic_reads: bool = False
+    single_flight: bool = True
+    lease_ttl: Optional[float] = None
+    lease_poll_interval: float = 0.1
+    zero_copy_reads: bool = False
+    manifest: bool = False
+    manifest_reconcile_interval: Optional[float] = 3600.0
+    store_max_bytes: Optional[int] = None
+    store_max_entries: Optional[int] = None
+    eviction_policy: str = "lru"
+    eviction_interval: Optional[float] = 60.0
+    metrics: bool = True
+    metrics_exporter: Optional[Exporter] = None
+    shard_depth: int = 0
+    shard_width: int = 2
+    content_addressed: bool = False
+    cache_exceptions: bool = True
+    exception_ttl: Optional[float] = None
+    exception_index: bool = False
+    exception_index_refresh: Optional[float] = 60.0
+    tiers: Optional[list[Tier]] = None
+    tier_write_policy: WritePolicy = WritePolicy.THROUGH
+    write_behind: bool = False
+    write_behind_max_pending: int = DEFAULT_MAX_PENDING
+    write_behind_workers: Optional[int] = None
 
-    def __post_init__(self):
+    def __post_init__(self):  # noqa: C901
         self._fs = None
         if self.cache_validators is None:
             self.cache_validators = DEFAULT_VALIDATORS
@@ -115,7 +265,41 @@ class Cache:
                 f"consider using `deche.util.wrapper_partial`"
             )
             assert hasattr(validator, "__name__"), err
+        if self.zero_copy_reads and self.output_stream_serializer is None:
+            self.output_stream_serializer = ZeroCopyPickleSerializer()
+        self._input_codec = get_codec(self.input_codec)
+        self._output_codec = get_codec(self.output_codec)
+        self._codecs = tuple(codec for codec in (self._input_codec, self._output_codec) if codec is not None)
+        self._manifest = None
+        if self.manifest and self._fs is not None:
+            self._manifest = Manifest(
+                self._fs, scan=self._scan_directory, reconcile_interval=self.manifest_reconcile_interval
+            )
+        assert not (
+            self.content_addressed and self.output_stream_serializer is not None
+        ), "content_addressed needs the whole output to hash it, so can't be used with output_stream_serializer"
+        self._exception_index = None
+        if self.exception_index:
+            self._exception_index = ExceptionIndex(self._list_exception_keys, refresh=self.exception_index_refresh)
+        assert self.eviction_policy in POLICIES, f"eviction_policy must be one of {list(POLICIES)}"
+        self._access_log = None
+        if self.store_max_bytes is not None or self.store_max_entries is not None:
+            self._access_log = AccessLog()
+        self._evictor = None
         self._parents = set()
+        self._single_flight = SingleFlight()
+        self._key_hasher = self.key_hasher or tokenize_key
+        if isinstance(self.key_hasher, str):
+            self._key_hasher = StructuralHasher(algorithm=self.key_hasher)
+        self._memory_tier = None
+        if self.memory_tier_max_bytes is not None or self.memory_tier_max_entries is not None:
+            self._memory_tier = MemoryTier(
+                max_bytes=self.memory_tier_max_bytes, max_entries=self.memory_tier_max_entries
+            )
+        self._tiers = [self._tier_cache(tier) for tier in self.tiers or ()]
+        self._writer = None
+        self._writer_lock = threading.Lock()
+        self._in_flight = {}
 
     @property
     def fs(self):
@@ -147,63 +331,745 @@ class Cache:
         path = f"{func.__module__}.{func.__name__}"
         return f"{self.prefix}/{path}" if self.prefix is not None else path
 
-    def valid(self, path):
+    def _key_path(self, path: str, key: str) -> str:
+        """The path of `key` (optionally with an extension) under the function directory `path`"""
+        if not self.shard_depth:
+            return f"{path}/{key}"
+        return f"{path}/{shard_key(key, depth=self.shard_depth, width=self.shard_width)}"
+
+    def _split_key_path(self, full_path: str) -> tuple[str, str]:
+        """The (function directory, file name) of a path from `_key_path`"""
+        parts = full_path.rsplit("/", self.shard_depth + 1)
+        return parts[0], parts[-1]
+
+    def _tier_cache(self, tier: Tier) -> "Cache":
+        """A Cache over `tier`'s store, reading and writing exactly as this one does"""
+        return self.replace(
+            fs_protocol=tier.fs_protocol,
+            fs_storage_options=tier.fs_storage_options,
+            prefix=tier.prefix,
+            store_max_bytes=tier.max_bytes,
+            store_max_entries=tier.max_entries,
+            eviction_policy=tier.eviction_policy,
+            tiers=None,
+            memory_tier_max_bytes=None,
+            memory_tier_max_entries=None,
+            manifest=False,
+            metrics=False,
+            lease_ttl=None,
+            exception_index=False,
+        )
+
+    def _tier_path(self, tier: "Cache", path: str) -> str:
+        """Where `path` (under this cache's prefix) lives in `tier`"""
+        if self.prefix is not None and path.startswith(f"{self.prefix}/"):
+            path = path[len(self.prefix) + 1 :]
+        return f"{tier.prefix}/{path}"
+
+    def valid(self, path, info: Optional[dict] = None):
         validator = None
         try:
             for validator in self.cache_validators:
-                assert validator(fs=self.fs, path=path), "Validation not True"
+                if info is not None and hasattr(validator, "metadata"):
+                    assert validator(fs=self.fs, path=path, info=info), "Validation not True"
+                else:
+                    assert validator(fs=self.fs, path=path), "Validation not True"
             return True
         except Exception as e:
             logger.debug(f"{path} Validator:{validator.__name__} failed with Exception: {e}")
+            if validator is not exists:
+                self._count(path, "validator_failures")
             return False
 
+    def _count(self, path: str, metric: str, value: float = 1):
+        """Add to a counter of the function (directory) that `path` belongs to"""
+        if self.metrics:
+            function = self._split_key_path(path)[0]
+            REGISTRY.get(function).incr(metric, value)
+            if self.metrics_exporter is not None:
+                self.metrics_exporter(function, metric, value)
+
+    def _observe(self, path: str, metric: str, seconds: float):
+        """Observe a duration in a histogram of the function (directory) that `path` belongs to"""
+        if self.metrics:
+            function = self._split_key_path(path)[0]
+            REGISTRY.get(function).observe(metric, seconds)
+            if self.metrics_exporter is not None:
+                self.metrics_exporter(function, metric, seconds)
+
+    def _read_raw(self, path: str, data: bytes, start: float) -> bytes:
+        """Record a backend read of `data`, started at `start`, and decompress it"""
+        self._observe(path, "read_seconds", time.perf_counter() - start)
+        self._count(path, "bytes_read", len(data))
+        return self._decode(data)
+
     def read(self, path):
+        start = time.perf_counter()
         with self.fs.open(path, mode="rb") as f:
             logger.debug(f"{self.fs_protocol}://{path}")
-            return f.read()
+            return self._read_raw(path, f.read(), start)
+
+    def _encode(self, path: str, data: bytes) -> bytes:
+        codec = self._input_codec if is_input_filename(path) else self._output_codec
+        if codec is None or pointer_digest(data) is not None:
+            return data
+        return codec.encode(data)
+
+    def _decode(self, data: bytes) -> bytes:
+        """Decompress `data` if it was written with a codec; entries written uncompressed are returned as-is"""
+        return decode(data, self._codecs)
+
+    async def _aencode(self, path: str, data: bytes) -> bytes:
+        if len(data) > OFFLOAD_THRESHOLD:
+            return await run_in_thread(self._encode, path, data)
+        return self._encode(path, data)
+
+    async def _adecode(self, data: bytes) -> bytes:
+        if len(data) > OFFLOAD_THRESHOLD and is_encoded(data):
+            return await run_in_thread(self._decode, data)
+        return self._decode(data)
+
+    @property
+    def _validators_need_info(self) -> bool:
+        return any(getattr(validator, "metadata", None) for validator in self.cache_validators)
+
+    def read_with_info(self, path, info: bool = False) -> tuple[Optional[bytes], Optional[dict]]:
+        """
+        Optimistically fetch `path` (and its metadata if `info`) in as few requests as possible, returning
+        (None, None) if it does not exist.
+        """
+        start = time.perf_counter()
+        try:
+            if not info:
+                data = self.fs.cat_file(path)
+                details = {}
+            else:
+                with self.fs.open(path, mode="rb") as f:
+                    data = f.read()
+                    # Buffered (object store) files fetch their details when opened
+                    details = getattr(f, "details", None)
+                if details is None:
+                    details = self.fs.info(path)
+        except FileNotFoundError:
+            return None, None
+        logger.debug(f"{self.fs_protocol}://{path}")
+        return self._read_raw(path, data, start), details
 
     def read_input(self, path, deserializer=None):
         deserializer = deserializer or self.input_deserializer
         data = self.read(path=path)
-        return deserializer(data)
+        return self._deserialize(path, deserializer, data)
+
+    def _deserialize(self, path, deserializer, data: bytes):
+        digest = pointer_digest(data)
+        if digest is not None:
+            return self._load_blob(path, deserializer, digest)
+        start = time.perf_counter()
+        value = deserializer(data)
+        self._observe(path, "deserialize_seconds", time.perf_counter() - start)
+        return value
+
+    def _load_blob(self, path, deserializer, digest: str):
+        """Load the content-addressed output `path` points to, reading each blob once via the memory tier"""
+        blob = blob_path(self._split_key_path(path)[0], digest)
+        if self._memory_tier is not None:
+            value = self._memory_tier.get(blob)
+            if value is not MISSING:
+                return value
+        start = time.perf_counter()
+        try:
+            data = self._read_raw(path, self.fs.cat_file(blob), start)
+        except FileNotFoundError:
+            raise DanglingPointer(f"{path} points to {blob}, which doesn't exist")
+        value = self._deserialize(path, deserializer, data)
+        if self._memory_tier is not None:
+            self._memory_tier.put(blob, value, nbytes=len(data))
+        return value
 
     def read_output(self, path, deserializer=None):
+        if deserializer is None and self.output_stream_serializer is not None:
+            value, _ = self._read_output_stream(path=path)
+            return value
         deserializer = deserializer or self.output_deserializer
         data = self.read(path=path)
-        return deserializer(data)
+        return self._deserialize(path, deserializer, data)
+
+    def _read_output_stream(self, path) -> tuple[Any, int]:
+        """Load an output straight from the file, returning it along with the number of bytes read"""
+        start = time.perf_counter()
+        buffer = self._read_buffer(path=path)
+        if buffer is not None:
+            value, nbytes = self.output_stream_serializer.load_buffer(buffer), buffer.nbytes
+        else:
+            with self.fs.open(path, mode="rb") as f:
+                logger.debug(f"{self.fs_protocol}://{path}")
+                value, nbytes = self._load_stream(f), f.tell()
+        # Streaming interleaves reading and deserializing, so the time counts as deserialization
+        self._observe(path, "deserialize_seconds", time.perf_counter() - start)
+        self._count(path, "bytes_read", nbytes)
+        return value, nbytes
+
+    def _load_stream(self, f):
+        with open_decoded(f, self._codecs) as reader:
+            return self.output_stream_serializer.load(reader)
+
+    def _read_buffer(self, path) -> Optional[memoryview]:
+        """A zero-copy view of the file when `zero_copy_reads` is on and the filesystem supports it"""
+        if not self.zero_copy_reads:
+            return None
+        buffer = open_buffer(self.fs, path)
+        if buffer is not None:
+            logger.debug(f"{self.fs_protocol}://{path} (zero-copy)")
+            if is_encoded(buffer):
+                # Compressed payloads can't be mapped, so load from the decompressed copy
+                return memoryview(self._decode(buffer))
+        return buffer
+
+    def _open_write(self, path):
+        if self.zero_copy_reads:
+            # Never truncate a file in place while it may be mapped
+            return open_replace(self.fs, path)
+        return self.fs.open(path, mode="wb")
+
+    def _serialize_output(self, path, output) -> bytes:
+        serializer = self.output_serializer
+        if self.output_stream_serializer is not None:
+            serializer = self.output_stream_serializer.dumps
+        return self._serialize(path, serializer, output)
+
+    def _serialize(self, path, serializer, value) -> bytes:
+        start = time.perf_counter()
+        data = serializer(value)
+        self._observe(path, "serialize_seconds", time.perf_counter() - start)
+        return data
+
+    def _deserialize_output(self, path, data: bytes):
+        if self.output_stream_serializer is not None:
+            return self._deserialize(path, self.output_stream_serializer.loads, data)
+        return self._deserialize(path, self.output_deserializer, data)
 
     def write(self, path: str, data: bytes):
-        # Ensure parent exists
+        if self._tiers:
+            return self._write_tiered(path, "_write_store", data)
+        return self._write_store(path, data)
+
+    def _write_store(self, path: str, data: bytes):
+        self._ensure_parent(path)
+        if self._is_content_addressed(path):
+            blob, pointer = self._blob_of(path, data)
+            self._write_blob(path, blob, data)
+            data = pointer
+        data = self._encode(path, data)
+        for write_path in self._write_paths(path):
+            start = time.perf_counter()
+            with self._open_write(write_path) as f:
+                logger.debug(f"{self.fs_protocol}://{write_path}")
+                written = f.write(data)
+            self._observe(path, "write_seconds", time.perf_counter() - start)
+            self._count(path, "bytes_written", written)
+            self._manifest_add(write_path, size=written)
+        return written
+
+    def _write_tiered(self, path: str, method: str, *args):
+        """
+        Write `path` with `method` (i.e. "_write_store") to each tier, then to the store - straight away, or in the
+        background with `WritePolicy.BACK` - returning the number of bytes written.
+        """
+        written = 0
+        for tier in self._tiers:
+            tier_path = self._tier_path(tier, path)
+            try:
+                written = self._write_tier(tier, method, tier_path, *args)
+            except Exception as e:
+                # The store is authoritative, so a tier failing to write only costs a later miss
+                logger.warning(f"Failed to write {tier_path}: {e!r}")
+                continue
+            if not path.endswith((Extensions.inputs, Extensions.exception)):
+                tier._record_compute(tier_path, 0.0)
+        if self.tier_write_policy is WritePolicy.BACK:
+            self._background_writer().submit(getattr(self, method), path, *args)
+            return written
+        return getattr(self, method)(path, *args)
+
+    @staticmethod
+    def _write_tier(tier: "Cache", method: str, tier_path: str, *args):
+        try:
+            return getattr(tier, method)(tier_path, *args)
+        except FileNotFoundError:
+            # Directories were removed from under the tier (i.e. a local disk was cleared); recreate them
+            tier._parents.clear()
+            return getattr(tier, method)(tier_path, *args)
+
+    def _background_writer(self) -> BackgroundWriter:
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = BackgroundWriter(
+                    max_workers=self.write_behind_workers, max_pending=self.write_behind_max_pending
+                )
+                _BACKGROUND_CACHES.append(weakref.ref(self))
+        return self._writer
+
+    def flush(self):
+        """
+        Wait for writes running in the background (see `write_behind` and `tier_write_policy`), raising the first
+        that failed since the last flush
+        """
+        if self._writer is not None:
+            self._writer.flush()
+        self._manifest_flush()
+
+    def close(self):
+        """`flush`, then stop the background writer's threads (a later background write starts new ones)"""
+        with self._writer_lock:
+            writer, self._writer = self._writer, None
+        if writer is not None:
+            writer.close()
+        self._manifest_flush()
+
+    def _is_content_addressed(self, path: str) -> bool:
+        return self.content_addressed and not path.endswith((Extensions.inputs, Extensions.exception))
+
+    def _blob_of(self, path: str, data: bytes) -> tuple[str, bytes]:
+        """
+        The blob path to store output `data` written to `path` under its content hash, and the pointer to write to
+        `path` itself.
+        """
+        digest = content_digest(data)
+        return blob_path(self._split_key_path(path)[0], digest), make_pointer(digest)
+
+    def _write_blob(self, path: str, blob: str, data: bytes):
+        # Always check the store: blobs may have been removed since (i.e. by a sweep), by this or any other process
+        self.fs.invalidate_cache(blob)
+        if not self.fs.exists(blob):
+            self._ensure_parent(blob)
+            start = time.perf_counter()
+            with self._open_write(blob) as f:
+                written = f.write(self._encode(path, data))
+            self._observe(path, "write_seconds", time.perf_counter() - start)
+            self._count(path, "bytes_written", written)
+
+    async def _awrite_blob(self, path: str, blob: str, data: bytes):
+        if not await run_fs(self.fs, "exists", blob):
+            encoded = await self._aencode(path, data)
+            start = time.perf_counter()
+            await run_fs(self.fs, "pipe_file", blob, encoded)
+            self._observe(path, "write_seconds", time.perf_counter() - start)
+            self._count(path, "bytes_written", len(encoded))
+
+    def _ensure_parent(self, path: str):
         parent = str(pathlib.Path(path).parent)
         if parent not in self._parents:
             if not self.fs.exists(parent):
-                self.fs.mkdir(parent)
+                try:
+                    self.fs.mkdir(parent)
+                except FileExistsError:
+                    # Created concurrently
+                    pass
             self._parents.add(parent)
 
+    def write_many(self, data: dict, max_workers: Optional[int] = None):
+        """Write the `{path: bytes}` in `data` concurrently"""
+        if is_async_fs(self.fs) and not self._tiers:
+            if self.content_addressed:
+                data = self._write_blobs(data, max_workers)
+            encoded = {p: self._encode(path, value) for path, value in data.items() for p in self._write_paths(path)}
+            pipe_many(self.fs, encoded, max_workers)
+            for p, value in encoded.items():
+                self._count(p, "bytes_written", len(value))
+                self._manifest_add(p, size=len(value))
+            return
+        for result in thread_map(lambda item: self.write(*item), list(data.items()), max_workers):
+            if isinstance(result, Exception):
+                raise result
+
+    def _write_blobs(self, data: dict, max_workers: Optional[int] = None) -> dict:
+        """Store the outputs in `data` as blobs with batched requests, returning `data` with pointers in their place"""
+        blobs, pointers = {}, {}
+        for path, value in data.items():
+            if not self._is_content_addressed(path):
+                pointers[path] = value
+                continue
+            blob, pointers[path] = self._blob_of(path, value)
+            blobs[blob] = (path, value)
+        encoded = {}
+        for (blob, (path, value)), info in zip(blobs.items(), info_many(self.fs, list(blobs), max_workers)):
+            if isinstance(info, Exception) and not isinstance(info, FileNotFoundError):
+                raise info
+            if isinstance(info, FileNotFoundError):
+                encoded[blob] = (path, self._encode(path, value))
+        pipe_many(self.fs, {blob: value for blob, (_, value) in encoded.items()}, max_workers)
+        for path, value in encoded.values():
+            self._count(path, "bytes_written", len(value))
+        return pointers
+
+    def read_many(self, paths: list, max_workers: Optional[int] = None) -> list[Optional[bytes]]:
+        """Fetch `paths` concurrently, returning None for any that do not exist"""
+        results = cat_many(self.fs, paths, max_workers)
+        datas = []
+        for path, result in zip(paths, results):
+            if isinstance(result, Exception) and not isinstance(result, FileNotFoundError):
+                raise result
+            if isinstance(result, Exception):
+                datas.append(None)
+                continue
+            self._count(path, "bytes_read", len(result))
+            datas.append(self._decode(result))
+        return datas
+
+    def _list_directory(self, path) -> dict:
+        """The `{name: info}` of everything directly under `path`, from a single listing (or the manifest)"""
+        if self._manifest is not None:
+            return {
+                f"{key}{KIND_EXTENSIONS.get(kind, '')}": {
+                    "name": self._key_path(path, f"{key}{KIND_EXTENSIONS.get(kind, '')}"),
+                    "size": record.get("size"),
+                    "mtime": record["mtime"],
+                    "type": "file",
+                }
+                for (key, kind), record in self._manifest.entries(path).items()
+            }
+        self.fs.invalidate_cache(path)
+        try:
+            listing = self.fs.ls(path, detail=True)
+        except FileNotFoundError:
+            return {}
+        return {info["name"].rstrip("/").rsplit("/", 1)[-1]: info for info in listing}
+
+    def _scan_directory(self, directory: str) -> dict:
+        """The `{(key, manifest Kind): {"size", "mtime"}}` of the entries actually in `directory`, from a listing"""
+        self.fs.invalidate_cache(directory)
+        found = {}
+        for name, info in self.fs.glob(f"{directory}/{'*/' * self.shard_depth}*", detail=True).items():
+            relative = "/".join(name.rstrip("/").split("/")[-(self.shard_depth + 1) :])
+            if info["type"] != "file" or has_hidden_part(relative) or relative.endswith((Extensions.lock, TEMP_SUFFIX)):
+                continue
+            found[entry_kind(relative.rsplit("/", 1)[-1])] = {"size": info.get("size"), "mtime": modified_time(info)}
+        return found
+
+    def _manifest_stale(self, full_path: str):
+        """Record the removal of an entry the manifest lists, but which turned out not to exist"""
+        if self._manifest is not None:
+            directory, name = self._split_key_path(full_path)
+            self._manifest.remove(directory, *entry_kind(name))
+
+    def _listed_in(self, full_path: str) -> tuple[str, str]:
+        """The directory to `_list_directory` to find `full_path`, and its name in that listing"""
+        if self._manifest is not None:
+            # The manifest covers the whole function directory
+            return self._split_key_path(full_path)
+        directory, _, name = full_path.rpartition("/")
+        return directory, name
+
+    def _listed_exception(self, listing: dict, key: str) -> bool:
+        """Whether `listing` (from `_list_directory`) has an unexpired exception for `key`"""
+        info = listing.get(f"{key}{Extensions.exception}")
+        return info is not None and self.cache_exceptions and not self._exception_expired(info)
+
+    def _write_paths(self, path: str) -> list[str]:
         # If cache_ttl append, write a timestamped file.
         if self.cache_ttl and self.cache_expiry_mode == CacheExpiryMode.APPEND and not is_input_filename(path):
             ts_us = int(time.time() * 1e6)
-            with self.fs.open(f"{path}-{ts_us}", mode="wb") as f:
-                logger.debug(f"{self.fs_protocol}://{path}-{ts_us}")
-                f.write(data)
-
-        with self.fs.open(path, mode="wb") as f:
-            logger.debug(f"{self.fs_protocol}://{path}")
-            return f.write(data)
+            return [f"{path}-{ts_us}", path]
+        return [path]
 
-    def write_input(self, path, inputs, input_serializer=None):
-        key, input_value = tokenize(obj=inputs, serializer=input_serializer or self.input_serializer)
-        self.write(path=f"{path}{Extensions.inputs}", data=input_value)
+    def write_input(self, path, inputs, input_serializer=None, data: Optional[bytes] = None):
+        """Write `inputs`, reusing `data` if they have already been serialized (i.e. while computing the key)"""
+        if data is None:
+            data = self._serialize(path, input_serializer or self.input_serializer, inputs)
+        self.write(path=f"{path}{Extensions.inputs}", data=data)
+        self._manifest_add(f"{path}{Extensions.inputs}", inputs=inputs)
 
     def write_output(self, path, output, output_serializer=None):
-        content_hash, output_value = tokenize(obj=output, serializer=output_serializer or self.output_serializer)
+        if output_serializer is None and self.output_stream_serializer is not None:
+            if self._tiers:
+                return self._write_tiered(path, "_write_output_stream", output)
+            return self._write_output_stream(path=path, output=output)
+        output_value = self._serialize(path, output_serializer or self.output_serializer, output)
         self.write(path=path, data=output_value)
+        return len(output_value)
+
+    def _write_output_stream(self, path, output) -> int:
+        """Serialize an output straight into the file, returning the number of bytes written"""
+        self._ensure_parent(path)
+        first, *others = self._write_paths(path)
+        start = time.perf_counter()
+        with self._open_write(first) as f:
+            logger.debug(f"{self.fs_protocol}://{first}")
+            if self._output_codec is None:
+                self.output_stream_serializer.dump(output, f)
+            else:
+                f.write(self._output_codec.header)
+                with self._output_codec.writer(f) as writer:
+                    self.output_stream_serializer.dump(output, writer)
+            nbytes = f.tell()
+        # Streaming interleaves serializing and writing, so the time counts as serialization
+        self._observe(path, "serialize_seconds", time.perf_counter() - start)
+        self._count(path, "bytes_written", nbytes * (1 + len(others)))
+        self._manifest_add(first, size=nbytes)
+        for other in others:
+            if self.zero_copy_reads:
+                with self.fs.open(first, mode="rb") as src, self._open_write(other) as dst:
+                    shutil.copyfileobj(src, dst)
+            else:
+                self.fs.copy(first, other)
+            self._manifest_add(other, size=nbytes)
+        return nbytes
+
+    async def _aread(self, path) -> Optional[bytes]:
+        """Read `path` without blocking the event loop, returning None if it does not exist"""
+        start = time.perf_counter()
+        try:
+            data = await run_fs(self.fs, "cat_file", path)
+        except FileNotFoundError:
+            return None
+        logger.debug(f"{self.fs_protocol}://{path}")
+        self._observe(path, "read_seconds", time.perf_counter() - start)
+        self._count(path, "bytes_read", len(data))
+        return await self._adecode(data)
+
+    async def _aread_with_info(self, path, info: Optional[bool] = None) -> tuple[Optional[bytes], Optional[dict]]:
+        """Read `path` and, if `info` (by default, if the validators need it), its metadata"""
+        if not (self._validators_need_info if info is None else info):
+            return await self._aread(path=path), {}
+        data, info = await asyncio.gather(self._aread(path=path), run_fs(self.fs, "info", path), return_exceptions=True)
+        if data is None or isinstance(info, FileNotFoundError):
+            return None, None
+        for result in (data, info):
+            if isinstance(result, BaseException):
+                raise result
+        return data, info
+
+    def _load_data(self, path, data: bytes, ext=None, info: Optional[dict] = None, value=MISSING):
+        """Deserialize `data` already read from `path` (unless given its `value`), storing it in the memory tier"""
+        if value is MISSING:
+            value = self._deserialize_output(f"{path}{ext or ''}", data)
+        if self._memory_tier is not None:
+            expires_at = self._memory_tier_expiry(path=path, info=info, ext=ext)
+            self._memory_tier.put(f"{path}{ext or ''}", value, nbytes=len(data), expires_at=expires_at)
+        return value
+
+    async def _aload(self, path, data: bytes, ext=None, info: Optional[dict] = None):
+        if pointer_digest(data) is not None:
+            # Fetching the blob blocks
+            return await run_in_thread(self._load_data, path=path, data=data, ext=ext, info=info)
+        if self._memory_tier is not None and info is None and isinstance(self._ttl(ext), (int, float)):
+            info = await run_fs(self.fs, "info", f"{path}{ext or ''}")
+        if self.output_stream_serializer is None and isinstance(self.output_deserializer, OffloadedSerializer):
+            value = await self._aserialize(f"{path}{ext or ''}", "deserialize_seconds", self.output_deserializer, data)
+            return self._load_data(path=path, data=data, ext=ext, info=info, value=value)
+        if len(data) > OFFLOAD_THRESHOLD:
+            return await run_in_thread(self._load_data, path=path, data=data, ext=ext, info=info)
+        return self._load_data(path=path, data=data, ext=ext, info=info)
+
+    async def _awrite(self, path: str, data: bytes):
+        if not is_async_fs(self.fs) or self._tiers:
+            return await run_in_thread(self.write, path=path, data=data)
+        if self._is_content_addressed(path):
+            blob, pointer = self._blob_of(path, data)
+            await self._awrite_blob(path, blob, data)
+            data = pointer
+        encoded = await self._aencode(path, data)
+        write_paths = self._write_paths(path)
+        start = time.perf_counter()
+        await asyncio.gather(*(run_fs(self.fs, "pipe_file", p, encoded) for p in write_paths))
+        logger.debug(f"{self.fs_protocol}://{path}")
+        self._observe(path, "write_seconds", time.perf_counter() - start)
+        self._count(path, "bytes_written", len(encoded) * len(write_paths))
+        for p in write_paths:
+            self._manifest_add(p, size=len(encoded))
+        return len(data)
+
+    async def _awrite_input(self, path, inputs, data: Optional[bytes] = None):
+        if data is None:
+            data = self._serialize(path, self.input_serializer, inputs)
+        await self._awrite(path=f"{path}{Extensions.inputs}", data=data)
+        self._manifest_add(f"{path}{Extensions.inputs}", inputs=inputs)
+
+    async def _awrite_output(self, path, output):
+        if self.output_stream_serializer is not None:
+            return await run_in_thread(self.write_output, path=path, output=output)
+        if isinstance(self.output_serializer, OffloadedSerializer):
+            output_value = await self._aserialize(path, "serialize_seconds", self.output_serializer, output)
+        elif payload_nbytes(output) > OFFLOAD_THRESHOLD:
+            output_value = await run_in_thread(self._serialize_output, path, output)
+        else:
+            output_value = self._serialize_output(path, output)
+        await self._awrite(path=path, data=output_value)
+        return len(output_value)
+
+    async def _aserialize(self, path, metric: str, serializer: OffloadedSerializer, value):
+        """Run an offloaded (de)serializer, awaiting its executor rather than blocking a thread on it"""
+        start = time.perf_counter()
+        result = await serializer.acall(value)
+        self._observe(path, metric, time.perf_counter() - start)
+        return result
+
+    def _tokenize_inputs(self, inputs) -> tuple[str, Optional[bytes]]:
+        """The key for `inputs`, along with their serialized value when computing the key already produced it"""
+        if self.key_hasher is None and self.input_serializer is DEFAULT_SERIALIZER:
+            return tokenize(obj=inputs)
+        return self._key_hasher(inputs), None
+
+    def _ttl(self, ext=None):
+        """The TTL of cached outputs (`ext=None`) or exceptions"""
+        if ext == Extensions.exception:
+            return self.exception_ttl
+        return self.cache_ttl if ext is None else None
+
+    def _memory_tier_expiry(self, path=None, info: Optional[dict] = None, ext=None) -> Optional[float]:
+        """
+        The epoch time after which an in-memory copy of `path` (an output, or a file with extension `ext`) is stale,
+        mirroring `has_passed_cache_ttl`. When `path` is None the entry is assumed to have just been written.
+        """
+        ttl = self._ttl(ext)
+        if ttl is None:
+            return None
+        if isinstance(ttl, datetime.datetime):
+            return None if datetime.datetime.now() > ttl else time.time()
+        if path is None:
+            mtime = time.time()
+        else:
+            mtime = modified_time(info if info else self.fs.info(f"{path}{ext or ''}"))
+        return mtime + ttl
+
+    def _exception_expired(self, info: dict) -> bool:
+        return self.exception_ttl is not None and time.time() - modified_time(info) > self.exception_ttl
+
+    def _list_exception_keys(self, directory: str) -> Iterable[str]:
+        if self._manifest is not None:
+            return self._manifest.entries(directory, kind=Kind.exception)
+        self.fs.invalidate_cache(directory)
+        pattern = f"{directory}/{'*/' * self.shard_depth}*{Extensions.exception}"
+        return [name.rsplit("/", 1)[-1][: -len(Extensions.exception)] for name in self.fs.glob(pattern)]
+
+    def _might_have_exception(self, path) -> bool:
+        """Whether `path` may have a cached exception - without any I/O if the exception index rules it out"""
+        if not self.cache_exceptions:
+            return False
+        if self._exception_index is None:
+            return True
+        return self._exception_index.might_contain(*self._split_key_path(path))
+
+    def _has_exception(self, path) -> bool:
+        """Whether `path` has a cached exception that hasn't passed `exception_ttl`"""
+        if not self._might_have_exception(path):
+            return False
+        if self.exception_ttl is None:
+            return self.fs.exists(path=f"{path}{Extensions.exception}")
+        try:
+            return not self._exception_expired(self.fs.info(f"{path}{Extensions.exception}"))
+        except FileNotFoundError:
+            return False
+
+    def _cache_exception(self, path, e: Exception, nbytes: int):
+        """Record an exception (already written to the store, taking `nbytes`) in the memory tier and index"""
+        expires_at = self._memory_tier_expiry(ext=Extensions.exception)
+        self._memory_tier_put(path=f"{path}{Extensions.exception}", value=e, nbytes=nbytes, expires_at=expires_at)
+        if self._exception_index is not None:
+            self._exception_index.add(*self._split_key_path(path))
+
+    def _memory_tier_lookup(self, path):
+        """
+        Return the value for `path` from the memory tier (or MISSING), raising any cached exception. Results still
+        being written in the background (`write_behind`) are found here too.
+        """
+        if self._in_flight:
+            found = self._in_flight.get(path)
+            if found is not None:
+                self._count(path, "memory_hits")
+                is_exception, value = found
+                if is_exception:
+                    raise value.with_traceback(None)
+                return value
+        if self._memory_tier is None:
+            return MISSING
+        value = self._memory_tier.get(path)
+        if value is not MISSING:
+            self._count(path, "memory_hits")
+            return value
+        exc = self._memory_tier.get(f"{path}{Extensions.exception}")
+        if exc is not MISSING:
+            self._count(path, "memory_hits")
+            raise exc.with_traceback(None)
+        return MISSING
+
+    def _validate_result(self, output):
+        if self.result_validator is not None:
+            logger.debug(f"Validating result with {self.result_validator}")
+            try:
+                assert self.result_validator(output) is not False
+            except Exception as e:
+                raise ValidationError(e)
+
+    def _memory_tier_put(self, path, value, nbytes, expires_at=None):
+        if self._memory_tier is not None:
+            self._memory_tier.put(path, value, nbytes=nbytes, expires_at=expires_at)
+
+    def _manifest_add(self, path: str, inputs=None, **fields):
+        if self._manifest is None:
+            return
+        directory, name = self._split_key_path(path)
+        key, kind = entry_kind(name)
+        if inputs is not None:
+            fields["inputs"] = summarize_inputs(inputs)
+        self._manifest.add(directory, key, kind, **fields)
+
+    def _manifest_flush(self):
+        if self._manifest is not None:
+            self._manifest.flush()
+
+    def _record_hit(self, path):
+        if self.metrics:
+            function = self._split_key_path(path)[0]
+            saved = REGISTRY.get(function).hit()
+            if self.metrics_exporter is not None:
+                self.metrics_exporter(function, "hits", 1)
+                self.metrics_exporter(function, "compute_seconds_saved", saved)
+        if self._access_log is not None:
+            self._access_log.hit(path)
+
+    def _record_compute(self, path, seconds: float):
+        self._observe(path, "compute_seconds", seconds)
+        if self._access_log is None:
+            return
+        self._access_log.computed(path, seconds)
+        if self.eviction_interval and (self._evictor is None or not self._evictor.is_alive()):
+            self._evictor = Evictor(self, interval=self.eviction_interval)
+            self._evictor.start()
+
+    def evict(self, dry_run: bool = False) -> list:
+        """
+        Evict the coldest entries (by `eviction_policy`) under `prefix` until the store is back below its
+        `store_max_bytes` / `store_max_entries` limits, returning the paths of the evicted calls. Runs in the
+        background every `eviction_interval` seconds once a call has been computed.
+
+        With `content_addressed=True` the limits count pointers, not the blobs they share: evicting a call leaves its
+        blob for `deche.sweep.sweep` to collect once orphaned, so run sweeps to bound the store's size.
+        """
+        if self._access_log is None or self.prefix is None:
+            return []
+        self._access_log.flush(self.fs, self.prefix)
+        entries = collect_entries(
+            self.fs, self.prefix, key_of=lambda name: entry_kind(name)[0], ignore=(Extensions.lock, TEMP_SUFFIX)
+        )
+        victims = select_victims(
+            entries,
+            load_access(self.fs, self.prefix),
+            policy=self.eviction_policy,
+            max_bytes=self.store_max_bytes,
+            max_entries=self.store_max_entries,
+        )
+        if victims and not dry_run:
+            logger.debug(f"Evicting {len(victims)} entries under {self.prefix}")
+            self._remove_paths([name for entry in victims for name in entry.files])
+            self._access_log.forget([entry.path for entry in victims])
+        return [entry.path for entry in victims]
 
     def is_valid(self, func):
         def inner(*args, **kwargs):
             path = self._path(func)
             key = func.tokenize(*args, **kwargs)
-            return self.valid(path=f"{path}/{key}")
+            return self.valid(path=self._key_path(path, key))
 
         return inner
 
@@ -213,15 +1079,31 @@ class Cache:
             path = self._path(func)
             if key is None:
                 key = func.tokenize(**kwargs)
-            return self.fs.exists(path=f"{path}/{key}{ext or ''}")
+            full_path = self._key_path(path, f"{key}{ext or ''}")
+            if self._manifest is not None:
+                if key not in self._manifest.entries(path, kind=EXTENSION_KINDS[ext]):
+                    return False
+                # Confirm it, in case it was removed by something that doesn't record removals
+                if not self.fs.exists(path=full_path):
+                    self._manifest_stale(full_path)
+                    self._manifest_flush()
+                    return False
+                return True
+            return self.fs.exists(path=full_path)
 
         return inner
 
     def _iter(self, func, ext=None, filter_=identity):
         def inner(key_only=True):
             path = self._path(func)
-            glob = self.fs.glob(f"{path}/*{ext or ''}")
-            iterator = filter(not_cache_append_file, glob)
+            if self._manifest is not None:
+                for key in sorted(self._manifest.entries(path, kind=EXTENSION_KINDS[ext])):
+                    yield key if key_only else self._key_path(path, f"{key}{ext or ''}")
+                return
+            glob = self.fs.glob(f"{path}/{'*/' * self.shard_depth}*{ext or ''}")
+            # Shard globs also match inside hidden directories (i.e. `.blobs/ab/<digest>`)
+            iterator = filter(lambda f: not has_hidden_part(f[len(path) + 1 :]), glob)
+            iterator = filter(not_cache_append_file, iterator)
             iterator = filter(filter_, iterator)
             if key_only:
                 iterator = map(lambda f: pathlib.Path(f).stem, iterator)
@@ -237,107 +1119,815 @@ class Cache:
 
         return inner
 
+    def _iter_results(self, func):
+        def inner(prefetch: int = DEFAULT_BATCH_SIZE, workers: Optional[int] = None, inputs: bool = True):
+            """
+            Yield `(key, inputs, output)` for every cached result. The next `prefetch` entries are fetched concurrently
+            (as one batch) while the current ones are deserialized on `workers` threads, so at most two batches are held
+            in memory. Entries removed since the listing (or whose blob was) are skipped, and `inputs` is None if
+            `inputs=False`.
+            """
+            path = self._path(func)
+            keys = list(self._iter(func=func, filter_=data_filter)())
+            batches = [keys[i : i + prefetch] for i in range(0, len(keys), prefetch)]
+            exts = ("", Extensions.inputs) if inputs else ("",)
+
+            def fetch(batch):
+                datas = iter(
+                    self.read_many([self._key_path(path, f"{key}{ext}") for key in batch for ext in exts], prefetch)
+                )
+                return [(key, *(next(datas) for _ in exts)) for key in batch]
+
+            def load(entry):
+                key, data, *input_data = entry
+                if data is None:
+                    return MISSING
+                return self._load_result(path, key, data, input_data[0] if input_data else None)
+
+            with ThreadPoolExecutor(max_workers=1) as fetcher, ThreadPoolExecutor(max_workers=workers) as pool:
+                pending = fetcher.submit(fetch, batches[0]) if batches else None
+                for i in range(len(batches)):
+                    entries = pending.result()
+                    pending = fetcher.submit(fetch, batches[i + 1]) if i + 1 < len(batches) else None
+                    for result in pool.map(load, entries):
+                        if result is not MISSING:
+                            yield result
+
+        return inner
+
+    def _load_result(self, path, key, data: bytes, input_data: Optional[bytes]):
+        """`(key, inputs, output)` from their fetched data, or MISSING if the output's blob has been removed"""
+        full_path, input_value = self._key_path(path, key), None
+        if input_data is not None:
+            input_value = self._deserialize(full_path, self.input_deserializer, input_data)
+        try:
+            return key, input_value, self._deserialize_output(full_path, data)
+        except DanglingPointer:
+            return MISSING
+
     def _load(self, func, deserializer=None, ext=None):
         def inner(*, key=None, kwargs=None):
             assert key is not None or kwargs is not None, "Must pass key or kwargs"
             path = self._path(func)
             if key is None:
                 key = func.tokenize(**kwargs)
-            return self.read_output(path=f"{path}/{key}{ext or ''}", deserializer=deserializer)
+            return self._load_path(path=self._key_path(path, key), ext=ext, deserializer=deserializer)
 
         return inner
 
+    def _load_path(self, path, ext=None, deserializer=None):
+        full_path = f"{path}{ext or ''}"
+        if ext == Extensions.inputs:
+            return self.read_input(path=full_path, deserializer=deserializer)
+        if self._memory_tier is None:
+            return self.read_output(path=full_path, deserializer=deserializer)
+        value = self._memory_tier.get(full_path)
+        if value is MISSING:
+            if deserializer is None and self.output_stream_serializer is not None:
+                value, nbytes = self._read_output_stream(path=full_path)
+            else:
+                data = self.read(path=full_path)
+                value, nbytes = self._deserialize(full_path, deserializer or self.output_deserializer, data), len(data)
+            expires_at = self._memory_tier_expiry(path=path, ext=ext)
+            self._memory_tier.put(full_path, value, nbytes=nbytes, expires_at=expires_at)
+        return value
+
     def _remove(self, func, ext=None):
         def inner(*, key=None, kwargs=None):
             assert key is not None or kwargs is not None, "Must pass key or kwargs"
             path = self._path(func)
             if key is None:
                 key = func.tokenize(**kwargs)
-            if not self.fs.exists(path=f"{path}/{key}{ext or ''}"):
-                return
-            return self.fs.rm(path=f"{path}/{key}{ext or ''}")
+            result = self._remove_key(path=path, key=key, ext=ext)
+            self._manifest_flush()
+            return result
 
         return inner
 
+    def _wait_for_writes(self):
+        """Let background writes land before removing anything, so they can't recreate what's removed"""
+        if self._writer is not None:
+            self._writer.wait()
+
+    def _remove_key(self, path, key, ext=None):
+        self._wait_for_writes()
+        if self._exception_index is not None and ext == Extensions.exception:
+            self._exception_index.discard(path, key)
+        if self._memory_tier is not None:
+            self._memory_tier.pop(self._key_path(path, f"{key}{ext or ''}"))
+        if self._manifest is not None:
+            self._manifest.remove(path, key, EXTENSION_KINDS[ext])
+        for tier in self._tiers:
+            tier._remove_key(self._tier_path(tier, path), key, ext=ext)
+        if not self.fs.exists(path=self._key_path(path, f"{key}{ext or ''}")):
+            return
+        return self.fs.rm(path=self._key_path(path, f"{key}{ext or ''}"))
+
     def _remove_all(self, func, ext=None):
         def inner():
+            path = self._path(func)
             list_inner = self._list(func=func, ext=ext)
-            for key in list_inner():
-                self._remove(func, ext=ext)(key=key)
+            self._remove_paths([self._key_path(path, f"{key}{ext or ''}") for key in list_inner()])
+
+        return inner
+
+    def _remove_paths(self, paths: list):
+        """Remove many cache files with batched requests, keeping the memory tier and manifest in step"""
+        from deche.sweep import remove_paths
+
+        self._wait_for_writes()
+        for full_path in paths:
+            if self._memory_tier is not None:
+                self._memory_tier.pop(full_path)
+            directory, name = self._split_key_path(full_path)
+            key, kind = entry_kind(name)
+            if self._exception_index is not None and kind == Kind.exception:
+                self._exception_index.discard(directory, key)
+            if self._manifest is not None:
+                self._manifest.remove(directory, key, kind)
+        remove_paths(self.fs, paths)
+        for tier in self._tiers:
+            tier._remove_paths([self._tier_path(tier, full_path) for full_path in paths])
+        self._manifest_flush()
+
+    def _sweep(self, func):
+        def inner(keep_versions: Optional[int] = None, orphan_min_age: Optional[float] = None, dry_run: bool = True):
+            """
+            Find (and unless `dry_run`, remove) this function's expired entries, orphaned inputs and APPEND versions
+            beyond `keep_versions`, from a single listing. See `deche.sweep.sweep`.
+            """
+            from deche.sweep import DEFAULT_ORPHAN_MIN_AGE
+            from deche.sweep import sweep
+
+            cache_ttl = self.cache_ttl if isinstance(self.cache_ttl, (int, float)) else None
+            report = sweep(
+                self.fs,
+                self._path(func),
+                cache_ttl=cache_ttl,
+                keep_versions=keep_versions,
+                orphan_min_age=DEFAULT_ORPHAN_MIN_AGE if orphan_min_age is None else orphan_min_age,
+                dry_run=True,
+            )
+            if not dry_run:
+                self._remove_paths(report.paths)
+                report.removed = True
+            return report
+
+        return inner
+
+    def _stats(self, func):
+        def inner(reset: bool = False) -> dict:
+            """
+            This function's hit/miss counters and latency histograms for this process (see `deche.metrics`), optionally
+            resetting them afterwards.
+            """
+            metrics = REGISTRY.get(self._path(func))
+            snapshot = metrics.snapshot()
+            if reset:
+                metrics.reset()
+            return snapshot
+
+        return inner
+
+    def _query(self, func):
+        signature = inspect.signature(func.func)
+        accepts_any = any(p.kind == inspect.Parameter.VAR_KEYWORD for p in signature.parameters.values())
+        names = set(signature.parameters) | set(self.cls_attrs or ())
+
+        def inner(*, load_results: bool = False, **filters):
+            """
+            The keys of cached calls whose arguments match `filters` - each a value (compared by equality) or a
+            predicate - or their `{key: result}` with `load_results`. With `manifest=True` this is answered from the
+            input summaries in the manifest, only loading the inputs of entries it can't decide (i.e. long strings);
+            otherwise every cached input is loaded.
+            """
+            unknown = set(filters) - names
+            if unknown and not accepts_any:
+                raise ValueError(f"Unknown arguments {sorted(unknown)} for {func.func.__name__}")
+            path = self._path(func)
+            keys = sorted(self._query_keys(func, path=path, filters=filters))
+            if not load_results:
+                return keys
+            loaded = self._load_keys(path=path, keys=keys)
+            return {key: value for key, value in loaded.items() if value is not MISSING}
+
+        return inner
+
+    def _query_keys(self, func, path, filters: dict) -> list:
+        if self._manifest is not None:
+            records = self._manifest.entries(path, kind=Kind.inputs)
+            # Entries backfilled from a listing have no summary, so are undecided
+            decisions = {
+                key: match_summary(record["inputs"], filters) if "inputs" in record else None
+                for key, record in records.items()
+            }
+            keys = [key for key, decision in decisions.items() if decision]
+            undecided = [key for key, decision in decisions.items() if decision is None]
+        else:
+            keys, undecided = [], list(func.iter_cached_inputs())
+        for key, inputs in self._load_keys(path=path, keys=undecided, ext=Extensions.inputs).items():
+            if inputs is not MISSING and all(
+                name in inputs and match_value(inputs[name], value) for name, value in filters.items()
+            ):
+                keys.append(key)
+        return keys
+
+    def _load_keys(self, path, keys: list, ext=None) -> dict:
+        """Load many keys concurrently, as MISSING for any that don't exist (i.e. calls that raised)"""
+        loaded = {}
+        for key, result in zip(
+            keys, thread_map(lambda key: self._load_path(path=self._key_path(path, key), ext=ext), keys)
+        ):
+            if isinstance(result, Exception) and not isinstance(result, FileNotFoundError):
+                raise result
+            loaded[key] = MISSING if isinstance(result, FileNotFoundError) else result
+        return loaded
+
+    def _map(self, func, binder):  # noqa: C901
+        def inner(
+            iterable_of_kwargs: Iterable[dict],
+            max_workers: Optional[int] = None,
+            executor: Optional[Executor] = None,
+            return_exceptions: bool = False,
+        ):
+            """
+            Evaluate `func` over many kwargs, returning the results in order. Hits are found with a single listing per
+            cache directory and fetched concurrently; only misses are run - on `executor` (a thread pool of
+            `max_workers` by default, a `ProcessPoolExecutor` is also supported) - and written back in bulk.
+            """
+            calls = []
+            for kwargs in iterable_of_kwargs:
+                all_kwargs = binder((), kwargs)
+                path = self._path(func=func.func, kwargs=all_kwargs)
+                inputs = prepare_full_kwargs(
+                    all_kwargs=all_kwargs, ignore=self.non_hashable_kwargs, cls_attrs=self.cls_attrs
+                )
+                key, input_value = self._tokenize_inputs(inputs)
+                calls.append((kwargs, self._key_path(path, key), inputs, input_value))
+
+            # {full_path: (is_exception, value)}
+            results: dict = {}
+            for _, full_path, _, _ in calls:
+                try:
+                    value = self._memory_tier_lookup(path=full_path)
+                    if value is not MISSING:
+                        results[full_path] = (False, value)
+                except Exception as e:
+                    results[full_path] = (True, e)
+
+            load_hits = self._map_find_tiered if self._tiers else self._map_load_hits
+            load_hits(
+                full_paths={full_path for _, full_path, _, _ in calls if full_path not in results},
+                results=results,
+                max_workers=max_workers,
+            )
+            for full_path, (is_exception, _) in results.items():
+                if is_exception:
+                    self._count(full_path, "exception_hits")
+                else:
+                    self._record_hit(full_path)
+
+            misses = {}
+            for call in calls:
+                if call[1] not in results:
+                    misses.setdefault(call[1], call)
+            for full_path in misses:
+                self._count(full_path, "misses")
+            if misses:
+                self._map_run_misses(
+                    func=func.func, misses=misses, results=results, max_workers=max_workers, executor=executor
+                )
+
+            outputs = []
+            for _, full_path, _, _ in calls:
+                is_exception, value = results[full_path]
+                if is_exception and not return_exceptions:
+                    raise value
+                outputs.append(value)
+            return outputs
+
+        return inner
+
+    def _map_load_hits(self, full_paths: set, results: dict, max_workers: Optional[int] = None):
+        listings: dict = {}
+        to_read = {}
+        for full_path in full_paths:
+            directory, key = self._listed_in(full_path)
+            if directory not in listings:
+                listings[directory] = self._list_directory(directory)
+            info = listings[directory].get(key)
+            if info is not None and self.valid(path=full_path, info=info):
+                to_read[full_path] = (full_path, None, info)
+            elif self._listed_exception(listings[directory], key):
+                to_read[f"{full_path}{Extensions.exception}"] = (full_path, Extensions.exception, None)
+
+        read_paths = list(to_read)
+        if self.output_stream_serializer is not None:
+            # Stream each file in its worker rather than fetching whole payloads up front
+            found = [(p, None) for p in read_paths]
+        else:
+            found = self._map_read(read_paths, max_workers)
+
+        for result in thread_map(partial(self._map_load, to_read), found, max_workers):
+            if isinstance(result, Exception):
+                raise result
+            if result is MISSING:
+                # A miss, to be recomputed
+                continue
+            full_path, is_exception, value = result
+            results[full_path] = (is_exception, value)
+
+    def _map_read(self, read_paths: list, max_workers: Optional[int] = None) -> list:
+        """`(path, data)` of each of `read_paths` that could be read"""
+        found = []
+        for p, data in zip(read_paths, self.read_many(read_paths, max_workers)):
+            if data is not None:
+                found.append((p, data))
+            else:
+                # Listed (by the manifest), but since removed
+                self._manifest_stale(p)
+        return found
+
+    def _map_load(self, to_read: dict, item: tuple):
+        """Load a hit for `_map_load_hits`: `(full_path, is_exception, value)`, or MISSING if it (or its blob) was removed"""
+        read_path, data = item
+        full_path, ext, info = to_read[read_path]
+        try:
+            if data is None:
+                return full_path, ext is not None, self._load_path(path=full_path, ext=ext)
+            return full_path, ext is not None, self._load_data(path=full_path, data=data, ext=ext, info=info)
+        except DanglingPointer:
+            return MISSING
+        except FileNotFoundError:
+            # Listed (by the manifest), but since removed
+            self._manifest_stale(read_path)
+            return MISSING
+
+    def _map_find_tiered(self, full_paths: set, results: dict, max_workers: Optional[int] = None):
+        """`_map_load_hits` through the tiers, a path at a time since each may be found in a different one"""
+        full_paths = list(full_paths)
+        for full_path, found in zip(full_paths, thread_map(self._find_tiered, full_paths, max_workers)):
+            if isinstance(found, Exception):
+                raise found
+            if found is not MISSING:
+                results[full_path] = found
+
+    def _map_run_misses(  # noqa: C901
+        self, func, misses: dict, results: dict, max_workers: Optional[int] = None, executor: Optional[Executor] = None
+    ):
+        own_executor = executor is None
+        executor = executor or ThreadPoolExecutor(max_workers=max_workers)
+        payload = cloudpickle.dumps(func) if isinstance(executor, ProcessPoolExecutor) else None
+        writes = {}
+        try:
+            futures = {}
+            for full_path, (kwargs, _, inputs, input_value) in misses.items():
+                if payload is not None:
+                    futures[executor.submit(_call_pickled, payload, kwargs)] = full_path
+                else:
+                    futures[executor.submit(_call_timed, func, kwargs)] = full_path
+                writes[f"{full_path}{Extensions.inputs}"] = input_value or self._serialize(
+                    full_path, self.input_serializer, inputs
+                )
+
+            for future in as_completed(futures):
+                full_path = futures[future]
+                try:
+                    output, seconds = future.result()
+                    self._validate_result(output)
+                    self._record_compute(full_path, seconds)
+                    if self.output_stream_serializer is not None:
+                        nbytes = self.write_output(path=full_path, output=output)
+                    else:
+                        writes[full_path] = self._serialize_output(full_path, output)
+                        nbytes = len(writes[full_path])
+                    self._memory_tier_put(
+                        path=full_path, value=output, nbytes=nbytes, expires_at=self._memory_tier_expiry()
+                    )
+                    results[full_path] = (False, output)
+                except Exception as e:
+                    logger.debug(f"Function {func} raised {e}")
+                    if self.cache_exceptions:
+                        exc_path = f"{full_path}{Extensions.exception}"
+                        writes[exc_path] = self._serialize_output(exc_path, e)
+                        self._cache_exception(full_path, e, len(writes[exc_path]))
+                    results[full_path] = (True, e)
+                if len(writes) >= (max_workers or DEFAULT_BATCH_SIZE):
+                    self.write_many(writes, max_workers=max_workers)
+                    writes = {}
+            self.write_many(writes, max_workers=max_workers)
+            for full_path, (_, _, inputs, _) in misses.items():
+                self._manifest_add(f"{full_path}{Extensions.inputs}", inputs=inputs)
+        finally:
+            if own_executor:
+                executor.shutdown()
+            self._manifest_flush()
+
+    def _amap(self, func):
+        async def inner(
+            iterable_of_kwargs: Iterable[dict], max_workers: Optional[int] = None, return_exceptions: bool = False
+        ):
+            """Await `func` over many kwargs concurrently (at most `max_workers` at once), returning results in order"""
+            semaphore = asyncio.Semaphore(max_workers or DEFAULT_BATCH_SIZE)
+
+            async def run(kwargs):
+                async with semaphore:
+                    return await func(**kwargs)
+
+            return await asyncio.gather(*map(run, iterable_of_kwargs), return_exceptions=return_exceptions)
 
         return inner
 
-    def __call__(self, func):  # noqa: C901
-        # TODO - very lazy async support. Refactor
-        # TODO - fsspec also has async support - could make exists/load calls async
+    def _lookup(self, path):
+        """The cached value for `path` (or MISSING), raising any cached exception"""
+        value = self._memory_tier_lookup(path=path)
+        if value is not MISSING:
+            return value
+        found = self._find_tiered(path) if self._tiers else self._find(path)
+        if found is MISSING:
+            return MISSING
+        is_exception, value = found
+        if is_exception:
+            raise value
+        return value
+
+    def _find(self, path):
+        """The `(is_exception, value)` cached for `path` in the store (past the memory tier), or MISSING"""
+        try:
+            return self._find_in_store(path)
+        except DanglingPointer:
+            # Its blob was removed (i.e. by a sweep) after the pointer was written; recomputing rewrites it
+            return MISSING
+
+    def _find_in_store(self, path):
+        if self.optimistic_reads:
+            value = self._optimistic_load(path=path)
+            if value is not MISSING:
+                return False, value
+            if self._might_have_exception(path):
+                exc_path = f"{path}{Extensions.exception}"
+                data, info = self.read_with_info(path=exc_path, info=self.exception_ttl is not None)
+                if data is not None and not (info and self._exception_expired(info)):
+                    return True, self._load_data(path=path, data=data, ext=Extensions.exception, info=info)
+        elif self.valid(path=path):
+            return False, self._load_path(path=path)
+        elif self._has_exception(path):
+            return True, self._load_path(path=path, ext=Extensions.exception)
+        return MISSING
+
+    def _find_tiered(self, path):
+        """`_find` `path` in each tier and then the store, copying it into the (faster) tiers it was missing from"""
+        for i, tier in enumerate(self._tiers):
+            tier_path = self._tier_path(tier, path)
+            found = tier._find(tier_path)
+            if found is not MISSING:
+                tier._record_hit(tier_path)
+                self._memory_tier_put_found(path, found, tier=tier, tier_path=tier_path)
+                self._promote(path, found, source=tier, source_path=tier_path, tiers=self._tiers[:i])
+                return found
+        found = self._find(path)
+        if found is not MISSING:
+            self._promote(path, found, source=self, source_path=path, tiers=self._tiers)
+        return found
+
+    def _memory_tier_put_found(self, path, found: tuple, tier: "Cache", tier_path: str):
+        """Keep a value found in `tier` in the memory tier, as if it were loaded from the store"""
+        if self._memory_tier is None:
+            return
+        is_exception, value = found
+        ext = Extensions.exception if is_exception else None
+        info = tier.fs.info(f"{tier_path}{ext or ''}")
+        expires_at = self._memory_tier_expiry(path=path, info=info, ext=ext)
+        self._memory_tier.put(f"{path}{ext or ''}", value, nbytes=info.get("size") or 0, expires_at=expires_at)
+
+    def _promote(self, path, found: tuple, source: "Cache", source_path: str, tiers: list):
+        """
+        Copy a value `found` at `source_path` in `source` into `tiers`, re-serializing it as they would have written
+        it. Copies keep the original's modification time so they expire along with it; tiers that can't set it
+        (i.e. non-local filesystems) are skipped when a TTL applies.
+        """
+        is_exception, value = found
+        ext = Extensions.exception if is_exception else None
+        mtime = None
+        if isinstance(self._ttl(ext), (int, float)):
+            mtime = modified_time(source.fs.info(f"{source_path}{ext or ''}"))
+        for tier in tiers:
+            if mtime is not None and not can_set_mtime(tier.fs):
+                continue
+            tier_path = f"{self._tier_path(tier, path)}{ext or ''}"
+            try:
+                self._write_tier(tier, "write_output", tier_path, value)
+                if mtime is not None:
+                    set_mtime(tier.fs, tier_path, mtime)
+            except Exception as e:
+                logger.warning(f"Failed to promote {path} to {tier_path}: {e!r}")
+                continue
+            if not is_exception:
+                tier._record_compute(tier_path, 0.0)
+
+    def _optimistic_load(self, path):
+        """A single fetch answers existence, validity (via the metadata) and the data itself; MISSING on a miss"""
+        if self.output_stream_serializer is None:
+            data, info = self.read_with_info(path=path, info=self._validators_need_info)
+            if data is None or not self.valid(path=path, info=info):
+                return MISSING
+            return self._load_data(path=path, data=data, info=info)
+        try:
+            loaded = self._optimistic_load_stream(path=path)
+        except FileNotFoundError:
+            return MISSING
+        if loaded is MISSING:
+            return MISSING
+        value, nbytes, info = loaded
+        if self._memory_tier is not None:
+            self._memory_tier.put(path, value, nbytes=nbytes, expires_at=self._memory_tier_expiry(path=path, info=info))
+        return value
+
+    def _optimistic_load_stream(self, path):
+        buffer = self._read_buffer(path=path)
+        if buffer is not None:
+            info = self.fs.info(path) if self._validators_need_info else {}
+            if not self.valid(path=path, info=info):
+                return MISSING
+            return self.output_stream_serializer.load_buffer(buffer), buffer.nbytes, info
+        with self.fs.open(path, mode="rb") as f:
+            info = {}
+            if self._validators_need_info:
+                info = getattr(f, "details", None) or self.fs.info(path)
+            if not self.valid(path=path, info=info):
+                return MISSING
+            return self._load_stream(f), f.tell(), info
+
+    async def _alookup(self, path):
+        value = self._memory_tier_lookup(path=path)
+        if value is not MISSING:
+            return value
+        if self.output_stream_serializer is not None or self._tiers:
+            # Stream from the file (or search the tiers) on a worker thread rather than fetching the whole payload
+            return await run_in_thread(self._lookup, path=path)
+        if self.optimistic_reads:
+            data, info = await self._aread_with_info(path=path)
+            is_valid = data is not None and await run_in_thread(self.valid, path=path, info=info)
+        else:
+            # Validate and optimistically fetch the data concurrently
+            info = None
+            is_valid, data = await asyncio.gather(run_in_thread(self.valid, path=path), self._aread(path=path))
+        if is_valid and data is not None:
+            try:
+                return await self._aload(path=path, data=data, info=info)
+            except DanglingPointer:
+                return MISSING
+        if not self._might_have_exception(path):
+            return MISSING
+        exc_path = f"{path}{Extensions.exception}"
+        exc_data, info = await self._aread_with_info(path=exc_path, info=self.exception_ttl is not None)
+        if exc_data is not None and not (info and self._exception_expired(info)):
+            raise await self._aload(path=path, data=exc_data, ext=Extensions.exception, info=info)
+        return MISSING
+
+    def _compute(self, func, args, kwargs, path, inputs, input_value=None, lease: Optional[Lease] = None):
+        """Call `func` and write its inputs and result (or exception), then release `lease` if given"""
+        if self.write_behind:
+            return self._compute_behind(
+                func, args, kwargs, path=path, inputs=inputs, input_value=input_value, lease=lease
+            )
+        try:
+            self.write_input(path=path, inputs=inputs, data=input_value)
+            logger.debug(f"Calling {func}")
+            start = time.perf_counter()
+            output = func(*args, **kwargs)
+            self._validate_result(output)
+            logger.debug(f"Function {func} ran successfully")
+            self._record_compute(path, time.perf_counter() - start)
+            nbytes = self.write_output(path=path, output=output)
+            self._memory_tier_put(path=path, value=output, nbytes=nbytes, expires_at=self._memory_tier_expiry())
+        except Exception as e:
+            logger.debug(f"Function {func} raised {e}")
+            if self.cache_exceptions:
+                nbytes = self.write_output(path=f"{path}{Extensions.exception}", output=e)
+                self._cache_exception(path, e, nbytes)
+            raise e
+        finally:
+            self._manifest_flush()
+            if lease is not None:
+                lease.release()
+
+        return output
+
+    def _compute_behind(self, func, args, kwargs, path, inputs, input_value=None, lease: Optional[Lease] = None):
+        """
+        `_compute`, but returning as soon as `func` does, writing its inputs and result (then releasing `lease`) in the
+        background
+        """
+        logger.debug(f"Calling {func}")
+        start = time.perf_counter()
+        try:
+            output = func(*args, **kwargs)
+            self._validate_result(output)
+        except Exception as e:
+            logger.debug(f"Function {func} raised {e}")
+            self._write_behind(path, inputs, input_value, found=(True, e), lease=lease)
+            raise e
+        except BaseException:
+            if lease is not None:
+                lease.release()
+            raise
+        logger.debug(f"Function {func} ran successfully")
+        self._record_compute(path, time.perf_counter() - start)
+        self._write_behind(path, inputs, input_value, found=(False, output), lease=lease)
+        return output
+
+    def _write_behind(self, path, inputs, input_value, found: tuple, lease: Optional[Lease] = None):
+        """
+        Write a call's inputs and its `(is_exception, value)` result on the background writer, which blocks while
+        `write_behind_max_pending` writes are outstanding. The result is served from memory until it's written, and
+        `lease` is held until then so that other workers wait for the write rather than recomputing.
+        """
+        is_exception, value = found
+        if self.cache_exceptions or not is_exception:
+            self._in_flight[path] = found
+
+        def write():
+            try:
+                self.write_input(path=path, inputs=inputs, data=input_value)
+                if not is_exception:
+                    nbytes = self.write_output(path=path, output=value)
+                    self._memory_tier_put(path=path, value=value, nbytes=nbytes, expires_at=self._memory_tier_expiry())
+                elif self.cache_exceptions:
+                    nbytes = self.write_output(path=f"{path}{Extensions.exception}", output=value)
+                    self._cache_exception(path, value, nbytes)
+            finally:
+                if self._in_flight.get(path) is found:
+                    self._in_flight.pop(path, None)
+                self._manifest_flush()
+                if lease is not None:
+                    lease.release()
+
+        try:
+            self._background_writer().submit(write)
+        except BaseException:
+            if lease is not None:
+                lease.release()
+            raise
+
+    async def _acompute(self, func, args, kwargs, path, inputs, input_value=None, lease: Optional[Lease] = None):
+        if self.write_behind:
+            return await self._acompute_behind(
+                func, args, kwargs, path=path, inputs=inputs, input_value=input_value, lease=lease
+            )
+        # Write the inputs while the function runs
+        input_write = asyncio.ensure_future(self._awrite_input(path=path, inputs=inputs, data=input_value))
+        try:
+            logger.debug(f"Calling {func}")
+            start = time.perf_counter()
+            output = await func(*args, **kwargs)
+            self._validate_result(output)
+            logger.debug(f"Function {func} ran successfully")
+            self._record_compute(path, time.perf_counter() - start)
+            nbytes, _ = await asyncio.gather(self._awrite_output(path=path, output=output), input_write)
+            self._memory_tier_put(path=path, value=output, nbytes=nbytes, expires_at=self._memory_tier_expiry())
+        except Exception as e:
+            logger.debug(f"Function {func} raised {e}")
+            await asyncio.gather(input_write, return_exceptions=True)
+            if self.cache_exceptions:
+                nbytes = await self._awrite_output(path=f"{path}{Extensions.exception}", output=e)
+                self._cache_exception(path, e, nbytes)
+            raise e
+        finally:
+            if self._manifest is not None:
+                await run_in_thread(self._manifest.flush)
+            if lease is not None:
+                await run_in_thread(lease.release)
+
+        return output
+
+    async def _acompute_behind(self, func, args, kwargs, path, inputs, input_value=None, lease: Optional[Lease] = None):
+        logger.debug(f"Calling {func}")
+        start = time.perf_counter()
+        try:
+            output = await func(*args, **kwargs)
+            self._validate_result(output)
+        except Exception as e:
+            logger.debug(f"Function {func} raised {e}")
+            # Off the event loop, which the writer's backpressure would otherwise block
+            await run_in_thread(self._write_behind, path, inputs, input_value, found=(True, e), lease=lease)
+            raise e
+        except BaseException:
+            if lease is not None:
+                await run_in_thread(lease.release)
+            raise
+        logger.debug(f"Function {func} ran successfully")
+        self._record_compute(path, time.perf_counter() - start)
+        await run_in_thread(self._write_behind, path, inputs, input_value, found=(False, output), lease=lease)
+        return output
+
+    def _acquire_lease(self, path) -> tuple[Lease, bool]:
+        """Acquire the lease on `path`, returning it and whether another worker held it while we waited"""
+        lock = f"{path}{Extensions.lock}"
+        self._ensure_parent(lock)
+        lease = Lease(self.fs, lock, ttl=self.lease_ttl, poll_interval=self.lease_poll_interval)
+        return lease, lease.acquire()
+
+    def _compute_once(self, func, args, kwargs, path, inputs, input_value=None):
+        """
+        `_compute`, but only once for concurrent callers in this process (`single_flight`) and, when `lease_ttl` is
+        set, across workers sharing the store (via a lock file). The lease is renewed while the call runs, and held
+        until its result is written (in the background, with `write_behind`).
+        """
+
+        def compute():
+            if self.lease_ttl is None:
+                return self._compute(func, args, kwargs, path=path, inputs=inputs, input_value=input_value)
+            lease, waited = self._acquire_lease(path=path)
+            try:
+                # If another worker held the lease, it has likely cached the result in the meantime
+                value = self._lookup(path=path) if waited else MISSING
+            except BaseException:
+                lease.release()
+                raise
+            if value is not MISSING:
+                lease.release()
+                return value
+            return self._compute(func, args, kwargs, path=path, inputs=inputs, input_value=input_value, lease=lease)
+
+        if not self.single_flight:
+            return compute()
+        return self._single_flight.do(path, compute)
+
+    async def _acompute_once(self, func, args, kwargs, path, inputs, input_value=None):
+        async def compute():
+            if self.lease_ttl is None:
+                return await self._acompute(func, args, kwargs, path=path, inputs=inputs, input_value=input_value)
+            lease, waited = await run_in_thread(self._acquire_lease, path=path)
+            try:
+                value = await self._alookup(path=path) if waited else MISSING
+            except BaseException:
+                await run_in_thread(lease.release)
+                raise
+            if value is not MISSING:
+                await run_in_thread(lease.release)
+                return value
+            return await self._acompute(
+                func, args, kwargs, path=path, inputs=inputs, input_value=input_value, lease=lease
+            )
+
+        if not self.single_flight:
+            return await compute()
+        return await self._single_flight.ado(path, compute)
+
+    def __call__(self, func):
+        # Resolve the signature once rather than on every call
+        binder = kwargs_binder(func)
 
         if inspect.iscoroutinefunction(func):
 
             @functools.wraps(func)
             async def wrapper(*args, **kwargs):
-                all_kwargs = args_kwargs_to_kwargs(func=func, args=args, kwargs=kwargs)
+                all_kwargs = binder(args, kwargs)
                 path = self._path(func=func, kwargs=all_kwargs)
                 inputs = prepare_full_kwargs(
                     all_kwargs=all_kwargs, ignore=self.non_hashable_kwargs, cls_attrs=self.cls_attrs
                 )
-                key, _ = tokenize(obj=inputs)
-                if self.valid(path=f"{path}/{key}"):
-                    return self._load(func=func)(key=key)
-                elif self._exists(func=func, ext=Extensions.exception)(key=key):
-                    raise self._load(func=func, ext=Extensions.exception)(key=key)
+                key, input_value = self._tokenize_inputs(inputs)
+                full_path = self._key_path(path, key)
                 try:
-                    self.write_input(path=f"{path}/{key}", inputs=inputs)
-                    logger.debug(f"Calling {func}")
-                    output = await func(*args, **kwargs)
-                    if self.result_validator is not None:
-                        logger.debug(f"Validating result with {self.result_validator}")
-                        try:
-                            self.result_validator(output)
-                        except Exception as e:
-                            raise ValidationError(e)
-                    logger.debug(f"Function {func} ran successfully")
-                    self.write_output(path=f"{path}/{key}", output=output)
-                except Exception as e:
-                    logger.debug(f"Function {func} raised {e}")
-                    self.write_output(path=f"{path}/{key}{Extensions.exception}", output=e)
-                    raise e
-
-                return output
+                    value = await self._alookup(path=full_path)
+                except Exception:
+                    self._count(path=full_path, metric="exception_hits")
+                    raise
+                if value is not MISSING:
+                    self._record_hit(full_path)
+                    return value
+                self._count(path=full_path, metric="misses")
+                return await self._acompute_once(
+                    func, args, kwargs, path=full_path, inputs=inputs, input_value=input_value
+                )
 
         else:
 
             @functools.wraps(func)
             def wrapper(*args, **kwargs):
-                all_kwargs = args_kwargs_to_kwargs(func=func, args=args, kwargs=kwargs)
+                all_kwargs = binder(args, kwargs)
                 path = self._path(func=func, kwargs=all_kwargs)
                 inputs = prepare_full_kwargs(
                     all_kwargs=all_kwargs, ignore=self.non_hashable_kwargs, cls_attrs=self.cls_attrs
                 )
-                key, _ = tokenize(obj=inputs)
-                if self.valid(path=f"{path}/{key}"):
-                    return self._load(func=func)(key=key)
-                elif self._exists(func=func, ext=Extensions.exception)(key=key):
-                    raise self._load(func=func, ext=Extensions.exception)(key=key)
+                key, input_value = self._tokenize_inputs(inputs)
+                full_path = self._key_path(path, key)
                 try:
-                    self.write_input(path=f"{path}/{key}", inputs=inputs)
-                    logger.debug(f"Calling {func}")
-                    output = func(*args, **kwargs)
-                    if self.result_validator is not None:
-                        logger.debug(f"Validating result with {self.result_validator}")
-                        try:
-                            assert self.result_validator(output) is not False
-                        except Exception as e:
-                            raise ValidationError(e)
-                    logger.debug(f"Function {func} ran successfully")
-                    self.write_output(path=f"{path}/{key}", output=output)
-                except Exception as e:
-                    logger.debug(f"Function {func} raised {e}")
-                    self.write_output(path=f"{path}/{key}{Extensions.exception}", output=e)
-                    raise e
-
-                return output
+                    value = self._lookup(path=full_path)
+                except Exception:
+                    self._count(path=full_path, metric="exception_hits")
+                    raise
+                if value is not MISSING:
+                    self._record_hit(full_path)
+                    return value
+                self._count(path=full_path, metric="misses")
+                return self._compute_once(func, args, kwargs, path=full_path, inputs=inputs, input_value=input_value)
 
-        wrapper.tokenize = tokenize_func(func=func, ignore=self.non_hashable_kwargs, cls_attrs=self.cls_attrs)
+        wrapper.tokenize = tokenize_func(
+            func=func, ignore=self.non_hashable_kwargs, cls_attrs=self.cls_attrs, binder=binder, hasher=self._key_hasher
+        )
         wrapper.func = func
         wrapper.fs = self.fs
         wrapper.is_valid = self.is_valid(func=wrapper)
@@ -350,6 +1940,7 @@ class Cache:
         wrapper.iter_cached_inputs = self._iter(func=wrapper, ext=Extensions.inputs)
         wrapper.iter_cached_data = self._iter(func=wrapper, filter_=data_filter)
         wrapper.iter_cached_exception = self._iter(func=wrapper, ext=Extensions.exception)
+        wrapper.iter_cached_results = self._iter_results(func=wrapper)
         wrapper.load_cached_inputs = self._load(func=wrapper, ext=Extensions.inputs)
         wrapper.load_cached_data = self._load(func=wrapper)
         wrapper.load_cached_exception = self._load(func=wrapper, ext=Extensions.exception)
@@ -357,7 +1948,13 @@ class Cache:
         wrapper.remove_cached_data = self._remove(func=wrapper)
         wrapper.remove_cached_exception = self._remove(func=wrapper, ext=Extensions.exception)
         wrapper.remove_all_cached_exceptions = self._remove_all(func=wrapper, ext=Extensions.exception)
+        wrapper.query = self._query(func=wrapper)
+        wrapper.sweep = self._sweep(func=wrapper)
+        wrapper.stats = self._stats(func=wrapper)
         wrapper.path = functools.partial(self._path, func=func)
+        wrapper.map = (
+            self._amap(func=wrapper) if inspect.iscoroutinefunction(func) else self._map(func=wrapper, binder=binder)
+        )
         wrapper.deche = self
         return wrapper
 
@@ -0,0 +1,185 @@
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+import weakref
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Optional
+
+from fsspec import AbstractFileSystem
+
+from deche.aio import cat_many
+from deche.util import append_version
+from deche.util import modified_time
+
+
+logger = logging.getLogger(__name__)
+
+ACCESS_DIR = ".access"
+
+# Access stats from processes that haven't flushed for this long are dropped
+ACCESS_RETENTION = 7 * 24 * 3600.0
+
+# Evict down to this fraction of the limits, so that each eviction frees a useful amount
+LOW_WATERMARK = 0.9
+
+
+class AccessLog:
+    """
+    Per-process access statistics, `{path: [last_access, count, compute_seconds]}`, recorded in memory on the hot path
+    and periodically flushed to one stats file per process under `{prefix}/.access/` for the evictor to merge.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: dict = {}
+        self._dirty = False
+        self.name = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}.json"
+
+    def hit(self, path: str):
+        with self._lock:
+            stats = self._stats.setdefault(path, [0.0, 0, 0.0])
+            stats[0] = time.time()
+            stats[1] += 1
+            self._dirty = True
+
+    def computed(self, path: str, seconds: float):
+        with self._lock:
+            self._stats[path] = [time.time(), 1, seconds]
+            self._dirty = True
+
+    def forget(self, paths):
+        with self._lock:
+            for path in paths:
+                self._stats.pop(path, None)
+            self._dirty = True
+
+    def flush(self, fs: AbstractFileSystem, root: str):
+        with self._lock:
+            if not self._dirty:
+                return
+            data = json.dumps(self._stats).encode()
+            self._dirty = False
+        fs.makedirs(f"{root}/{ACCESS_DIR}", exist_ok=True)
+        fs.pipe_file(f"{root}/{ACCESS_DIR}/{self.name}", data)
+
+
+def load_access(fs: AbstractFileSystem, root: str, now: Optional[float] = None) -> dict:
+    """Merge every process's stats under `root`: the latest access, total count and largest compute time per path"""
+    now = time.time() if now is None else now
+    try:
+        files = fs.ls(f"{root}/{ACCESS_DIR}", detail=True)
+    except FileNotFoundError:
+        return {}
+    fresh = [info["name"] for info in files if now - modified_time(info) < ACCESS_RETENTION]
+    merged: dict = {}
+    for data in cat_many(fs, fresh):
+        if isinstance(data, Exception):
+            continue
+        for path, (last_access, count, seconds) in json.loads(data).items():
+            current = merged.setdefault(path, [0.0, 0, 0.0])
+            current[0] = max(current[0], last_access)
+            current[1] += count
+            current[2] = max(current[2], seconds)
+    return merged
+
+
+@dataclass
+class Entry:
+    """All the files of one cached call (data, inputs, exception and APPEND versions)"""
+
+    path: str
+    files: list = field(default_factory=list)
+    size: int = 0
+    mtime: float = 0.0
+
+
+def collect_entries(fs: AbstractFileSystem, root: str, key_of, ignore: tuple = ()) -> dict:
+    """
+    `{path: Entry}` for every cached call under `root`, from a single `fs.find`. `key_of(filename)` gives the key a
+    file belongs to; files ending with an `ignore` suffix, and anything in hidden (i.e. manifest) directories, are
+    skipped.
+    """
+    root = fs._strip_protocol(root).rstrip("/")
+    entries: dict = {}
+    for name, info in fs.find(root, detail=True).items():
+        directory, _, filename = name.rpartition("/")
+        if any(part.startswith(".") for part in directory[len(root) :].split("/")) or filename.endswith(ignore):
+            continue
+        key = key_of(filename)
+        version = append_version(key)
+        if version is not None:
+            key = key_of(version[0])
+        entry = entries.setdefault(f"{directory}/{key}", Entry(path=f"{directory}/{key}"))
+        entry.files.append(name)
+        entry.size += info.get("size") or 0
+        entry.mtime = max(entry.mtime, modified_time(info))
+    return entries
+
+
+def _lru(entry: Entry, stats: list):
+    return stats[0]
+
+
+def _lfu(entry: Entry, stats: list):
+    return stats[1], stats[0]
+
+
+def _cost(entry: Entry, stats: list):
+    # Keep whatever saves the most compute time per byte stored
+    return stats[2] * (stats[1] + 1) / max(entry.size, 1), stats[0]
+
+
+POLICIES = {"lru": _lru, "lfu": _lfu, "cost": _cost}
+
+
+def select_victims(
+    entries: dict,
+    access: dict,
+    policy: str = "lru",
+    max_bytes: Optional[int] = None,
+    max_entries: Optional[int] = None,
+) -> list:
+    """The entries to evict, coldest first by `policy`, to bring the store below LOW_WATERMARK of its limits"""
+    total_bytes = sum(entry.size for entry in entries.values())
+    over_bytes = max_bytes is not None and total_bytes > max_bytes
+    over_entries = max_entries is not None and len(entries) > max_entries
+    if not (over_bytes or over_entries):
+        return []
+    score = POLICIES[policy]
+    ranked = sorted(entries.values(), key=lambda e: score(e, access.get(e.path) or [e.mtime, 0, 0.0]))
+    target_bytes = max_bytes * LOW_WATERMARK if max_bytes is not None else float("inf")
+    target_entries = int(max_entries * LOW_WATERMARK) if max_entries is not None else float("inf")
+    victims, remaining = [], len(entries)
+    for entry in ranked:
+        if total_bytes <= target_bytes and remaining <= target_entries:
+            break
+        victims.append(entry)
+        total_bytes -= entry.size
+        remaining -= 1
+    return victims
+
+
+class Evictor(threading.Thread):
+    """Periodically flushes a cache's access log and evicts entries beyond its store limits, in the background"""
+
+    def __init__(self, cache, interval: float):
+        super().__init__(name="deche-evictor", daemon=True)
+        self._cache = weakref.ref(cache)
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            cache = self._cache()
+            if cache is None:
+                return
+            try:
+                cache.evict()
+            except Exception as e:
+                logger.warning(f"Eviction failed: {e}")
+            del cache
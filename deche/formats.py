@@ -0,0 +1,246 @@
+"""
+Type-dispatched serialization: each value is written in the fastest format registered for its type - Arrow IPC for
+DataFrames and Tables, `.npy` for NumPy arrays, raw bytes - falling back to cloudpickle, with a format tag in front of
+the payload so that reads dispatch without guessing.
+
+    Cache(output_serializer=formats.dumps, output_deserializer=formats.loads)
+
+or `Cache(output_stream_serializer=formats.SERIALIZER)` to stream to and from the file. Entries without a tag (i.e.
+written with the default serializer) are read as pickles, so an existing cache can switch over.
+"""
+import logging
+from typing import IO, Union
+
+from deche.serializers import PickleStreamSerializer
+from deche.serializers import StreamSerializer
+
+
+logger = logging.getLogger(__name__)
+
+# Tagged payloads start with MAGIC and a one byte format id (distinct from the codec and content pointer headers)
+MAGIC = b"\x00DCF"
+HEADER_SIZE = len(MAGIC) + 1
+
+FORMATS: dict = {}
+# "module.QualName" of a type -> the format its values are written in
+TYPE_FORMATS: dict = {}
+
+
+def type_name(type_: Union[type, str]) -> str:
+    return type_ if isinstance(type_, str) else f"{type_.__module__}.{type_.__qualname__}"
+
+
+def register_format(cls):
+    """Register a `Format` subclass under its `id` and `name`, for each of its `types`"""
+    assert 0 < cls.id < 256, "Format id must fit in a single byte"
+    instance = cls()
+    FORMATS[cls.id] = FORMATS[cls.name] = instance
+    for type_ in cls.types:
+        TYPE_FORMATS[type_] = instance
+    return cls
+
+
+def register_type(type_: Union[type, str], format_: Union[str, "Format"]):
+    """Write values of exactly `type_` (a type, or its "module.QualName") in `format_` (a registered name or Format)"""
+    TYPE_FORMATS[type_name(type_)] = FORMATS[format_] if isinstance(format_, str) else format_
+
+
+class Format(StreamSerializer):
+    """
+    A serialization format for values of specific types. Subclasses set a unique `name` and single byte `id`, the
+    `types` they handle by "module.QualName" (so that optional libraries aren't imported until used), and implement
+    `dump`/`load`. Types match exactly rather than by subclass, as a format generally can't restore a subclass.
+
+    Anything that can fail to be written in a format should fail in `prepare`, before a byte is written - the file may
+    be a stream (i.e. through a codec) that can't be rewound to write the fallback instead.
+    """
+
+    name: str = ""
+    id: int = 0
+    types: tuple = ()
+
+    @property
+    def header(self) -> bytes:
+        return MAGIC + bytes([self.id])
+
+    def can_dump(self, obj) -> bool:
+        """Whether `obj` can be written in this format, when that's known without converting it"""
+        return True
+
+    def prepare(self, obj):
+        """`obj` converted to what `dump` writes, raising if it can't be written in this format"""
+        return obj
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}()"
+
+
+@register_format
+class PickleFormat(Format, PickleStreamSerializer):
+    """cloudpickle (protocol 5); the fallback for every type without a format, or whose format fails to write it"""
+
+    name = "pickle"
+    id = 1
+
+
+@register_format
+class BytesFormat(Format):
+    name = "bytes"
+    id = 2
+    types = ("builtins.bytes",)
+
+    def dump(self, obj, f):
+        f.write(obj)
+
+    def load(self, f):
+        return f.read()
+
+
+@register_format
+class NumpyFormat(Format):
+    """The `.npy` format; arrays of Python objects can't be written without pickling, so fall back"""
+
+    name = "npy"
+    id = 3
+    types = ("numpy.ndarray",)
+
+    def can_dump(self, obj):
+        return not obj.dtype.hasobject
+
+    def dump(self, obj, f):
+        import numpy as np
+
+        np.save(f, obj, allow_pickle=False)
+
+    def load(self, f):
+        import numpy as np
+
+        return np.load(f, allow_pickle=False)
+
+
+@register_format
+class ArrowFormat(Format):
+    """pyarrow Tables as an Arrow IPC stream"""
+
+    name = "arrow"
+    id = 4
+    types = ("pyarrow.lib.Table",)
+
+    def dump(self, obj, f):
+        import pyarrow as pa
+
+        with pa.ipc.new_stream(f, obj.schema) as writer:
+            writer.write_table(obj)
+
+    def load(self, f):
+        import pyarrow as pa
+
+        return pa.ipc.open_stream(f).read_all()
+
+
+def _arrow_lossless(values) -> bool:
+    """Whether a column (or index level) of `values` round-trips through Arrow unchanged"""
+    import pandas as pd
+
+    dtype = values.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        return _arrow_lossless(dtype.categories)
+    if isinstance(dtype, (pd.SparseDtype, pd.PeriodDtype, pd.IntervalDtype)):
+        return False
+    if isinstance(dtype, pd.StringDtype) or dtype.kind in "biufcmM":
+        return True
+    # Arrow converts objects to a single type: lists and sets to arrays, dicts to padded structs, ints to floats
+    return dtype == object and pd.api.types.infer_dtype(values, skipna=True) in ("string", "empty")
+
+
+def _names_lossless(index) -> bool:
+    # Arrow's pandas metadata stores names as strings
+    return all(isinstance(name, str) or name is None for name in index.names)
+
+
+@register_format
+class PandasFormat(ArrowFormat):
+    """
+    pandas DataFrames as an Arrow IPC stream. Frames with anything Arrow would silently change - object columns that
+    aren't strings, index frequencies, non-string names - are written as pickles instead.
+    """
+
+    name = "pandas-arrow"
+    id = 5
+    # Recent pandas versions report DataFrame's module as "pandas"
+    types = ("pandas.DataFrame", "pandas.core.frame.DataFrame")
+
+    def can_dump(self, obj):
+        import pandas as pd
+
+        columns, index = obj.columns, obj.index
+        if not (_names_lossless(columns) and _names_lossless(index)) or getattr(index, "freq", None) is not None:
+            return False
+        # Column labels are stored as strings too, but integers are restored
+        if not isinstance(columns, pd.RangeIndex) and any(
+            pd.api.types.infer_dtype(columns.get_level_values(level), skipna=False) not in ("string", "integer")
+            for level in range(columns.nlevels)
+        ):
+            return False
+        if not isinstance(index, pd.RangeIndex) and not all(
+            _arrow_lossless(index.get_level_values(level)) for level in range(index.nlevels)
+        ):
+            return False
+        return all(_arrow_lossless(obj.iloc[:, i]) for i in range(obj.shape[1]))
+
+    def prepare(self, obj):
+        import pyarrow as pa
+
+        return pa.Table.from_pandas(obj)
+
+    def dump(self, obj, f):
+        import pyarrow as pa
+
+        super().dump(obj if isinstance(obj, pa.Table) else self.prepare(obj), f)
+
+    def load(self, f):
+        return super().load(f).to_pandas()
+
+
+def format_of(obj) -> Format:
+    """The format to write `obj` in"""
+    format_ = TYPE_FORMATS.get(type_name(type(obj)))
+    if format_ is None or not format_.can_dump(obj):
+        return FORMATS["pickle"]
+    return format_
+
+
+class TypedSerializer(StreamSerializer):
+    """Writes each value in the format registered for its type (see `register_type`), tagged with the format's id"""
+
+    def dump(self, obj, f: IO[bytes]):
+        format_ = format_of(obj)
+        # Settle on a format before writing anything (i.e. Arrow can't convert a column of mixed objects)
+        try:
+            prepared = format_.prepare(obj)
+        except Exception as e:
+            fallback = FORMATS["pickle"]
+            if format_ is fallback:
+                raise
+            logger.debug(f"Converting {type(obj)} to {format_.name} failed ({e!r}), falling back to {fallback.name}")
+            format_, prepared = fallback, obj
+        f.write(format_.header)
+        format_.dump(prepared, f)
+
+    def load(self, f: IO[bytes]):
+        start = f.tell()
+        head = f.read(HEADER_SIZE)
+        if head[: len(MAGIC)] != MAGIC:
+            # Untagged, i.e. written by the default serializer
+            f.seek(start)
+            return FORMATS["pickle"].load(f)
+        try:
+            format_ = FORMATS[head[len(MAGIC)]]
+        except KeyError:
+            raise ValueError(f"Payload written in unknown format id {head[len(MAGIC)]}")
+        return format_.load(f)
+
+
+SERIALIZER = TypedSerializer()
+dumps = SERIALIZER.dumps
+loads = SERIALIZER.loads
@@ -0,0 +1,218 @@
+import hashlib
+import pickle
+import struct
+import sys
+from functools import partial
+from functools import singledispatch
+from typing import Any
+
+import cloudpickle
+
+
+ALGORITHMS = ("blake2b", "sha256", "xxhash")
+
+
+def new_hash(algorithm: str):
+    if algorithm == "blake2b":
+        return hashlib.blake2b(digest_size=32)
+    elif algorithm == "sha256":
+        return hashlib.sha256()
+    elif algorithm == "xxhash":
+        try:
+            import xxhash
+        except ImportError as e:
+            raise ImportError("`key_hasher='xxhash'` requires the `xxhash` package, `pip install xxhash`") from e
+        return xxhash.xxh3_128()
+    raise ValueError(f"Unknown hash algorithm {algorithm!r}, expected one of {ALGORITHMS}")
+
+
+class StructuralHasher:
+    """
+    Compute cache keys by walking an object and feeding its structure and raw buffers into a hash, rather than
+    serializing the whole object first. NumPy arrays are hashed zero-copy via the buffer protocol, pandas objects per
+    column, and anything unknown falls back to its cloudpickle bytes. Keys only depend on the object's values (never on
+    `id` or `hash`), so they are stable across processes.
+
+    Support for further types can be added via `update_hash.register`.
+    """
+
+    def __init__(self, algorithm: str = "blake2b"):
+        new_hash(algorithm)  # fail fast on unknown / unavailable algorithms
+        self.algorithm = algorithm
+
+    def __call__(self, obj: Any) -> str:
+        _register_imported()
+        h = new_hash(self.algorithm)
+        update_hash(obj, h)
+        return h.hexdigest()
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(algorithm={self.algorithm!r})"
+
+
+def _tag(obj, h, *extra):
+    """Prefix each value with its type (and any size information) so that differently shaped inputs never collide"""
+    cls = type(obj)
+    h.update(f"{cls.__module__}.{cls.__qualname__}:{':'.join(map(str, extra))}\0".encode())
+
+
+_dumps = partial(cloudpickle.dumps, protocol=pickle.DEFAULT_PROTOCOL)
+_lazy_registrations: dict = {}
+
+
+def _register_imported():
+    """
+    Register handlers for optional libraries as soon as they have been imported, so that e.g. `np.float64` always
+    dispatches to the same handler regardless of what has been hashed before.
+    """
+    for module in tuple(_lazy_registrations):
+        if module in sys.modules:
+            _lazy_registrations.pop(module)()
+
+
+@singledispatch
+def update_hash(obj, h):
+    data = _dumps(obj)
+    _tag(obj, h, len(data))
+    h.update(data)
+
+
+@update_hash.register(type(None))
+@update_hash.register(bool)
+@update_hash.register(int)
+def _update_scalar(obj, h):
+    _tag(obj, h, obj)
+
+
+@update_hash.register(float)
+def _update_float(obj, h):
+    _tag(obj, h)
+    h.update(struct.pack("<d", obj))
+
+
+@update_hash.register(complex)
+def _update_complex(obj, h):
+    _tag(obj, h)
+    h.update(struct.pack("<dd", obj.real, obj.imag))
+
+
+@update_hash.register(str)
+def _update_str(obj, h):
+    data = obj.encode("utf-8", "surrogatepass")
+    _tag(obj, h, len(data))
+    h.update(data)
+
+
+@update_hash.register(bytes)
+@update_hash.register(bytearray)
+@update_hash.register(memoryview)
+def _update_bytes(obj, h):
+    view = memoryview(obj).cast("B")
+    _tag(obj, h, view.nbytes)
+    h.update(view)
+
+
+@update_hash.register(tuple)
+@update_hash.register(list)
+def _update_sequence(obj, h):
+    _tag(obj, h, len(obj))
+    for item in obj:
+        update_hash(item, h)
+
+
+@update_hash.register(dict)
+def _update_mapping(obj, h):
+    _tag(obj, h, len(obj))
+    for key, value in obj.items():
+        update_hash(key, h)
+        update_hash(value, h)
+
+
+@update_hash.register(set)
+@update_hash.register(frozenset)
+def _update_set(obj, h):
+    # Set iteration order depends on `hash`, which is randomised per process for str/bytes; sort member digests instead
+    _tag(obj, h, len(obj))
+    for digest in sorted(_digest(item) for item in obj):
+        h.update(digest)
+
+
+def _digest(obj):
+    h = hashlib.blake2b(digest_size=32)
+    update_hash(obj, h)
+    return h.digest()
+
+
+def _register_numpy():
+    import numpy as np
+
+    @update_hash.register(np.ndarray)
+    def _update_ndarray(obj, h):
+        if obj.dtype.hasobject:
+            return update_hash.dispatch(object)(obj, h)
+        _tag(obj, h, obj.dtype.str, obj.shape)
+        # A view (no copy) for already contiguous arrays
+        h.update(np.ascontiguousarray(obj).view(np.uint8).data)
+
+    @update_hash.register(np.generic)
+    def _update_numpy_scalar(obj, h):
+        if obj.dtype.hasobject:
+            return update_hash.dispatch(object)(obj, h)
+        _tag(obj, h, obj.dtype.str)
+        h.update(obj.tobytes())
+
+
+def _update_pandas_values(obj, h):
+    import pandas as pd
+
+    if isinstance(obj.dtype, pd.CategoricalDtype):
+        # Codes into the categories, which are hashed with their own dtype
+        update_hash(obj.array.categories, h)
+        update_hash(obj.array.codes, h)
+        return
+    if obj.dtype != object and obj.dtype.kind not in "biufcmM":
+        # Other extension dtypes (i.e. strings) hold values of a single type, so their str is unambiguous
+        update_hash(pd.util.hash_pandas_object(obj, index=False).to_numpy(), h)
+        return
+    values = obj.to_numpy()
+    if not values.dtype.hasobject:
+        update_hash(values, h)
+        return
+    # `hash_pandas_object` hashes objects by their str (so 1 and "1" collide) and fails on unhashable ones (lists)
+    for value in values:
+        update_hash(value, h)
+
+
+def _register_pandas():
+    import pandas as pd
+
+    @update_hash.register(pd.Index)
+    def _update_index(obj, h):
+        _tag(obj, h, obj.dtype, len(obj))
+        update_hash(list(obj.names), h)
+        if isinstance(obj, pd.MultiIndex):
+            for level in range(obj.nlevels):
+                _update_pandas_values(obj.get_level_values(level), h)
+        else:
+            _update_pandas_values(obj, h)
+
+    @update_hash.register(pd.Series)
+    def _update_series(obj, h):
+        _tag(obj, h, obj.dtype, len(obj))
+        update_hash(obj.name, h)
+        update_hash(obj.index, h)
+        _update_pandas_values(obj, h)
+
+    @update_hash.register(pd.DataFrame)
+    def _update_dataframe(obj, h):
+        _tag(obj, h, obj.shape)
+        update_hash(obj.index, h)
+        update_hash(obj.columns, h)
+        for i, dtype in enumerate(obj.dtypes):
+            # Numeric columns are views onto their block, so this does not copy the frame
+            _tag(obj, h, i, dtype)
+            _update_pandas_values(obj.iloc[:, i], h)
+
+
+_lazy_registrations["numpy"] = _register_numpy
+_lazy_registrations["pandas"] = _register_pandas
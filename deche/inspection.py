@@ -14,9 +14,89 @@ def get_func_signature(f):
 
 def args_kwargs_to_kwargs(func, args, kwargs):
     sig = get_func_signature(func)
-    bound_args = sig.bind(*args, **kwargs)
+    return _bound_to_kwargs(sig.bind(*args, **kwargs))
+
+
+def _bound_to_kwargs(bound_args):
     bound_args.apply_defaults()
     all_kwargs = bound_args.arguments
     assert len(all_kwargs.pop("args", [])) == 0
     all_kwargs.update(all_kwargs.pop("kwargs", {}))
     return frozendict(all_kwargs)
+
+
+def kwargs_binder(func):  # noqa: C901
+    """
+    Resolve the signature of `func` once and return a `binder(args, kwargs)` equivalent to
+    `args_kwargs_to_kwargs(func, args, kwargs)`.
+
+    Functions made up of plain positional-or-keyword / keyword-only parameters (plus an optional `**kwargs`) are bound
+    directly from a precomputed plan; anything else (or any call that would not bind cleanly) falls back to
+    `inspect.Signature.bind` so that results and errors are identical.
+    """
+    spec = inspect.getfullargspec(func)
+    varargs_error = None
+    if spec.varargs not in (None, "_"):
+        varargs_error = f"deche function `{func.__name__}` contains varargs `{spec.varargs}`"
+    sig = inspect.signature(func)
+
+    def slow(args, kwargs):
+        return _bound_to_kwargs(sig.bind(*args, **kwargs))
+
+    plan = _binding_plan(sig)
+    if plan is None:
+
+        def binder(args, kwargs):
+            assert varargs_error is None, varargs_error
+            return slow(args, kwargs)
+
+        return binder
+
+    positional, names, defaults, has_var_keyword = plan
+    n_positional = len(positional)
+
+    def binder(args, kwargs):
+        assert varargs_error is None, varargs_error
+        if len(args) > n_positional:
+            return slow(args, kwargs)
+        all_kwargs = dict(zip(positional, args))
+        n_consumed = 0
+        for name in names[len(args) :]:
+            if name in kwargs:
+                all_kwargs[name] = kwargs[name]
+                n_consumed += 1
+            elif name in defaults:
+                all_kwargs[name] = defaults[name]
+            else:
+                return slow(args, kwargs)
+        if n_consumed != len(kwargs):
+            if not has_var_keyword:
+                return slow(args, kwargs)
+            for name, value in kwargs.items():
+                if name not in all_kwargs:
+                    all_kwargs[name] = value
+                elif name in positional[: len(args)]:
+                    return slow(args, kwargs)
+        return frozendict(all_kwargs)
+
+    return binder
+
+
+def _binding_plan(sig):
+    """The (positional names, all names, defaults, has **kwargs) of `sig` if it can be bound directly, else None"""
+    positional, names, defaults = [], [], {}
+    has_var_keyword = False
+    for param in sig.parameters.values():
+        if param.kind == param.VAR_KEYWORD:
+            if param.name != "kwargs":
+                return None
+            has_var_keyword = True
+            continue
+        if param.kind not in (param.POSITIONAL_OR_KEYWORD, param.KEYWORD_ONLY) or param.name in ("args", "kwargs"):
+            return None
+        if param.kind == param.POSITIONAL_OR_KEYWORD:
+            positional.append(param.name)
+        names.append(param.name)
+        if param.default is not param.empty:
+            defaults[param.name] = param.default
+    return tuple(positional), tuple(names), defaults, has_var_keyword
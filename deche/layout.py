@@ -0,0 +1,118 @@
+"""
+Convert a deche cache between the flat layout (`{function}/{key}`) and the sharded one (`{function}/ab/cd/{key}`, see
+`Cache.shard_depth`) in place.
+
+    python -m deche.layout s3://bucket/cache --depth 2                    # dry run, printing the moves
+    python -m deche.layout s3://bucket/cache --depth 2 --apply
+    python -m deche.layout s3://bucket/cache --from-depth 2 --depth 0 --apply     # and back again
+
+Run it while nothing is writing to the cache: entries written concurrently in the old layout are not moved.
+"""
+import argparse
+import json
+import logging
+import sys
+from typing import Optional
+
+from fsspec import AbstractFileSystem
+from fsspec.core import url_to_fs
+
+from deche.aio import thread_map
+from deche.buffers import TEMP_SUFFIX
+from deche.core import Extensions
+from deche.core import entry_kind
+from deche.manifest import Kind
+from deche.util import append_version
+from deche.util import shard_key
+
+
+logger = logging.getLogger(__name__)
+
+
+def key_of(filename: str) -> str:
+    """The key a cache file belongs to, i.e. without its extension or APPEND timestamp"""
+    key, kind = entry_kind(filename)
+    if kind == Kind.append:
+        key, _ = entry_kind(append_version(filename)[0])
+    return key
+
+
+def plan_moves(fs: AbstractFileSystem, path: str, depth: int, width: int = 2, from_depth: int = 0) -> list:
+    """
+    The `(source, destination)` of every cache file under `path` - a function's directory or a whole prefix - that is
+    in a different place when sharded `depth` directories deep rather than `from_depth`.
+    """
+    root = fs._strip_protocol(path).rstrip("/")
+    moves = []
+    for name in fs.find(root):
+        directory, _, filename = name.rpartition("/")
+        # Hidden directories hold deche's own metadata (i.e. the manifest, access stats), which isn't sharded
+        if any(part.startswith(".") for part in directory[len(root) :].split("/")):
+            continue
+        if filename.endswith((Extensions.lock, TEMP_SUFFIX)):
+            continue
+        function, key = name.rsplit("/", from_depth + 1)[0], key_of(filename)
+        destination = f"{function}/{shard_key(key, depth=depth, width=width)[: -len(key)]}{filename}"
+        if destination != name:
+            moves.append((name, destination))
+    return moves
+
+
+def reshard(
+    fs: AbstractFileSystem,
+    path: str,
+    depth: int,
+    width: int = 2,
+    from_depth: int = 0,
+    dry_run: bool = True,
+    max_workers: Optional[int] = None,
+) -> list:
+    """
+    Move every cache file under `path` from a layout sharded `from_depth` directories deep (0 being flat) to one
+    sharded `depth` deep, returning the moves. Nothing is moved if `dry_run`.
+    """
+    moves = plan_moves(fs, path, depth=depth, width=width, from_depth=from_depth)
+    if dry_run or not moves:
+        return moves
+    for directory in sorted({destination.rpartition("/")[0] for _, destination in moves}):
+        fs.makedirs(directory, exist_ok=True)
+    for result in thread_map(lambda move: fs.mv(*move), moves, max_workers):
+        if isinstance(result, Exception):
+            raise result
+    if from_depth:
+        _remove_empty_directories(fs, {source.rpartition("/")[0] for source, _ in moves}, from_depth)
+    logger.info(f"Moved {len(moves)} files under {path} to a layout sharded {depth} deep")
+    return moves
+
+
+def _remove_empty_directories(fs: AbstractFileSystem, directories: set, depth: int):
+    # Shard directories and their parents, deepest first
+    candidates = {directory.rsplit("/", level)[0] for directory in directories for level in range(depth)}
+    for directory in sorted(candidates, key=lambda d: d.count("/"), reverse=True):
+        try:
+            fs.rmdir(directory)
+        except (OSError, NotImplementedError):
+            # Not empty, or already gone (object stores have no directories to remove)
+            pass
+
+
+def main(argv: Optional[list] = None):
+    parser = argparse.ArgumentParser(prog="python -m deche.layout", description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("url", help="Cache prefix or function directory, i.e. s3://bucket/cache")
+    parser.add_argument("--depth", type=int, required=True, help="Shard depth to convert to (0 for flat)")
+    parser.add_argument("--width", type=int, default=2, help="Characters of the key per shard directory")
+    parser.add_argument("--from-depth", type=int, default=0, help="Shard depth the cache currently has")
+    parser.add_argument("--storage-options", type=json.loads, default=None, help="fsspec storage options (JSON)")
+    parser.add_argument("--apply", action="store_true", help="Move files (the default is a dry run)")
+    args = parser.parse_args(argv)
+
+    fs, path = url_to_fs(args.url, **(args.storage_options or {}))
+    moves = reshard(fs, path, depth=args.depth, width=args.width, from_depth=args.from_depth, dry_run=not args.apply)
+    for source, destination in moves:
+        print(f"{source}\t{destination}")
+    print(f"{'Moved' if args.apply else 'Would move'} {len(moves)} files")
+    return moves
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,161 @@
+import asyncio
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from typing import Optional
+
+from fsspec import AbstractFileSystem
+
+from deche.util import modified_time
+
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    De-duplicate concurrent calls for the same key within a process: the first caller runs the call while any others
+    (threads or asyncio tasks, on any loop) wait for and share its result or exception.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict = {}
+
+    def _join(self, key) -> tuple[Future, bool]:
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                return future, False
+            future = self._calls[key] = Future()
+            return future, True
+
+    def _done(self, key, future: Future, result=None, exception=None):
+        with self._lock:
+            self._calls.pop(key, None)
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+
+    def do(self, key, func):
+        future, leader = self._join(key)
+        if not leader:
+            logger.debug(f"Waiting on in-flight call for {key}")
+            return future.result()
+        try:
+            result = func()
+        except BaseException as e:
+            self._done(key, future, exception=e)
+            raise
+        self._done(key, future, result=result)
+        return result
+
+    async def ado(self, key, func):
+        future, leader = self._join(key)
+        if not leader:
+            logger.debug(f"Waiting on in-flight call for {key}")
+            return await asyncio.wrap_future(future)
+        try:
+            result = await func()
+        except BaseException as e:
+            self._done(key, future, exception=e)
+            raise
+        self._done(key, future, result=result)
+        return result
+
+    def __len__(self):
+        return len(self._calls)
+
+
+class Lease:
+    """
+    A cross-process lease, held by creating the lock file `path` with a token unique to this holder. Leases not renewed
+    for `ttl` seconds are assumed to belong to a dead worker and are broken; while held, a heartbeat thread renews the
+    lease (rewrites the lock file) every `ttl / 3` seconds, so a computation may take longer than `ttl`.
+    """
+
+    def __init__(self, fs: AbstractFileSystem, path: str, ttl: float, poll_interval: float = 0.1):
+        self.fs = fs
+        self.path = path
+        self.ttl = ttl
+        self.poll_interval = poll_interval
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}:{uuid.uuid4().hex}".encode()
+        self._stop = threading.Event()
+        self._heartbeat: Optional[threading.Thread] = None
+
+    def acquire(self) -> bool:
+        """
+        Acquire the lease, waiting while another worker holds it.
+
+        Returns True if another worker held the lease while we waited (so its result may now be in the cache).
+        """
+        waited = False
+        while True:
+            if _create_exclusive(self.fs, self.path, self.owner):
+                self._heartbeat = threading.Thread(target=self._renew, name="deche-lease", daemon=True)
+                self._heartbeat.start()
+                return waited
+            try:
+                info = self.fs.info(self.path)
+                holder = self.fs.cat_file(self.path)
+            except FileNotFoundError:
+                # Released between our create and info
+                continue
+            if time.time() - modified_time(info) > self.ttl:
+                logger.debug(f"Breaking expired lease {self.path}")
+                _remove_if_owned(self.fs, self.path, holder)
+                continue
+            waited = True
+            time.sleep(self.poll_interval)
+
+    def release(self):
+        """Release the lease, unless it was broken (and so may now be held by another worker)"""
+        if self._heartbeat is None:
+            return
+        self._stop.set()
+        self._heartbeat.join()
+        self._heartbeat = None
+        if not _remove_if_owned(self.fs, self.path, self.owner):
+            logger.warning(f"Lease {self.path} was broken before it was released")
+
+    def _renew(self):
+        while not self._stop.wait(self.ttl / 3):
+            try:
+                owned = self.fs.cat_file(self.path) == self.owner
+            except FileNotFoundError:
+                owned = False
+            if not owned:
+                logger.warning(f"Lease {self.path} was broken while held")
+                return
+            self.fs.pipe_file(self.path, self.owner)
+
+
+def _remove_if_owned(fs: AbstractFileSystem, path: str, owner: bytes) -> bool:
+    """Remove the lock file `path` if it still holds `owner`'s token, returning whether it did"""
+    try:
+        if fs.cat_file(path) != owner:
+            return False
+        fs.rm(path)
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def _create_exclusive(fs: AbstractFileSystem, path: str, data: bytes) -> bool:
+    try:
+        with fs.open(path, mode="xb") as f:
+            f.write(data)
+        return True
+    except FileExistsError:
+        return False
+    except (ValueError, NotImplementedError):
+        # Filesystem without exclusive create; best effort check-then-write
+        if fs.exists(path):
+            return False
+        fs.pipe_file(path, data)
+        return True
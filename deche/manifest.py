@@ -0,0 +1,281 @@
+import json
+import logging
+import threading
+import time
+import uuid
+from typing import Callable, Optional
+
+from fsspec import AbstractFileSystem
+from fsspec.implementations.local import LocalFileSystem
+from fsspec.implementations.memory import MemoryFileSystem
+
+from deche.aio import cat_many
+
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_DIR = ".manifest"
+LOG_NAME = "log.jsonl"
+# When the manifest was last reconciled with a listing of its directory (see `Manifest.reconcile`)
+RECONCILED_NAME = "reconciled"
+SEGMENT_PREFIX = "seg-"
+INDEX_PREFIX = "index-"
+
+# Compact a directory's manifest once this many files have been read for it
+MAX_FILES = 64
+
+# Longest string input kept verbatim in an input summary
+MAX_SUMMARY_STR = 100
+
+
+class Kind:
+    data = "data"
+    inputs = "inputs"
+    exception = "exc"
+    append = "append"
+
+
+def summarize_inputs(inputs: dict) -> dict:
+    """
+    A small JSON summary of `inputs`: scalars are kept as-is (strings truncated to MAX_SUMMARY_STR), other values are
+    recorded by type name only, as `{"type": name}`.
+    """
+    summary = {}
+    for name, value in inputs.items():
+        if value is None or isinstance(value, (bool, int, float)):
+            summary[name] = value
+        elif isinstance(value, str):
+            summary[name] = value[:MAX_SUMMARY_STR]
+        else:
+            summary[name] = {"type": type(value).__name__}
+    return summary
+
+
+def _is_exact(value) -> bool:
+    """Whether a summary value is the input value itself, rather than a truncation or type name"""
+    return not isinstance(value, dict) and not (isinstance(value, str) and len(value) >= MAX_SUMMARY_STR)
+
+
+def match_value(value, expected) -> bool:
+    """`expected` is either a value (compared by equality, without treating bools as ints) or a predicate"""
+    if callable(expected):
+        return bool(expected(value))
+    return value == expected and isinstance(value, bool) == isinstance(expected, bool)
+
+
+def match_summary(summary: dict, filters: dict) -> Optional[bool]:
+    """Whether an input summary matches `filters`; None if only the full inputs can tell"""
+    undecided = False
+    for name, expected in filters.items():
+        if name not in summary:
+            return False
+        if not _is_exact(summary[name]):
+            undecided = True
+        elif not match_value(summary[name], expected):
+            return False
+    return None if undecided else True
+
+
+class Manifest:
+    """
+    An index of the entries written to each function's cache directory, so that listings and hit checks don't need
+    to list (and page through) the directory itself.
+
+    Each directory's manifest lives under `{directory}/.manifest/` as JSON lines recording puts and removals of
+    `(key, kind)` entries, resolved last-writer-wins by timestamp. Filesystems that can append (local, memory) append
+    to a single log; object stores get one new segment file per flush, which are periodically compacted into an index.
+    Reads are incremental - only files (or the part of the log) not yet seen are fetched.
+
+    Given a `scan` of what is actually in a directory, its manifest is reconciled with it when first read if it has
+    never been (i.e. a cache that already had entries when the manifest was turned on), and again once it's
+    `reconcile_interval` seconds old - catching entries removed by other tools or by hand.
+    """
+
+    def __init__(
+        self,
+        fs: AbstractFileSystem,
+        append: Optional[bool] = None,
+        scan: Optional[Callable[[str], dict]] = None,
+        reconcile_interval: Optional[float] = None,
+    ):
+        self.fs = fs
+        self.append = isinstance(fs, (LocalFileSystem, MemoryFileSystem)) if append is None else append
+        self.scan = scan
+        self.reconcile_interval = reconcile_interval
+        self._lock = threading.Lock()
+        self._pending: dict = {}
+        self._state: dict = {}
+        self._offsets: dict = {}
+        self._reconciled: dict = {}
+
+    def add(self, directory: str, key: str, kind: str, **fields):
+        """Record a put of `(key, kind)`; fields from multiple adds before a flush are merged"""
+        with self._lock:
+            pending = self._pending.setdefault(directory, {})
+            record = pending.get((key, kind))
+            if record is None or record["op"] != "put":
+                record = pending[(key, kind)] = {"key": key, "kind": kind, "op": "put", "mtime": time.time()}
+            record.update({k: v for k, v in fields.items() if v is not None})
+            record["ts"] = time.time()
+
+    def remove(self, directory: str, key: str, kind: str):
+        with self._lock:
+            self._pending.setdefault(directory, {})[(key, kind)] = {
+                "key": key,
+                "kind": kind,
+                "op": "rm",
+                "ts": time.time(),
+            }
+
+    def flush(self):
+        """Write any pending records, with a single request per directory"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for directory, records in pending.items():
+            if not records:
+                continue
+            data = "".join(json.dumps(record) + "\n" for record in records.values()).encode()
+            manifest_dir = f"{directory}/{MANIFEST_DIR}"
+            self.fs.makedirs(manifest_dir, exist_ok=True)
+            if self.append:
+                with self.fs.open(f"{manifest_dir}/{LOG_NAME}", mode="ab") as f:
+                    f.write(data)
+            else:
+                self.fs.pipe_file(
+                    f"{manifest_dir}/{SEGMENT_PREFIX}{time.time_ns():020d}-{uuid.uuid4().hex}.jsonl", data
+                )
+            logger.debug(f"Recorded {len(records)} manifest entries for {directory}")
+
+    def entries(self, directory: str, kind: Optional[str] = None) -> dict:
+        """The live `{key: record}` (or `{(key, kind): record}` if `kind` is None) for `directory`"""
+        self.flush()
+        state = self._refresh(directory)
+        if self._needs_reconcile(directory):
+            self.reconcile(directory)
+        with self._lock:
+            live = {k: record for k, record in state.items() if record["op"] == "put"}
+        if kind is None:
+            return live
+        return {key: record for (key, record_kind), record in live.items() if record_kind == kind}
+
+    def _refresh(self, directory: str) -> dict:
+        manifest_dir = f"{directory}/{MANIFEST_DIR}"
+        self.fs.invalidate_cache(manifest_dir)
+        try:
+            files = sorted(self.fs.ls(manifest_dir, detail=False))
+        except FileNotFoundError:
+            files = []
+        with self._lock:
+            state = self._state.setdefault(directory, {})
+            offsets = self._offsets.setdefault(directory, {})
+            # Forget files removed by a compaction; their records are in the index that replaced them
+            for name in set(offsets) - set(files):
+                offsets.pop(name)
+            to_read = [
+                name
+                for name in files
+                if not name.endswith(RECONCILED_NAME) and (name.endswith(LOG_NAME) or name not in offsets)
+            ]
+        self._apply(directory, state, offsets, to_read)
+        if not self.append and len(offsets) > MAX_FILES:
+            self.compact(directory)
+        return state
+
+    def _apply(self, directory: str, state: dict, offsets: dict, files: list):
+        logs = [name for name in files if name.endswith(LOG_NAME)]
+        others = [name for name in files if name not in logs]
+        datas = [self._read_log(name, offsets.get(name, 0)) for name in logs]
+        datas.extend(cat_many(self.fs, others))
+        with self._lock:
+            for name, data in zip(logs + others, datas):
+                if isinstance(data, FileNotFoundError):
+                    continue
+                if isinstance(data, Exception):
+                    raise data
+                # Only consume complete lines; a concurrent writer may be midway through appending one
+                complete = data[: data.rfind(b"\n") + 1]
+                offsets[name] = offsets.get(name, 0) + len(complete) if name in logs else len(data)
+                for line in complete.splitlines():
+                    record = json.loads(line)
+                    current = state.get((record["key"], record["kind"]))
+                    if current is None or record["ts"] >= current["ts"]:
+                        state[(record["key"], record["kind"])] = record
+
+    def _needs_reconcile(self, directory: str) -> bool:
+        if self.scan is None:
+            return False
+        reconciled = self._reconciled.get(directory)
+        if reconciled is not None and not self._is_stale(reconciled):
+            return False
+        # Another process may have reconciled it since
+        try:
+            reconciled = float(self.fs.cat_file(f"{directory}/{MANIFEST_DIR}/{RECONCILED_NAME}"))
+        except FileNotFoundError:
+            return True
+        self._reconciled[directory] = reconciled
+        return self._is_stale(reconciled)
+
+    def _is_stale(self, reconciled: float) -> bool:
+        return self.reconcile_interval is not None and time.time() - reconciled >= self.reconcile_interval
+
+    def reconcile(self, directory: str):
+        """
+        Bring the manifest in line with a `scan` of `directory`: record puts for entries it's missing and removals for
+        entries no longer there. Records made since the scan started win over what it found.
+        """
+        started = time.time()
+        found = self.scan(directory)
+        state = self._refresh(directory)
+        changes = {}
+        with self._lock:
+            for entry, record in state.items():
+                if entry not in found and record["op"] == "put" and record["ts"] < started:
+                    changes[entry] = {"key": entry[0], "kind": entry[1], "op": "rm", "ts": started}
+            for entry, fields in found.items():
+                record = state.get(entry)
+                if record is None or (record["op"] == "rm" and record["ts"] < started):
+                    changes[entry] = {"key": entry[0], "kind": entry[1], "op": "put", "ts": started, **fields}
+            pending = self._pending.setdefault(directory, {})
+            for entry, record in changes.items():
+                if entry not in pending or pending[entry]["ts"] < started:
+                    pending[entry] = record
+        self.flush()
+        self._refresh(directory)
+        self.fs.makedirs(f"{directory}/{MANIFEST_DIR}", exist_ok=True)
+        self.fs.pipe_file(f"{directory}/{MANIFEST_DIR}/{RECONCILED_NAME}", str(started).encode())
+        self._reconciled[directory] = started
+        logger.debug(f"Reconciled the manifest for {directory} with a listing ({len(changes)} changes)")
+
+    def _read_log(self, path: str, offset: int):
+        try:
+            with self.fs.open(path, mode="rb") as f:
+                f.seek(offset)
+                return f.read()
+        except FileNotFoundError as e:
+            return e
+
+    def compact(self, directory: str):
+        """
+        Replace the manifest files read so far with a single index of their latest records. Only safe for segment
+        manifests (`append=False`), whose files are never modified once written.
+
+        Removals are kept, so that a reader still holding an older put sees them, until they are `reconcile_interval`
+        seconds old - by which point such a reader reconciles with a listing anyway.
+        """
+        with self._lock:
+            state = self._state.get(directory, {})
+            offsets = self._offsets.get(directory, {})
+            replaced = list(offsets)
+            kept = [record for record in state.values() if record["op"] == "put" or not self._is_stale(record["ts"])]
+        index = f"{directory}/{MANIFEST_DIR}/{INDEX_PREFIX}{time.time_ns():020d}-{uuid.uuid4().hex}.jsonl"
+        self.fs.pipe_file(index, "".join(json.dumps(record) + "\n" for record in kept).encode())
+        for name in replaced:
+            try:
+                self.fs.rm(name)
+            except FileNotFoundError:
+                pass
+        with self._lock:
+            for name in replaced:
+                offsets.pop(name, None)
+            offsets[index] = 0
+        logger.debug(f"Compacted {len(replaced)} manifest files for {directory}")
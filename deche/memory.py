@@ -0,0 +1,123 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from collections.abc import Iterable
+from typing import Any, Optional
+
+
+MISSING = object()
+
+
+class MemoryTier:
+    """
+    A bounded, in-process LRU store that sits in front of the fsspec backend.
+
+    Entries are keyed by their full cache path and hold the deserialized object alongside the size of its serialized
+    payload. Once `max_bytes` or `max_entries` is exceeded, the least recently used entries are evicted. Entries with
+    an `expires_at` (epoch seconds) are dropped on access once that time has passed.
+
+    Values are deep-copied on the way in and out, so that a caller mutating the object it was handed (whether it was
+    just computed or came from a hit) can't change what later hits return. A hit is served without going back to the
+    backend, so the cache's `cache_validators` are not run for it; expiry is still honoured through `expires_at`.
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None, max_entries: Optional[int] = None):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._data: OrderedDict = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, path):
+        return self.get(path) is not MISSING
+
+    @property
+    def nbytes(self) -> int:
+        return self._nbytes
+
+    def get(self, path: str, default=MISSING):
+        with self._lock:
+            entry = self._data.get(path)
+            if entry is None:
+                return default
+            value, _, expires_at = entry
+            if expires_at is not None and time.time() >= expires_at:
+                self._discard(path)
+                return default
+            self._data.move_to_end(path)
+        return copy.deepcopy(value)
+
+    def put(self, path: str, value: Any, nbytes: int, expires_at: Optional[float] = None):
+        if self.max_bytes is not None and nbytes > self.max_bytes:
+            # Never let a single entry flush the whole tier
+            return
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._discard(path)
+            self._data[path] = (value, nbytes, expires_at)
+            self._nbytes += nbytes
+            self._evict()
+
+    def pop(self, path: str):
+        with self._lock:
+            self._discard(path)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._nbytes = 0
+
+    def _discard(self, path):
+        entry = self._data.pop(path, None)
+        if entry is not None:
+            self._nbytes -= entry[1]
+
+    def _evict(self):
+        while self._data and (
+            (self.max_bytes is not None and self._nbytes > self.max_bytes)
+            or (self.max_entries is not None and len(self._data) > self.max_entries)
+        ):
+            _, (_, nbytes, _) = self._data.popitem(last=False)
+            self._nbytes -= nbytes
+
+
+class ExceptionIndex:
+    """
+    The keys with a cached exception in each function directory, listed once (and again every `refresh` seconds) so
+    that a miss only asks the backend for an exception when one may exist. Exceptions written by this process are
+    known immediately, those written by others after the next refresh.
+    """
+
+    def __init__(self, list_keys: Callable[[str], Iterable[str]], refresh: Optional[float] = 60.0):
+        self._list_keys = list_keys
+        self.refresh = refresh
+        self._lock = threading.Lock()
+        # {directory: (listed_at, keys)}
+        self._listed: dict = {}
+        # {directory: keys} added by this process, so that a refresh racing a write doesn't lose them
+        self._local: dict = {}
+
+    def might_contain(self, directory: str, key: str) -> bool:
+        listed = self._listed.get(directory)
+        if listed is None or (self.refresh is not None and time.monotonic() - listed[0] > self.refresh):
+            listed_at, keys = time.monotonic(), set(self._list_keys(directory))
+            with self._lock:
+                listed = self._listed[directory] = (listed_at, keys | self._local.get(directory, set()))
+        return key in listed[1]
+
+    def add(self, directory: str, key: str):
+        with self._lock:
+            self._local.setdefault(directory, set()).add(key)
+            if directory in self._listed:
+                self._listed[directory][1].add(key)
+
+    def discard(self, directory: str, key: str):
+        with self._lock:
+            self._local.get(directory, set()).discard(key)
+            if directory in self._listed:
+                self._listed[directory][1].discard(key)
@@ -0,0 +1,162 @@
+import bisect
+import http.server
+import threading
+from typing import Callable, Optional
+
+
+# Histogram bucket upper bounds, in seconds
+BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 60.0)
+
+COUNTERS = (
+    "hits",
+    "memory_hits",
+    "misses",
+    "exception_hits",
+    "validator_failures",
+    "bytes_read",
+    "bytes_written",
+    "compute_seconds_saved",
+)
+HISTOGRAMS = ("serialize_seconds", "deserialize_seconds", "read_seconds", "write_seconds", "compute_seconds")
+
+
+class Histogram:
+    def __init__(self):
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+        self.buckets = [0] * (len(BUCKETS) + 1)
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        self.buckets[bisect.bisect_left(BUCKETS, value)] += 1
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.sum / self.count if self.count else None
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min,
+            "max": self.max,
+            "mean": self.mean,
+            "buckets": dict(zip([*BUCKETS, float("inf")], self.buckets)),
+        }
+
+
+class Metrics:
+    """Counters and latency histograms for one cached function (directory), shared by every Cache in the process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counters = dict.fromkeys(COUNTERS, 0)
+            self.histograms = {name: Histogram() for name in HISTOGRAMS}
+
+    def incr(self, name: str, value: float = 1):
+        with self._lock:
+            self.counters[name] += value
+
+    def observe(self, name: str, value: float):
+        with self._lock:
+            self.histograms[name].observe(value)
+
+    def hit(self) -> float:
+        """Count a hit, crediting (and returning) the mean compute time seen so far as time saved"""
+        with self._lock:
+            saved = self.histograms["compute_seconds"].mean or 0.0
+            self.counters["hits"] += 1
+            self.counters["compute_seconds_saved"] += saved
+            return saved
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            lookups = self.counters["hits"] + self.counters["exception_hits"] + self.counters["misses"]
+            return {
+                **self.counters,
+                "hit_rate": (self.counters["hits"] + self.counters["exception_hits"]) / lookups if lookups else None,
+                **{name: histogram.to_dict() for name, histogram in self.histograms.items()},
+            }
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: dict = {}
+
+    def get(self, function: str) -> Metrics:
+        metrics = self._metrics.get(function)
+        if metrics is None:
+            with self._lock:
+                metrics = self._metrics.setdefault(function, Metrics())
+        return metrics
+
+    def items(self):
+        with self._lock:
+            return list(self._metrics.items())
+
+    def clear(self):
+        with self._lock:
+            self._metrics.clear()
+
+
+REGISTRY = Registry()
+
+# An exporter is called as `exporter(function, metric, value)` for every counter increment and histogram observation,
+# i.e. to forward to OpenTelemetry instruments or statsd.
+Exporter = Callable[[str, str, float], None]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def prometheus_text(registry: Registry = REGISTRY) -> str:
+    """Every function's metrics in the Prometheus text exposition format"""
+    lines = []
+    snapshots = [(_escape(function), metrics.snapshot()) for function, metrics in sorted(registry.items())]
+    for name in COUNTERS:
+        lines.append(f"# TYPE deche_{name}_total counter")
+        for function, snapshot in snapshots:
+            lines.append(f'deche_{name}_total{{function="{function}"}} {snapshot[name]}')
+    for name in HISTOGRAMS:
+        lines.append(f"# TYPE deche_{name} histogram")
+        for function, snapshot in snapshots:
+            histogram = snapshot[name]
+            cumulative = 0
+            for bound, count in histogram["buckets"].items():
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'deche_{name}_bucket{{function="{function}",le="{le}"}} {cumulative}')
+            lines.append(f'deche_{name}_sum{{function="{function}"}} {histogram["sum"]}')
+            lines.append(f'deche_{name}_count{{function="{function}"}} {histogram["count"]}')
+    return "\n".join(lines) + "\n"
+
+
+def start_http_server(port: int, addr: str = "", registry: Registry = REGISTRY) -> http.server.ThreadingHTTPServer:
+    """Serve `prometheus_text` for scraping from a daemon thread, without any external dependencies"""
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = prometheus_text(registry).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer((addr, port), Handler)
+    threading.Thread(target=server.serve_forever, name="deche-metrics", daemon=True).start()
+    return server
@@ -0,0 +1,253 @@
+import asyncio
+import functools
+import io
+import multiprocessing
+import pickle
+import struct
+import threading
+from concurrent.futures import Executor
+from concurrent.futures import Future
+from concurrent.futures import ProcessPoolExecutor
+from typing import IO, Any, Callable, Optional, Union
+
+import cloudpickle
+
+from deche.codecs import OFFLOAD_THRESHOLD
+
+
+class StreamSerializer:
+    """
+    A serializer that writes to, and reads from, an open (fsspec) file object directly, so that large outputs are never
+    materialized as one extra bytes object. Subclasses implement `dump` and `load`; `dumps` and `loads` are provided
+    for the code paths that need bytes.
+    """
+
+    def dump(self, obj: Any, f: IO[bytes]) -> None:
+        raise NotImplementedError
+
+    def load(self, f: IO[bytes]) -> Any:
+        raise NotImplementedError
+
+    def dumps(self, obj: Any) -> bytes:
+        buffer = io.BytesIO()
+        self.dump(obj, buffer)
+        return buffer.getvalue()
+
+    def loads(self, data: bytes) -> Any:
+        return self.load(io.BytesIO(data))
+
+    def load_buffer(self, buffer: memoryview) -> Any:
+        """Load from a read-only view of the whole file (i.e. a memory map); override to avoid copying out of it"""
+        return self.load(io.BytesIO(buffer))
+
+
+class PickleStreamSerializer(StreamSerializer):
+    """
+    cloudpickle straight to / from the file. With protocol 5, large buffers (NumPy arrays, pandas blocks) are written
+    from and read into memory directly rather than being copied into an intermediate pickle bytes object.
+    """
+
+    def __init__(self, protocol: int = 5):
+        self.protocol = protocol
+
+    def dump(self, obj, f):
+        cloudpickle.dump(obj, f, protocol=self.protocol)
+
+    def load(self, f):
+        return cloudpickle.load(f)
+
+
+class ZeroCopyPickleSerializer(StreamSerializer):
+    """
+    Pickle protocol 5 with the out-of-band buffers (NumPy arrays, pandas blocks) stored aligned after the pickle
+    stream, so that `load_buffer` can return arrays that are read-only views over a memory-mapped file rather than
+    copies of it.
+
+    Layout: magic, pickle length, buffer count, (offset, length) per buffer, the pickle stream, then the buffers.
+    """
+
+    magic = b"DECHEPB5"
+    alignment = 64
+    _header = struct.Struct("<QI")
+    _entry = struct.Struct("<QQ")
+
+    def dump(self, obj, f):
+        buffers = []
+        payload = cloudpickle.dumps(obj, protocol=5, buffer_callback=buffers.append)
+        views = [buffer.raw() for buffer in buffers]
+        position = len(self.magic) + self._header.size + self._entry.size * len(views) + len(payload)
+        entries = []
+        for view in views:
+            position += -position % self.alignment
+            entries.append((position, view.nbytes))
+            position += view.nbytes
+        f.write(self.magic)
+        f.write(self._header.pack(len(payload), len(views)))
+        for entry in entries:
+            f.write(self._entry.pack(*entry))
+        f.write(payload)
+        position = len(self.magic) + self._header.size + self._entry.size * len(views) + len(payload)
+        for (offset, nbytes), view in zip(entries, views):
+            f.write(bytes(offset - position))
+            f.write(view)
+            position = offset + nbytes
+
+    def _read_header(self, read) -> tuple[int, list]:
+        if read(len(self.magic)) != self.magic:
+            raise ValueError("Not a ZeroCopyPickleSerializer file")
+        payload_size, count = self._header.unpack(read(self._header.size))
+        entries = [self._entry.unpack(read(self._entry.size)) for _ in range(count)]
+        return payload_size, entries
+
+    def load(self, f):
+        payload_size, entries = self._read_header(f.read)
+        payload = f.read(payload_size)
+        position = len(self.magic) + self._header.size + self._entry.size * len(entries) + payload_size
+        buffers = []
+        for offset, nbytes in entries:
+            f.read(offset - position)
+            # Read each buffer into its own writable memory, as a regular unpickle would
+            buffer = bytearray(nbytes)
+            f.readinto(buffer)
+            buffers.append(buffer)
+            position = offset + nbytes
+        return pickle.loads(payload, buffers=buffers)
+
+    def load_buffer(self, buffer):
+        position = 0
+
+        def read(n):
+            nonlocal position
+            position += n
+            return buffer[position - n : position]
+
+        payload_size, entries = self._read_header(read)
+        payload = read(payload_size)
+        return pickle.loads(payload, buffers=[buffer[offset : offset + nbytes] for offset, nbytes in entries])
+
+
+class ArrowStreamSerializer(StreamSerializer):
+    """
+    pandas DataFrames and pyarrow Tables as an Arrow IPC stream, written and read one record batch at a time. Requires
+    `pyarrow`.
+    """
+
+    def dump(self, obj, f):
+        import pyarrow as pa
+
+        table = pa.Table.from_pandas(obj) if not isinstance(obj, pa.Table) else obj
+        with pa.ipc.new_stream(f, table.schema) as writer:
+            writer.write_table(table)
+
+    def load(self, f):
+        import pyarrow as pa
+
+        return self._from_table(pa.ipc.open_stream(f).read_all())
+
+    def load_buffer(self, buffer):
+        import pyarrow as pa
+
+        # Tables read from a pyarrow buffer reference its memory rather than copying it
+        return self._from_table(pa.ipc.open_stream(pa.py_buffer(buffer)).read_all())
+
+    @staticmethod
+    def _from_table(table):
+        return table.to_pandas() if table.schema.pandas_metadata is not None else table
+
+
+def payload_nbytes(obj) -> int:
+    """
+    A cheap estimate of the size of `obj`'s data: exact for bytes and buffers (NumPy arrays, pyarrow Tables, pandas
+    objects), and 0 for anything whose size isn't known without walking it.
+    """
+    if isinstance(obj, (bytes, bytearray, memoryview)):
+        return memoryview(obj).nbytes
+    nbytes = getattr(obj, "nbytes", None)
+    if isinstance(nbytes, int):
+        return nbytes
+    memory_usage = getattr(obj, "memory_usage", None)
+    if callable(memory_usage):
+        try:
+            usage = memory_usage(deep=False)
+        except TypeError:
+            return 0
+        return int(usage.sum()) if hasattr(usage, "sum") else int(usage)
+    return 0
+
+
+_POOLS: dict = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def _process_pool(max_workers: Optional[int] = None) -> ProcessPoolExecutor:
+    """A process pool shared by every `OffloadedSerializer` wanting `max_workers`"""
+    with _POOLS_LOCK:
+        if max_workers not in _POOLS:
+            # Forking a process with running threads (i.e. fsspec's IO loop) can deadlock the child
+            context = multiprocessing.get_context("spawn")
+            _POOLS[max_workers] = ProcessPoolExecutor(max_workers=max_workers, mp_context=context)
+        return _POOLS[max_workers]
+
+
+@functools.lru_cache(maxsize=32)
+def _unpickle_func(payload: bytes) -> Callable:
+    return cloudpickle.loads(payload)
+
+
+def _call_offloaded(payload: bytes, value):
+    return _unpickle_func(payload)(value)
+
+
+class OffloadedSerializer:
+    """
+    Runs `func` - a serializer or deserializer for any of the `Cache` fields, i.e. `DEFAULT_SERIALIZER` - on
+    `executor` for payloads of at least `threshold` bytes (see `payload_nbytes`). Smaller payloads, and values of
+    unknown size, run inline.
+
+    Async deche functions await the executor, so the event loop (and other handlers on it) carry on while a large
+    value is (de)serialized; sync callers block on it, as they would inline. The default `executor="process"` is a
+    spawned process pool shared between instances: the value is pickled to reach it, so it only pays off when `func`
+    does much more than pickle (columnar encoding, compression) of a value that is mostly raw buffers (NumPy arrays,
+    pandas blocks), which pickle as little more than a copy. A `ThreadPoolExecutor` avoids that copy, but only lets
+    other work run if `func` releases the GIL, as compression codecs and Arrow's IPC writer do and pickle does not.
+    """
+
+    def __init__(
+        self,
+        func: Callable,
+        executor: Union[str, Executor] = "process",
+        threshold: int = OFFLOAD_THRESHOLD,
+        max_workers: Optional[int] = None,
+    ):
+        assert executor == "process" or isinstance(executor, Executor), "executor must be 'process' or an Executor"
+        self.func = func
+        self.executor = executor
+        self.threshold = threshold
+        self.max_workers = max_workers
+
+    @functools.cached_property
+    def _payload(self) -> bytes:
+        # `func` pickled once, to send to worker processes
+        return cloudpickle.dumps(self.func)
+
+    def submit(self, value) -> Optional[Future]:
+        """Start `func(value)` on the executor, or return None if `value` is small enough to run inline"""
+        if payload_nbytes(value) < self.threshold:
+            return None
+        if self.executor == "process":
+            return _process_pool(self.max_workers).submit(_call_offloaded, self._payload, value)
+        if isinstance(self.executor, ProcessPoolExecutor):
+            return self.executor.submit(_call_offloaded, self._payload, value)
+        return self.executor.submit(self.func, value)
+
+    def __call__(self, value):
+        future = self.submit(value)
+        return self.func(value) if future is None else future.result()
+
+    async def acall(self, value):
+        """`self(value)`, awaiting the executor rather than blocking the event loop (or a thread) on it"""
+        future = self.submit(value)
+        return self.func(value) if future is None else await asyncio.wrap_future(future)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.func!r}, executor={self.executor!r}, threshold={self.threshold})"
@@ -0,0 +1,240 @@
+"""
+Garbage collection for deche caches: find expired entries, orphaned inputs, old CacheExpiryMode.APPEND versions and
+unreferenced content-addressed blobs with a single recursive listing, and remove them in batches.
+
+    python -m deche.sweep s3://bucket/cache --ttl 86400 --keep-versions 3           # dry run report
+    python -m deche.sweep s3://bucket/cache --ttl 86400 --keep-versions 3 --delete
+"""
+import argparse
+import json
+import logging
+import sys
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Optional
+
+from fsspec import AbstractFileSystem
+from fsspec.core import url_to_fs
+
+from deche.aio import cat_many
+from deche.buffers import TEMP_SUFFIX
+from deche.content import BLOB_DIR
+from deche.content import POINTER_SIZE
+from deche.content import blob_path
+from deche.content import pointer_digest
+from deche.core import Extensions
+from deche.core import entry_kind
+from deche.manifest import MANIFEST_DIR
+from deche.manifest import Kind
+from deche.manifest import Manifest
+from deche.util import append_version
+from deche.util import modified_time
+
+
+logger = logging.getLogger(__name__)
+
+# Paths per `fs.rm` call
+RM_BATCH_SIZE = 1000
+
+# Orphaned inputs younger than this may belong to a call that is still running
+DEFAULT_ORPHAN_MIN_AGE = 3600.0
+
+
+@dataclass
+class SweepReport:
+    expired: list = field(default_factory=list)
+    orphaned_inputs: list = field(default_factory=list)
+    old_versions: list = field(default_factory=list)
+    orphaned_blobs: list = field(default_factory=list)
+    nbytes: int = 0
+    removed: bool = False
+
+    @property
+    def paths(self) -> list:
+        return self.expired + self.orphaned_inputs + self.old_versions + self.orphaned_blobs
+
+    def summary(self) -> str:
+        action = "Removed" if self.removed else "Would remove"
+        return (
+            f"{action} {len(self.paths)} files ({self.nbytes:,} bytes): {len(self.expired)} expired, "
+            f"{len(self.orphaned_inputs)} orphaned inputs, {len(self.old_versions)} old versions, "
+            f"{len(self.orphaned_blobs)} orphaned blobs"
+        )
+
+
+def sweep(
+    fs: AbstractFileSystem,
+    path: str,
+    cache_ttl: Optional[float] = None,
+    keep_versions: Optional[int] = None,
+    orphan_min_age: float = DEFAULT_ORPHAN_MIN_AGE,
+    dry_run: bool = True,
+    now: Optional[float] = None,
+) -> SweepReport:
+    """
+    Sweep the cache under `path` - a function's directory or a whole prefix - from a single `fs.find`.
+
+    - expired: data (and APPEND versions) last modified more than `cache_ttl` seconds ago
+    - orphaned_inputs: `.inputs` older than `orphan_min_age` with no data, exception or version left
+    - old_versions: APPEND versions beyond the newest `keep_versions` per key
+    - orphaned_blobs: content-addressed blobs older than `orphan_min_age` that no remaining entry points to
+
+    Nothing is removed if `dry_run`, otherwise files are removed with batched `fs.rm` calls, and their removal recorded
+    in the manifest of any directory that has one.
+    """
+    now = time.time() if now is None else now
+    root = fs._strip_protocol(path).rstrip("/")
+    listing = fs.find(root, detail=True)
+    directories: dict = defaultdict(dict)
+    blobs = {}
+    manifests = set()
+    for name, info in listing.items():
+        directory, _, filename = name.rpartition("/")
+        hidden = [part for part in directory[len(root) :].split("/") if part.startswith(".")]
+        if hidden == [BLOB_DIR]:
+            blobs[name] = info
+        elif hidden == [MANIFEST_DIR]:
+            manifests.add(directory.rpartition(f"/{MANIFEST_DIR}")[0])
+        # Other hidden directories hold deche's own metadata (i.e. the manifest, access stats)
+        if hidden or filename.endswith((Extensions.lock, TEMP_SUFFIX)):
+            continue
+        directories[directory][filename] = info
+
+    report = SweepReport()
+    for directory, files in directories.items():
+        _sweep_directory(directory, files, report, cache_ttl, keep_versions, orphan_min_age, now)
+    if blobs:
+        report.orphaned_blobs = _orphaned_blobs(fs, directories, blobs, set(report.paths), orphan_min_age, now)
+    report.nbytes = sum(listing[p].get("size") or 0 for p in report.paths)
+    if not dry_run:
+        entries = report.expired + report.orphaned_inputs + report.old_versions
+        remove_paths(fs, report.paths, _manifest_removals(fs, manifests, entries))
+        report.removed = True
+    logger.info(report.summary())
+    return report
+
+
+def _sweep_directory(directory, files, report, cache_ttl, keep_versions, orphan_min_age, now):  # noqa: C901
+    # {key: {kind: [filename]}}
+    keys: dict = defaultdict(lambda: defaultdict(list))
+    for filename in files:
+        key, kind = entry_kind(filename)
+        if kind == Kind.append:
+            key, _ = append_version(filename)
+            if key.endswith(Extensions.exception):
+                # Exceptions are never expired here, so neither are their versions
+                continue
+        keys[key][kind].append(filename)
+
+    def age(filename):
+        return now - modified_time(files[filename])
+
+    removed = set()
+    for key, kinds in keys.items():
+        versions = sorted(kinds[Kind.append], key=lambda f: append_version(f)[1], reverse=True)
+        for filename in kinds[Kind.data] + versions:
+            if cache_ttl is not None and age(filename) > cache_ttl:
+                report.expired.append(f"{directory}/{filename}")
+                removed.add(filename)
+        if keep_versions is not None:
+            for filename in versions[keep_versions:]:
+                if filename not in removed:
+                    report.old_versions.append(f"{directory}/{filename}")
+                    removed.add(filename)
+        remaining = [f for kind in (Kind.data, Kind.exception, Kind.append) for f in kinds[kind] if f not in removed]
+        for filename in kinds[Kind.inputs]:
+            if not remaining and age(filename) > orphan_min_age:
+                report.orphaned_inputs.append(f"{directory}/{filename}")
+
+
+def _orphaned_blobs(fs, directories, blobs, removed, orphan_min_age, now) -> list:
+    # Only pointer-sized files can be pointers, so no full outputs are fetched
+    pointers = [
+        f"{directory}/{filename}"
+        for directory, files in directories.items()
+        for filename, info in files.items()
+        if info.get("size") == POINTER_SIZE and f"{directory}/{filename}" not in removed
+    ]
+    referenced = set()
+    for pointer, data in zip(pointers, cat_many(fs, pointers)):
+        digest = None if isinstance(data, Exception) else pointer_digest(data)
+        if digest is not None:
+            # A pointer lives in its function's directory, or a shard directory beneath it
+            referenced.update(blob_path(directory, digest) for directory in _ancestors(pointer))
+    return sorted(
+        name for name, info in blobs.items() if name not in referenced and now - modified_time(info) > orphan_min_age
+    )
+
+
+def _ancestors(path: str):
+    directory = path.rpartition("/")[0]
+    while directory:
+        yield directory
+        directory = directory.rpartition("/")[0]
+
+
+def _manifest_removals(fs: AbstractFileSystem, manifests: set, paths: list) -> Optional[Manifest]:
+    """A Manifest with the removal of each of `paths` under one of the `manifests` directories recorded"""
+    if not manifests:
+        return None
+    manifest = Manifest(fs)
+    for path in paths:
+        # An entry's manifest is in its function's directory, which may be above a shard directory
+        directory = next((d for d in _ancestors(path) if d in manifests), None)
+        if directory is not None:
+            manifest.remove(directory, *entry_kind(path.rpartition("/")[2]))
+    return manifest
+
+
+def remove_paths(fs: AbstractFileSystem, paths: list, manifest: Optional[Manifest] = None):
+    """
+    Remove `paths` with as few requests as the filesystem allows, ignoring any already removed, then flush `manifest`
+    (with their removals recorded).
+    """
+    for start in range(0, len(paths), RM_BATCH_SIZE):
+        batch = paths[start : start + RM_BATCH_SIZE]
+        try:
+            fs.rm(batch)
+        except FileNotFoundError:
+            # Some were removed concurrently; remove the rest individually
+            for path in batch:
+                try:
+                    fs.rm(path)
+                except FileNotFoundError:
+                    pass
+    if manifest is not None:
+        manifest.flush()
+
+
+def main(argv: Optional[list] = None):
+    parser = argparse.ArgumentParser(prog="python -m deche.sweep", description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("url", help="Cache prefix or function directory, i.e. s3://bucket/cache")
+    parser.add_argument("--ttl", type=float, default=None, help="Remove data older than this many seconds")
+    parser.add_argument("--keep-versions", type=int, default=None, help="APPEND versions to keep per key")
+    parser.add_argument("--orphan-min-age", type=float, default=DEFAULT_ORPHAN_MIN_AGE)
+    parser.add_argument("--storage-options", type=json.loads, default=None, help="fsspec storage options (JSON)")
+    parser.add_argument("--delete", action="store_true", help="Remove files (the default is a dry run)")
+    parser.add_argument("--verbose", "-v", action="store_true", help="Print every path")
+    args = parser.parse_args(argv)
+
+    fs, path = url_to_fs(args.url, **(args.storage_options or {}))
+    report = sweep(
+        fs,
+        path,
+        cache_ttl=args.ttl,
+        keep_versions=args.keep_versions,
+        orphan_min_age=args.orphan_min_age,
+        dry_run=not args.delete,
+    )
+    if args.verbose:
+        for category in ("expired", "orphaned_inputs", "old_versions", "orphaned_blobs"):
+            for p in getattr(report, category):
+                print(f"{category}\t{p}")
+    print(report.summary())
+    return report
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
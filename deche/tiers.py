@@ -0,0 +1,38 @@
+import os
+from dataclasses import dataclass
+from enum import Enum
+from typing import Optional
+
+from fsspec import AbstractFileSystem
+from fsspec.implementations.local import LocalFileSystem
+
+
+class WritePolicy(Enum):
+    # Write to every tier and the store before returning
+    THROUGH = 1
+    # Write to every tier before returning, and to the store in the background (see `Cache.flush`)
+    BACK = 2
+
+
+@dataclass
+class Tier:
+    """
+    A store in front of a Cache's own filesystem, i.e. local disk in front of S3. Tiers are listed fastest first in
+    `Cache(tiers=[...])`; each is size-limited (and evicted from) independently, like `Cache.store_max_bytes`.
+    """
+
+    prefix: str
+    fs_protocol: str = "file"
+    fs_storage_options: Optional[dict] = None
+    max_bytes: Optional[int] = None
+    max_entries: Optional[int] = None
+    eviction_policy: str = "lru"
+
+
+def can_set_mtime(fs: AbstractFileSystem) -> bool:
+    return isinstance(fs, LocalFileSystem)
+
+
+def set_mtime(fs: AbstractFileSystem, path: str, mtime: float):
+    """Backdate a copy to the original's modification time, so that it expires along with it"""
+    os.utime(fs._strip_protocol(path), (mtime, mtime))
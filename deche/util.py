@@ -1,3 +1,4 @@
+import datetime
 import pathlib
 import re
 from functools import partial
@@ -68,7 +69,7 @@ def identity(x):
     return x
 
 
-pat = re.compile(r".*-\d+")
+pat = re.compile(r"^(.*)-(\d+)$")
 
 
 def not_cache_append_file(f):
@@ -80,8 +81,46 @@ def not_cache_append_file(f):
     False
     >>> not_cache_append_file(f='07f65922d8e59a3da8e06d702d1d243dc7e186fea9783d94dec2cc8ddc0b9618-135')
     False
+    >>> not_cache_append_file(f='/tmp/pytest-0/func/07f65922d8e59a3da8e06d702d1d243dc7e186fea9783d94dec2cc8ddc0b9618')
+    True
+    """
+    return append_version(f) is None
+
+
+def append_version(f):
+    """
+    The (original name, timestamp in microseconds) of a Cache.APPEND file, or None if `f` isn't one
+    >>> append_version(f='/cache/func/07f659-1700000000000000')
+    ('07f659', 1700000000000000)
+    >>> append_version(f='/cache/func-1/07f659') is None
+    True
+    """
+    match = pat.match(f.rstrip("/").rsplit("/", 1)[-1])
+    if match is None:
+        return None
+    return match.group(1), int(match.group(2))
+
+
+def shard_key(key: str, depth: int, width: int = 2) -> str:
+    """
+    The path of `key` relative to its function's directory, nested `depth` directories deep by prefixes of `width`
+    >>> shard_key('07f65922d8e5', depth=2)
+    '07/f6/07f65922d8e5'
+    >>> shard_key('07f65922d8e5', depth=0)
+    '07f65922d8e5'
     """
-    return not bool(re.search(pattern=pat, string=f))
+    return "/".join([key[i * width : (i + 1) * width] for i in range(depth)] + [key])
+
+
+def has_hidden_part(relative_path: str) -> bool:
+    """
+    Whether any component of `relative_path` is hidden, i.e. deche's own metadata or blob directories
+    >>> has_hidden_part('.blobs/ab/abcdef')
+    True
+    >>> has_hidden_part('07/f6/07f65922d8e5')
+    False
+    """
+    return any(part.startswith(".") for part in relative_path.split("/"))
 
 
 def wrapped_partial(func, *args, **kwargs):
@@ -102,3 +141,21 @@ def is_class_instance(kwargs: Dict) -> bool:
 
 class ValidationError(Exception):
     pass
+
+
+def modified_time(info: Dict) -> float:
+    """
+    Extract the last modified time (epoch seconds) from an fsspec `info` dict, which differs between implementations
+    >>> modified_time({"mtime": 1.5})
+    1.5
+    >>> modified_time({"LastModified": datetime.datetime(2021, 1, 1, tzinfo=datetime.timezone.utc)})
+    1609459200.0
+    """
+    for field in ("mtime", "LastModified", "last_modified", "created"):
+        value = info.get(field)
+        if value is None:
+            continue
+        if isinstance(value, datetime.datetime):
+            return value.timestamp()
+        return float(value)
+    raise KeyError(f"No modified time found in {info}")
@@ -1,15 +1,27 @@
 import datetime
-from typing import Union
+from typing import Optional, Union
 
 from fsspec import AbstractFileSystem
 
+from deche.util import modified_time
 
-def exists(fs: AbstractFileSystem, path) -> bool:
-    return fs.exists(path)
 
+# Validators may declare the file metadata (fsspec `info`) they need via a `metadata` attribute. When the cache has
+# already fetched that metadata (i.e. alongside the data in `optimistic_reads` mode) it is passed as `info=` rather
+# than each validator making its own request.
 
-def has_passed_cache_ttl(fs: AbstractFileSystem, path: str, cache_ttl: Union[datetime.datetime, int]) -> bool:
-    modified = datetime.datetime.utcfromtimestamp(fs.stat(path=path)["mtime"])
+
+def exists(fs: AbstractFileSystem, path, info: Optional[dict] = None) -> bool:
+    return info is not None or fs.exists(path)
+
+
+exists.metadata = ()
+
+
+def has_passed_cache_ttl(
+    fs: AbstractFileSystem, path: str, cache_ttl: Union[datetime.datetime, int], info: Optional[dict] = None
+) -> bool:
+    modified = datetime.datetime.utcfromtimestamp(modified_time(info if info is not None else fs.stat(path=path)))
     # Cache until
     if isinstance(cache_ttl, datetime.datetime):
         return datetime.datetime.now() > cache_ttl
@@ -18,3 +30,6 @@ def has_passed_cache_ttl(fs: AbstractFileSystem, path: str, cache_ttl: Union[dat
         return age < cache_ttl
     else:
         raise NotImplementedError
+
+
+has_passed_cache_ttl.metadata = ("mtime",)
@@ -1,9 +1,12 @@
+import functools
+import inspect
 import os
 import time
 from unittest.mock import patch
 
 import pytest
 
+from deche.core import Cache
 from deche.test_utils import exc_func
 from deche.test_utils import func_ttl_expiry_append
 from deche.test_utils import mem_fs
@@ -43,6 +46,38 @@ def path():
     return cache_path
 
 
+def inc(x):
+    if x < 0:
+        raise ValueError(x)
+    return x + 1
+
+
+@pytest.fixture()
+def calls() -> list:
+    """The arguments of each call computed by a function from `define` (a lone argument by itself)"""
+    return []
+
+
+@pytest.fixture()
+def define(calls: list):
+    """`define(cache, func=inc)`: `func` decorated with `cache`, recording the calls it computes in `calls`"""
+
+    def define(cache: Cache, func=inc):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def recorded(*args, **kwargs):
+            arguments = tuple(signature.bind(*args, **kwargs).arguments.values())
+            calls.append(arguments[0] if len(arguments) == 1 else arguments)
+            return func(*args, **kwargs)
+
+        # So the cache binds arguments (and tokenizes calls) as it would for `func` itself
+        recorded.__signature__ = signature
+        return cache(recorded)
+
+    return define
+
+
 @pytest.fixture(scope="function")
 def inputs():
     return frozendict({"a": "1", "b": 2, "c": b"3"})
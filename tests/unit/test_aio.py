@@ -0,0 +1,135 @@
+import asyncio
+import time
+from unittest import mock
+
+import pytest
+from fsspec.implementations.memory import MemoryFileSystem
+
+from deche.core import Cache
+from deche.core import CacheExpiryMode
+from deche.util import ValidationError
+
+
+@pytest.fixture()
+def async_fs():
+    asyn_wrapper = pytest.importorskip("fsspec.implementations.asyn_wrapper")
+    return asyn_wrapper.AsyncFileSystemWrapper(MemoryFileSystem())
+
+
+@pytest.mark.asyncio
+async def test_async_hit_and_miss(c: Cache):
+    calls = []
+
+    @c
+    async def add(a, b):
+        calls.append((a, b))
+        return a + b
+
+    assert await add(1, 2) == 3
+    assert await add(1, 2) == 3
+    assert len(calls) == 1
+    assert add.load_cached_inputs(kwargs=dict(a=1, b=2)) == dict(a=1, b=2)
+
+
+@pytest.mark.asyncio
+async def test_async_cached_exception(c: Cache):
+    calls = []
+
+    @c
+    async def divide(n):
+        calls.append(n)
+        return 1 / n
+
+    for _ in range(2):
+        with pytest.raises(ZeroDivisionError):
+            await divide(0)
+    assert len(calls) == 1
+    assert divide.has_exception(kwargs=dict(n=0))
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("write_behind", [False, True])
+async def test_async_result_validator(c: Cache, write_behind):
+    @c.replace(result_validator=lambda x: x > 5, write_behind=write_behind)
+    async def add(a, b):
+        return a + b
+
+    assert await add(3, 4) == 7
+    with pytest.raises(ValidationError):
+        await add(1, 2)
+    assert not add.is_valid(1, 2)
+
+
+@pytest.mark.asyncio
+async def test_async_does_not_block_event_loop(c: Cache):
+    @c
+    async def add(a, b):
+        return a + b
+
+    await add(1, 2)
+    ticks = []
+
+    async def ticker():
+        for _ in range(5):
+            ticks.append(time.time())
+            await asyncio.sleep(0.01)
+
+    cat_file = c.fs.cat_file
+
+    def slow_cat_file(*args, **kwargs):
+        time.sleep(0.1)
+        return cat_file(*args, **kwargs)
+
+    with mock.patch.object(c.fs, "cat_file", side_effect=slow_cat_file):
+        result, _ = await asyncio.gather(add(1, 2), ticker())
+    assert result == 3
+    assert len(ticks) == 5
+
+
+@pytest.mark.asyncio
+async def test_async_fs(async_fs):
+    c = Cache(prefix="/async")
+    c._fs = async_fs
+    calls = []
+
+    @c
+    async def add(a, b):
+        calls.append((a, b))
+        return a + b
+
+    assert await add(1, 2) == 3
+    with mock.patch.object(async_fs, "_cat_file", wraps=async_fs._cat_file) as mock_cat_file:
+        assert await add(1, 2) == 3
+    assert mock_cat_file.called
+    assert len(calls) == 1
+    assert len(async_fs.ls(add.path())) == 2
+
+
+@pytest.mark.asyncio
+async def test_async_fs_append(async_fs):
+    c = Cache(prefix="/async", cache_ttl=60, cache_expiry_mode=CacheExpiryMode.APPEND)
+    c._fs = async_fs
+
+    @c
+    async def add(a, b):
+        return a + b
+
+    assert await add(1, 2) == 3
+    # data, timestamped data, inputs
+    assert len(async_fs.ls(add.path())) == 3
+
+
+@pytest.mark.asyncio
+async def test_async_optimistic_reads(c: Cache):
+    calls = []
+
+    @c.replace(optimistic_reads=True, cache_ttl=60)
+    async def add(a, b):
+        calls.append((a, b))
+        return a + b
+
+    assert await add(1, 2) == 3
+    with mock.patch.object(c.fs, "exists", wraps=c.fs.exists) as mock_exists:
+        assert await add(1, 2) == 3
+    assert not mock_exists.called
+    assert len(calls) == 1
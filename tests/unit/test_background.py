@@ -0,0 +1,97 @@
+import threading
+import time
+from unittest import mock
+
+import pytest
+
+from deche.background import BackgroundWriter
+from deche.core import Cache
+
+
+@pytest.fixture()
+def gate(c: Cache):
+    """Hold the store's writes until the returned event is set"""
+    release, write_store = threading.Event(), c._write_store
+
+    def slow_write_store(*args):
+        release.wait(5)
+        return write_store(*args)
+
+    return release, slow_write_store
+
+
+def test_backpressure():
+    writer, release, running = BackgroundWriter(max_workers=2, max_pending=2), threading.Event(), []
+    for _ in range(2):
+        writer.submit(lambda: running.append(release.wait(5)))
+    submitted = threading.Event()
+    thread = threading.Thread(target=lambda: (writer.submit(lambda: None), submitted.set()))
+    thread.start()
+    assert not submitted.wait(0.1) and writer.pending == 2
+    release.set()
+    assert submitted.wait(5)
+    writer.flush()
+    assert running == [True, True] and writer.pending == 0
+
+
+def test_flush_raises_failures():
+    writer = BackgroundWriter()
+    writer.submit(lambda: 1 / 0)
+    with pytest.raises(ZeroDivisionError):
+        writer.flush()
+    writer.flush()
+    writer.close()
+
+
+def test_write_behind(c: Cache, gate, define, calls):
+    release, slow_write_store = gate
+    cache = c.replace(write_behind=True)
+    inc = define(cache)
+    with mock.patch.object(cache, "_write_store", side_effect=slow_write_store):
+        start = time.perf_counter()
+        assert inc(1) == 2
+        with pytest.raises(ValueError):
+            inc(-1)
+        assert time.perf_counter() - start < 1
+        # In flight, but served from memory
+        assert not inc.has_data(kwargs=dict(x=1))
+        assert inc(1) == 2
+        with pytest.raises(ValueError):
+            inc(-1)
+        assert inc.map([dict(x=1), dict(x=-1)], return_exceptions=True)[0] == 2
+        release.set()
+        cache.flush()
+
+    assert inc.has_data(kwargs=dict(x=1)) and inc.has_exception(kwargs=dict(x=-1))
+    assert inc.load_cached_inputs(kwargs=dict(x=1)) == dict(x=1)
+    assert not cache._in_flight
+    assert define(c)(1) == 2
+    assert calls == [1, -1]
+
+
+def test_remove_waits_for_writes(c: Cache, gate, define, calls):
+    release, slow_write_store = gate
+    cache = c.replace(write_behind=True)
+    inc = define(cache)
+    with mock.patch.object(cache, "_write_store", side_effect=slow_write_store):
+        inc(1)
+        threading.Timer(0.1, release.set).start()
+        inc.remove_cached_data(kwargs=dict(x=1))
+    assert not inc.has_data(kwargs=dict(x=1))
+    assert inc(1) == 2 and calls == [1, 1]
+    cache.close()
+
+
+@pytest.mark.asyncio
+async def test_async_write_behind(c: Cache):
+    calls = []
+    cache = c.replace(write_behind=True)
+
+    @cache
+    async def ainc(x):
+        calls.append(x)
+        return x + 1
+
+    assert await ainc(1) == await ainc(1) == 2
+    cache.flush()
+    assert ainc.has_data(kwargs=dict(x=1)) and calls == [1]
@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+
+from deche.codecs import MAGIC
+from deche.codecs import GzipCodec
+from deche.codecs import Lz4Codec
+from deche.codecs import ZstdCodec
+from deche.codecs import decode
+from deche.codecs import get_codec
+from deche.core import Cache
+from deche.serializers import PickleStreamSerializer
+
+
+def test_codec_roundtrip():
+    codec = get_codec("gzip")
+    assert isinstance(codec, GzipCodec)
+    data = b"x" * 1000
+    encoded = codec.encode(data)
+    assert encoded.startswith(MAGIC) and len(encoded) < len(data)
+    assert decode(encoded) == data
+    # Raw (uncompressed) payloads pass through
+    assert decode(data) == data
+    with pytest.raises(ValueError):
+        get_codec("unknown")
+
+
+@pytest.mark.parametrize("codec_cls, module", [(ZstdCodec, "zstandard"), (Lz4Codec, "lz4")])
+def test_optional_codecs(codec_cls, module):
+    pytest.importorskip(module)
+    data = b"x" * 1000
+    assert decode(codec_cls().encode(data)) == data
+
+
+def test_zstd_dictionary():
+    pytest.importorskip("zstandard")
+    samples = [f'{{"user": {i}, "region": "us-east-{i % 3}", "flag": true}}'.encode() for i in range(1000)]
+    codec = ZstdCodec.train(samples, dict_size=1024)
+    assert decode(codec.encode(samples[0]), codecs=(codec,)) == samples[0]
+
+
+def test_cache_codecs(c: Cache):
+    cache = c.replace(input_codec="gzip", output_codec=GzipCodec(level=1))
+    calls = []
+
+    @cache
+    def make(n):
+        calls.append(n)
+        if n < 0:
+            raise ValueError(n)
+        return "x" * n
+
+    assert make(1000) == make(1000) == "x" * 1000
+    assert calls == [1000]
+    path = f"{make.path()}/{make.tokenize(1000)}"
+    assert cache.fs.cat_file(path).startswith(MAGIC)
+    assert cache.fs.cat_file(f"{path}.inputs").startswith(MAGIC)
+    assert make.load_cached_inputs(kwargs=dict(n=1000)) == dict(n=1000)
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            make(-1)
+    assert make.map([dict(n=1000), dict(n=10)]) == ["x" * 1000, "x" * 10]
+
+
+def test_uncompressed_entries_stay_readable(c: Cache):
+    calls = []
+
+    def make(n):
+        calls.append(n)
+        return "x" * n
+
+    c(make)(10)
+    compressed = c.replace(output_codec="gzip")(make)
+    assert not compressed.fs.cat_file(f"{compressed.path()}/{compressed.tokenize(10)}").startswith(MAGIC)
+    assert compressed.is_valid(10)
+    assert compressed(10) == "x" * 10
+    assert calls == [10]
+
+
+@pytest.mark.parametrize("zero_copy_reads", [False, True])
+def test_stream_codec(tmp_path, zero_copy_reads):
+    cache = Cache(
+        fs_protocol="file",
+        prefix=str(tmp_path),
+        output_codec="gzip",
+        output_stream_serializer=PickleStreamSerializer(),
+        zero_copy_reads=zero_copy_reads,
+    )
+
+    @cache
+    def make(n):
+        return np.zeros(n)
+
+    assert (make(1000) == make(1000)).all()
+    assert cache.fs.cat_file(f"{make.path()}/{make.tokenize(1000)}").startswith(MAGIC)
+
+
+@pytest.mark.asyncio
+async def test_async_codec(c: Cache):
+    @c.replace(input_codec="gzip", output_codec="gzip")
+    async def make(n):
+        return "x" * n
+
+    assert await make(1000) == await make(1000) == "x" * 1000
@@ -0,0 +1,122 @@
+from unittest import mock
+
+import pytest
+from fsspec.implementations.memory import MemoryFileSystem
+
+from deche.content import BLOB_DIR
+from deche.content import POINTER_SIZE
+from deche.core import Cache
+from deche.serializers import PickleStreamSerializer
+from deche.sweep import main
+from deche.sweep import sweep
+
+
+def frame_of(x):
+    return list(range(1000)) if x < 5 else [x]
+
+
+def blobs(cache: Cache, func) -> list:
+    return cache.fs.find(f"{func.path()}/{BLOB_DIR}")
+
+
+def test_outputs_stored_once(c: Cache, define, calls):
+    cache = c.replace(content_addressed=True, output_codec="gzip")
+    frame = define(cache, frame_of)
+    assert [frame(x) for x in range(7)] == [list(range(1000))] * 5 + [[5], [6]]
+    assert len(blobs(cache, frame)) == 3
+    assert cache.fs.info(f"{frame.path()}/{frame.tokenize(0)}")["size"] == POINTER_SIZE
+
+    assert frame(0) == list(range(1000)) and frame(6) == [6]
+    assert frame.map([dict(x=x) for x in range(10)]) == [list(range(1000))] * 5 + [[x] for x in range(5, 10)]
+    assert len(blobs(cache, frame)) == 6
+    assert calls == list(range(10))
+    # Pointers are followed whether or not the reading cache writes them
+    assert define(c, frame_of).load_cached_data(kwargs=dict(x=1)) == list(range(1000))
+    assert [k for k, _, _ in define(c, frame_of).iter_cached_results()]
+
+
+def test_sharded_listing_skips_blobs(c: Cache, define):
+    cache = c.replace(content_addressed=True, shard_depth=2)
+    frame = define(cache, frame_of)
+    frame(0), frame(5)
+    assert sorted(frame.list_cached_data()) == sorted([frame.tokenize(0), frame.tokenize(5)])
+    assert len(list(frame.iter_cached_results())) == 2
+
+
+def test_memory_tier_shares_values(c: Cache, define, calls):
+    cache = c.replace(content_addressed=True, memory_tier_max_entries=100)
+    define(cache, frame_of)(0), define(cache, frame_of)(1)
+    # A fresh memory tier, loading both keys from the store
+    frame = define(cache.replace(), frame_of)
+    with mock.patch.object(MemoryFileSystem, "cat_file", side_effect=MemoryFileSystem.cat_file, autospec=True) as cat:
+        assert frame(0) == frame(1) == list(range(1000))
+    assert len([call for call in cat.call_args_list if f"/{BLOB_DIR}/" in call.args[1]]) == 1
+    # Each hit is its own copy
+    assert frame(0) is not frame(1)
+    assert calls == [0, 1]
+
+
+@pytest.fixture()
+def async_cache():
+    asyn_wrapper = pytest.importorskip("fsspec.implementations.asyn_wrapper")
+    cache = Cache(prefix="/content", content_addressed=True)
+    cache._fs = asyn_wrapper.AsyncFileSystemWrapper(MemoryFileSystem())
+    return cache
+
+
+@pytest.mark.asyncio
+async def test_async(async_cache: Cache):
+    @async_cache
+    async def frame(x):
+        return [0] * 100
+
+    assert await frame(1) == await frame(2) == await frame(1) == [0] * 100
+    assert len(blobs(async_cache, frame)) == 1
+
+
+def test_async_fs_map(async_cache: Cache):
+    @async_cache
+    def frame(x):
+        return [0] * 100
+
+    assert frame.map([dict(x=x) for x in range(3)]) == [[0] * 100] * 3
+    assert frame.map([dict(x=x) for x in range(6)]) == [[0] * 100] * 6
+    assert len(blobs(async_cache, frame)) == 1
+
+
+def test_sweep_orphaned_blobs(c: Cache, define, calls, capsys):
+    cache = c.replace(content_addressed=True, shard_depth=1)
+    frame = define(cache, frame_of)
+    for x in range(6):
+        frame(x)
+    for x in range(5):
+        frame.remove_cached_data(kwargs=dict(x=x))
+
+    report = main([f"memory://{frame.path()}", "--orphan-min-age", "0", "-v"])
+    assert f"orphaned_blobs\t{report.orphaned_blobs[0]}" in capsys.readouterr().out
+    report = sweep(cache.fs, frame.path(), orphan_min_age=0, dry_run=False)
+    assert len(report.orphaned_blobs) == 1 and len(blobs(cache, frame)) == 1
+    assert frame(5) == [5]
+    assert calls == list(range(6))
+
+    # The same content again rewrites the swept blob
+    assert frame(0) == list(range(1000))
+    assert len(blobs(cache, frame)) == 2
+    assert define(c.replace(shard_depth=1), frame_of).load_cached_data(kwargs=dict(x=0)) == list(range(1000))
+
+
+@pytest.mark.parametrize("optimistic_reads", [False, True])
+def test_dangling_pointer_is_a_miss(c: Cache, optimistic_reads, define, calls):
+    cache = c.replace(content_addressed=True, optimistic_reads=optimistic_reads)
+    frame = define(cache, frame_of)
+    frame(0), frame(5)
+    cache.fs.rm(blobs(cache, frame))
+    assert frame(0) == list(range(1000))
+    assert frame.map([dict(x=5)]) == [[5]]
+    assert calls == [0, 5, 0, 5]
+    assert frame(5) == [5] and calls == [0, 5, 0, 5]
+
+
+def test_stream_serializer_unsupported():
+    with pytest.raises(AssertionError):
+        Cache(content_addressed=True, output_stream_serializer=PickleStreamSerializer())
@@ -4,6 +4,7 @@ import time
 from collections.abc import Iterable
 from unittest import mock
 
+import cloudpickle
 import numpy as np
 import pandas as pd
 import pytest
@@ -168,6 +169,31 @@ def test_iter():
     assert next(result) == "f4f46c47d91eea40eba825cf941ff22bdc87ce849400ed3fd85be092e43031d4"
 
 
+def test_iter_cached_results(c: Cache):
+    @c
+    def inc(x):
+        if x < 0:
+            raise ValueError(x)
+        return x + 1
+
+    for x in range(-1, 10):
+        try:
+            inc(x)
+        except ValueError:
+            pass
+    inc.remove_cached_data(kwargs=dict(x=9))
+    # Data removed since listing is skipped
+    with mock.patch.object(c, "_iter", return_value=lambda: iter([inc.tokenize(x) for x in range(10)])):
+        results = list(inc.iter_cached_results(prefetch=3, workers=2))
+    assert sorted((inputs["x"], output) for _, inputs, output in results) == [(x, x + 1) for x in range(9)]
+    assert all(key == inc.tokenize(**inputs) for key, inputs, _ in results)
+
+    results = inc.iter_cached_results(prefetch=4, inputs=False)
+    key, inputs, output = next(results)
+    assert inputs is None and output == inc.load_cached_data(key=key)
+    results.close()
+
+
 def test_load_cached_inputs():
     expected = dict(a=3, b=4, zzz=10)
     func(**expected)
@@ -418,3 +444,85 @@ def test_result_validator(c: Cache):
 
     with pytest.raises(ValidationError):
         func(n=1)
+
+
+@pytest.mark.parametrize("key_hasher", [None, "blake2b"])
+def test_serialize_once_per_miss(c: Cache, key_hasher):
+    @c.replace(key_hasher=key_hasher)
+    def add(a, b):
+        return a + b
+
+    dump = cloudpickle.CloudPickler.dump
+    with mock.patch.object(cloudpickle.CloudPickler, "dump", autospec=True, side_effect=dump) as mock_dump:
+        add(1, 2)
+        # Inputs (shared between the default key and the `.inputs` file) and output
+        assert mock_dump.call_count == 2
+        mock_dump.reset_mock()
+        add(1, 2)
+        # Only the key on a hit
+        assert mock_dump.call_count == (1 if key_hasher is None else 0)
+
+
+def test_optimistic_reads_single_request(c: Cache):
+    @c.replace(optimistic_reads=True)
+    def add(a, b):
+        return a + b
+
+    assert add(1, 2) == 3
+    with mock.patch.object(c.fs, "cat_file", wraps=c.fs.cat_file) as mock_cat_file, mock.patch.object(
+        c.fs, "exists", wraps=c.fs.exists
+    ) as mock_exists:
+        assert add(1, 2) == 3
+    assert mock_cat_file.call_count == 1
+    assert not mock_exists.called
+
+
+def test_optimistic_reads_ttl(tmp_path):
+    c = Cache(fs_protocol="file", prefix=str(tmp_path), cache_ttl=0.1, optimistic_reads=True)
+    calls = []
+
+    @c
+    def add(a, b):
+        calls.append((a, b))
+        return a + b
+
+    add(1, 2)
+    with mock.patch.object(c.fs, "stat", wraps=c.fs.stat) as mock_stat, mock.patch.object(
+        c.fs, "exists", wraps=c.fs.exists
+    ) as mock_exists:
+        add(1, 2)
+    assert not mock_stat.called
+    assert not mock_exists.called
+    assert len(calls) == 1
+    time.sleep(0.11)
+    add(1, 2)
+    assert len(calls) == 2
+
+
+def test_optimistic_reads_cached_exception(c: Cache):
+    @c.replace(optimistic_reads=True)
+    def divide(n):
+        return 1 / n
+
+    for _ in range(2):
+        with pytest.raises(ZeroDivisionError):
+            divide(0)
+    assert divide.has_exception(kwargs=dict(n=0))
+
+
+def test_validator_receives_info(c: Cache):
+    infos = []
+
+    def validator(fs, path, info=None):
+        infos.append(info)
+        return True
+
+    validator.metadata = ("size",)
+
+    @c.replace(cache_validators=(validator,), optimistic_reads=True)
+    def add(a, b):
+        return a + b
+
+    add(1, 2)
+    add(1, 2)
+    assert infos[-1]["size"] > 0
@@ -0,0 +1,88 @@
+import time
+
+import pytest
+
+from deche.core import Cache
+from deche.core import CacheExpiryMode
+from deche.eviction import Entry
+from deche.eviction import select_victims
+
+
+def test_select_victims_policies():
+    entries = {
+        "a": Entry(path="a", size=100, mtime=1),
+        "b": Entry(path="b", size=100, mtime=2),
+        "c": Entry(path="c", size=1000, mtime=3),
+    }
+    # [last_access, count, compute_seconds]
+    access = {"a": [10, 5, 1.0], "b": [20, 1, 0.1], "c": [30, 2, 100.0]}
+
+    def victims(policy, **limits):
+        return [e.path for e in select_victims(entries, access, policy=policy, **limits)]
+
+    assert victims("lru", max_entries=3) == []
+    assert victims("lru", max_entries=2) == ["a", "b"]
+    assert victims("lfu", max_entries=2) == ["b", "c"]
+    assert victims("cost", max_entries=2) == ["b", "a"]
+    assert victims("lru", max_bytes=1150) == ["a", "b"]
+    assert victims("cost", max_bytes=1150) == ["b", "a"]
+
+
+@pytest.fixture()
+def bounded(tmp_path):
+    return Cache(fs_protocol="file", prefix=str(tmp_path), store_max_entries=4, eviction_interval=None)
+
+
+def test_evict_lru(bounded: Cache):
+    calls = []
+
+    @bounded
+    def square(n):
+        calls.append(n)
+        return n**2
+
+    for n in range(5):
+        square(n)
+        time.sleep(0.01)
+    square(0)  # hit, now the most recently used
+    assert bounded.evict(dry_run=True) == [f"{square.path()}/{square.tokenize(n)}" for n in (1, 2)]
+    assert len(square.list_cached_data()) == 5
+
+    bounded.evict()
+    assert sorted(square.list_cached_data()) == sorted(square.tokenize(n) for n in (0, 3, 4))
+    assert not square.has_inputs(kwargs=dict(n=1))
+    calls.clear()
+    assert [square(n) for n in range(5)] == [0, 1, 4, 9, 16]
+    assert calls == [1, 2]
+
+
+def test_evict_append_versions_and_exceptions(bounded: Cache):
+    @bounded.replace(cache_ttl=60, cache_expiry_mode=CacheExpiryMode.APPEND)
+    def invert(n):
+        return 1 / n
+
+    for n in (1, 2, 0, 4, 5):
+        try:
+            invert(n)
+        except ZeroDivisionError:
+            pass
+        time.sleep(0.01)
+    evicted = bounded.evict()
+    assert evicted == [f"{invert.path()}/{invert.tokenize(n)}" for n in (1, 2)]
+    assert invert.list_cached_exceptions() == [invert.tokenize(0)]
+    assert [f.rsplit("/", 1)[-1] for f in bounded.fs.ls(invert.path(), detail=False) if invert.tokenize(1) in f] == []
+
+
+def test_background_eviction(tmp_path):
+    cache = Cache(fs_protocol="file", prefix=str(tmp_path), store_max_entries=2, eviction_interval=0.05)
+
+    @cache
+    def square(n):
+        return n**2
+
+    for n in range(4):
+        square(n)
+    deadline = time.time() + 5
+    while len(square.list_cached_data()) > 1 and time.time() < deadline:
+        time.sleep(0.05)
+    assert len(square.list_cached_data()) == 1
@@ -0,0 +1,100 @@
+import time
+from unittest import mock
+
+import pytest
+
+from deche.core import Cache
+
+
+def divide(a, b):
+    return a / b
+
+
+def exception_checks(mock_fs_method) -> list:
+    return [c for c in mock_fs_method.call_args_list if ".exc" in str(c)]
+
+
+@pytest.mark.parametrize("optimistic_reads", [False, True])
+def test_exception_index_skips_exception_checks(c: Cache, optimistic_reads, define, calls):
+    cache = c.replace(exception_index=True, optimistic_reads=optimistic_reads)
+    div = define(cache, divide)
+    with mock.patch.object(cache.fs, "exists", wraps=cache.fs.exists) as mock_exists, mock.patch.object(
+        cache.fs, "cat_file", wraps=cache.fs.cat_file
+    ) as mock_cat_file:
+        for a in range(5):
+            assert div(a, 1) == a
+    assert not exception_checks(mock_exists) and not exception_checks(mock_cat_file)
+
+    for _ in range(2):
+        with pytest.raises(ZeroDivisionError):
+            div(1, 0)
+    assert calls.count((1, 0)) == 1
+
+
+def test_exception_index_sees_other_writers(c: Cache, define, calls):
+    with pytest.raises(ZeroDivisionError):
+        define(c, divide)(1, 0)
+
+    div = define(c.replace(exception_index=True, exception_index_refresh=None), divide)
+    with pytest.raises(ZeroDivisionError):
+        div(1, 0)
+    assert calls == [(1, 0)]
+
+    div.remove_cached_exception(kwargs=dict(a=1, b=0))
+    with pytest.raises(ZeroDivisionError):
+        div(1, 0)
+    assert calls == [(1, 0), (1, 0)]
+
+
+def test_exception_index_map(c: Cache, define, calls):
+    div = define(c.replace(exception_index=True), divide)
+    results = div.map([dict(a=1, b=0), dict(a=1, b=1)], return_exceptions=True)
+    assert isinstance(results[0], ZeroDivisionError) and results[1] == 1
+    with pytest.raises(ZeroDivisionError):
+        div(1, 0)
+    assert calls == [(1, 0), (1, 1)]
+
+
+def test_cache_exceptions_off(c: Cache, define, calls):
+    div = define(c.replace(cache_exceptions=False), divide)
+    for _ in range(2):
+        with pytest.raises(ZeroDivisionError):
+            div(1, 0)
+        assert isinstance(div.map([dict(a=2, b=0)], return_exceptions=True)[0], ZeroDivisionError)
+    assert calls == [(1, 0), (2, 0)] * 2
+    assert not div.list_cached_exceptions()
+
+
+@pytest.mark.parametrize("optimistic_reads", [False, True])
+def test_exception_ttl(c: Cache, optimistic_reads, define, calls):
+    div = define(c.replace(exception_ttl=0.2, optimistic_reads=optimistic_reads, memory_tier_max_entries=10), divide)
+    for _ in range(2):
+        with pytest.raises(ZeroDivisionError):
+            div(1, 0)
+    div.map([dict(a=2, b=0)], return_exceptions=True)
+    assert div.map([dict(a=2, b=0)], return_exceptions=True)
+    assert calls == [(1, 0), (2, 0)]
+
+    time.sleep(0.3)
+    with pytest.raises(ZeroDivisionError):
+        div(1, 0)
+    div.map([dict(a=2, b=0)], return_exceptions=True)
+    assert calls == [(1, 0), (2, 0)] * 2
+    # The ttl only applies to exceptions
+    assert div(1, 1) == div(1, 1) == 1
+
+
+@pytest.mark.asyncio
+async def test_async_exception_options(c: Cache):
+    calls = []
+
+    @c.replace(exception_index=True, exception_ttl=60)
+    async def adiv(a, b):
+        calls.append((a, b))
+        return a / b
+
+    for _ in range(2):
+        with pytest.raises(ZeroDivisionError):
+            await adiv(1, 0)
+    assert await adiv(1, 1) == 1
+    assert calls == [(1, 0), (1, 1)]
@@ -0,0 +1,125 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from deche import formats
+from deche.core import DEFAULT_SERIALIZER
+from deche.core import Cache
+from deche.formats import MAGIC
+from deche.formats import Format
+from deche.formats import register_format
+from deche.formats import register_type
+
+
+def format_name(data: bytes) -> str:
+    assert data[: len(MAGIC)] == MAGIC
+    return formats.FORMATS[data[len(MAGIC)]].name
+
+
+@pytest.mark.parametrize(
+    "value, name",
+    [
+        (b"raw", "bytes"),
+        (np.arange(10).reshape(2, 5), "npy"),
+        (np.array([1, "a"], dtype=object), "pickle"),
+        (pa.table({"a": [1, 2]}), "arrow"),
+        (pd.DataFrame({"a": [1, 2], "b": ["x", "y"]}, index=[3, 4]), "pandas-arrow"),
+        (pd.DataFrame({"a": [1, "x"]}), "pickle"),
+        # Arrow would convert these without raising, but not back to the same frame
+        (pd.DataFrame({"a": [[1], [2, 3]], "b": [(1,), (2,)], "c": [{1}, {2}]}), "pickle"),
+        (pd.DataFrame({"a": [{"k": 1}, {"j": 2}]}), "pickle"),
+        (pd.DataFrame({"a": pd.Series([1, 2], dtype=object)}), "pickle"),
+        (pd.DataFrame({"a": pd.Categorical([1, "1"])}), "pickle"),
+        (pd.DataFrame({"a": [1, 2]}, index=pd.date_range("2020", periods=2)), "pickle"),
+        (pd.DataFrame({"a": [1, 2]}, index=pd.MultiIndex.from_tuples([(1, "a"), ("2", "b")])), "pickle"),
+        (pd.DataFrame({"a": [1]}, index=pd.Index([5], name=3)), "pickle"),
+        (pd.DataFrame([[1, 2]], columns=[1, "b"]), "pickle"),
+        (
+            pd.DataFrame({"a": [1, 2]}, index=pd.MultiIndex.from_tuples([(1, "a"), (2, "b")], names=["x", "y"])),
+            "pandas-arrow",
+        ),
+        (pd.DataFrame({"a": ["x", None], "b": pd.Categorical(["p", "q"])}), "pandas-arrow"),
+        ({"a": [1, 2]}, "pickle"),
+    ],
+)
+def test_roundtrip(value, name):
+    data = formats.dumps(value)
+    assert format_name(data) == name
+    loaded = formats.loads(data)
+    assert type(loaded) is type(value)
+    if isinstance(value, np.ndarray):
+        np.testing.assert_array_equal(loaded, value)
+    elif isinstance(value, pd.DataFrame):
+        pd.testing.assert_frame_equal(loaded, value)
+    elif isinstance(value, pa.Table):
+        assert loaded.equals(value)
+    else:
+        assert loaded == value
+
+
+def test_untagged_reads_as_pickle():
+    assert formats.loads(DEFAULT_SERIALIZER([1, 2])) == [1, 2]
+
+
+def test_register_type():
+    class Point:
+        def __init__(self, x, y):
+            self.x, self.y = x, y
+
+    @register_format
+    class PointFormat(Format):
+        name = "point"
+        id = 200
+
+        def dump(self, obj, f):
+            f.write(f"{obj.x},{obj.y}".encode())
+
+        def load(self, f):
+            return Point(*map(int, f.read().split(b",")))
+
+    try:
+        register_type(Point, "point")
+        data = formats.dumps(Point(1, 2))
+        assert format_name(data) == "point" and data.endswith(b"1,2")
+        point = formats.loads(data)
+        assert (point.x, point.y) == (1, 2)
+    finally:
+        formats.TYPE_FORMATS.pop(formats.type_name(Point))
+        formats.FORMATS.pop(200), formats.FORMATS.pop("point")
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_cache(tmp_path, stream):
+    kwargs = dict(output_serializer=formats.dumps, output_deserializer=formats.loads)
+    if stream:
+        kwargs = dict(output_stream_serializer=formats.SERIALIZER)
+    c, calls = Cache(fs_protocol="file", prefix=str(tmp_path), **kwargs), []
+
+    @c
+    def frame(n):
+        calls.append(n)
+        if n < 0:
+            raise ValueError(n)
+        return pd.DataFrame({"a": np.arange(n)})
+
+    pd.testing.assert_frame_equal(frame(5), frame(5))
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            frame(-1)
+    assert calls == [5, -1]
+    assert format_name(c.fs.cat_file(f"{frame.path()}/{frame.tokenize(5)}")) == "pandas-arrow"
+
+
+@pytest.mark.parametrize("codec", [None, "gzip"])
+def test_fallback_through_codec(tmp_path, codec):
+    c = Cache(fs_protocol="file", prefix=str(tmp_path), output_stream_serializer=formats.SERIALIZER, output_codec=codec)
+
+    @c
+    def mixed():
+        return pd.DataFrame({"a": [1, "x"]})
+
+    # The format is settled before anything is written, so nothing needs rewinding
+    pd.testing.assert_frame_equal(mixed(), pd.DataFrame({"a": [1, "x"]}))
+    assert mixed.has_data(kwargs={}) and not mixed.has_exception(kwargs={})
+    pd.testing.assert_frame_equal(mixed(), pd.DataFrame({"a": [1, "x"]}))
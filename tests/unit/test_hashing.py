@@ -0,0 +1,121 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from deche.core import Cache
+from deche.hashing import StructuralHasher
+from deche.util import frozendict
+
+
+@pytest.fixture()
+def hasher():
+    return StructuralHasher()
+
+
+def test_structural_key_deterministic(hasher, inputs):
+    assert hasher(inputs) == hasher(frozendict(inputs))
+    assert len(hasher(inputs)) == 64
+
+
+@pytest.mark.parametrize(
+    "a, b",
+    [
+        (1, 1.0),
+        (1, True),
+        ("1", b"1"),
+        ((1, 2), [1, 2]),
+        (("ab", "c"), ("a", "bc")),
+        (np.arange(4, dtype="int64"), np.arange(4, dtype="int32")),
+        (np.zeros((2, 3)), np.zeros((3, 2))),
+    ],
+)
+def test_structural_key_distinguishes(hasher, a, b):
+    assert hasher(a) != hasher(b)
+
+
+def test_structural_key_stable_across_processes(hasher):
+    code = (
+        "import numpy as np, pandas as pd\n"
+        "from deche.hashing import StructuralHasher\n"
+        "obj = {'s': {'x', 'y', 'z'}, 'a': np.arange(3.0), 'df': pd.DataFrame({'a': [1, 2], 'b': ['x', 'y']})}\n"
+        "print(StructuralHasher()(obj))\n"
+    )
+    keys = {
+        subprocess.check_output([sys.executable, "-c", code], env={**os.environ, "PYTHONHASHSEED": seed}).strip()
+        for seed in ("1", "2")
+    }
+    assert len(keys) == 1
+
+
+def test_structural_key_numpy(hasher):
+    arr = np.arange(10.0)
+    assert hasher(arr) == hasher(arr.copy())
+    assert hasher(arr[::2]) == hasher(np.ascontiguousarray(arr[::2]))
+    assert hasher(np.float64(1.5)) == hasher(np.float64(1.5))
+    assert hasher(np.array(["a", None], dtype=object)) == hasher(np.array(["a", None], dtype=object))
+
+
+def test_structural_key_dataframe(hasher):
+    df = pd.DataFrame({"a": [1, 2, 3], "b": ["x", "y", "z"], "c": pd.Categorical(["p", "q", "p"])})
+    assert hasher(df) == hasher(df.copy())
+    assert hasher(df) != hasher(df.assign(a=[1, 2, 4]))
+    assert hasher(df) != hasher(df.rename(columns={"a": "A"}))
+    assert hasher(df) != hasher(df.set_index("a"))
+
+
+@pytest.mark.parametrize(
+    "a, b",
+    [
+        (pd.Series([1, 2], dtype=object), pd.Series(["1", "2"])),
+        (pd.DataFrame({"a": pd.Series([1, 2], dtype=object)}), pd.DataFrame({"a": ["1", "2"]})),
+        (pd.DataFrame({"a": [[1], [2]]}), pd.DataFrame({"a": [(1,), (2,)]})),
+        (pd.DataFrame({"a": [{"k": 1}, {}]}), pd.DataFrame({"a": [{"k": "1"}, {}]})),
+        (pd.Series(pd.Categorical([1, 2])), pd.Series(pd.Categorical(["1", "2"]))),
+        (
+            pd.DataFrame({"v": [0, 0]}, index=pd.MultiIndex.from_tuples([(1, "a"), (2, "b")])),
+            pd.DataFrame({"v": [0, 0]}, index=pd.MultiIndex.from_tuples([("1", "a"), ("2", "b")])),
+        ),
+    ],
+)
+def test_structural_key_object_columns(hasher, a, b):
+    # Objects are hashed with their types, and unhashable ones (lists, dicts) are hashed by value
+    assert hasher(a) != hasher(b)
+    assert hasher(a) == hasher(a.copy())
+
+
+def test_cache_key_hasher_object_columns(c: Cache):
+    @c.replace(key_hasher="blake2b")
+    def types(df):
+        return [type(v).__name__ for v in df["a"]]
+
+    assert types(pd.DataFrame({"a": pd.Series([1, 2], dtype=object)})) == ["int", "int"]
+    assert types(pd.DataFrame({"a": ["1", "2"]})) == ["str", "str"]
+    assert types(pd.DataFrame({"a": [[1], [2]]})) == ["list", "list"]
+
+
+def test_structural_key_unknown_algorithm():
+    with pytest.raises(ValueError):
+        StructuralHasher(algorithm="md4")
+
+
+def test_cache_key_hasher(c: Cache, inputs_key):
+    @c.replace(key_hasher="blake2b")
+    def add(a, b, c):
+        return a
+
+    assert add.tokenize(a="1", b=2, c=b"3") == StructuralHasher()(frozendict({"a": "1", "b": 2, "c": b"3"}))
+    assert add.tokenize(a="1", b=2, c=b"3") != inputs_key
+    add(a="1", b=2, c=b"3")
+    assert add.list_cached_data() == [add.tokenize(a="1", b=2, c=b"3")]
+
+
+def test_cache_key_hasher_default_compatible(c: Cache, inputs, inputs_key):
+    @c
+    def add(a, b, c):
+        return a
+
+    assert add.tokenize(**inputs) == inputs_key
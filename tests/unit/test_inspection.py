@@ -0,0 +1,76 @@
+import pytest
+
+from deche.inspection import args_kwargs_to_kwargs
+from deche.inspection import kwargs_binder
+
+
+def plain(a, b, c=3):
+    pass
+
+
+def var_keyword(a, b=2, **kwargs):
+    pass
+
+
+def keyword_only(a, *, b, c=3):
+    pass
+
+
+def underscore_varargs(*_, a, b=2):
+    pass
+
+
+def positional_only(a, /, b=2):
+    pass
+
+
+def other_var_keyword(a, **kw):
+    pass
+
+
+@pytest.mark.parametrize(
+    "func, args, kwargs",
+    [
+        (plain, (1, 2), {}),
+        (plain, (1,), {"b": 2}),
+        (plain, (), {"c": 5, "b": 2, "a": 1}),
+        (var_keyword, (1,), {"z": 1, "y": 2}),
+        (var_keyword, (), {"z": 1, "a": 1, "b": 4}),
+        (keyword_only, (1,), {"b": 2}),
+        (underscore_varargs, (), {"a": 1}),
+        (positional_only, (1,), {"b": 5}),
+        (other_var_keyword, (1,), {"x": 1}),
+    ],
+)
+def test_binder_matches_signature_bind(func, args, kwargs):
+    result = kwargs_binder(func)(args, kwargs)
+    expected = args_kwargs_to_kwargs(func=func, args=args, kwargs=kwargs)
+    assert result == expected
+    assert list(result) == list(expected)
+
+
+@pytest.mark.parametrize(
+    "func, args, kwargs",
+    [
+        (plain, (1, 2, 3, 4), {}),
+        (plain, (1,), {}),
+        (plain, (1, 2), {"a": 1}),
+        (plain, (1, 2), {"z": 1}),
+        (keyword_only, (1, 2), {}),
+        (var_keyword, (1,), {"a": 1}),
+    ],
+)
+def test_binder_errors_match_signature_bind(func, args, kwargs):
+    with pytest.raises(TypeError):
+        args_kwargs_to_kwargs(func=func, args=args, kwargs=kwargs)
+    with pytest.raises(TypeError):
+        kwargs_binder(func)(args, kwargs)
+
+
+def test_binder_varargs_raises_on_call():
+    def add(a, *b):
+        return a + sum(b)
+
+    binder = kwargs_binder(add)
+    with pytest.raises(AssertionError):
+        binder((1,), {})
@@ -0,0 +1,60 @@
+import pytest
+
+from deche.core import Cache
+from deche.layout import main
+from deche.layout import reshard
+
+
+def make_cache(tmp_path, **kwargs) -> Cache:
+    return Cache(fs_protocol="file", prefix=str(tmp_path), **kwargs)
+
+
+@pytest.mark.parametrize("manifest", [False, True])
+def test_sharded_cache(tmp_path, manifest, define, calls):
+    inc = define(make_cache(tmp_path, shard_depth=2, manifest=manifest))
+    assert inc(1) == inc(1) == 2
+    with pytest.raises(ValueError):
+        inc(-1)
+    with pytest.raises(ValueError):
+        inc(-1)
+    assert calls == [1, -1]
+
+    key = inc.tokenize(1)
+    assert inc.fs.exists(f"{inc.path()}/{key[:2]}/{key[2:4]}/{key}")
+    assert inc.list_cached_data() == [key]
+    assert sorted(inc.list_cached_inputs()) == sorted([key, inc.tokenize(-1)])
+    assert inc.list_cached_exceptions() == [inc.tokenize(-1)]
+    assert inc.has_data(key=key) and inc.is_valid(1)
+    assert inc.load_cached_inputs(key=key) == dict(x=1)
+    assert inc.map([dict(x=1), dict(x=2)]) == [2, 3]
+    assert [(k, i, o) for k, i, o in sorted(inc.iter_cached_results())] == sorted(
+        [(inc.tokenize(x), dict(x=x), x + 1) for x in (1, 2)]
+    )
+    assert inc.query(x=2) == [inc.tokenize(2)]
+    assert inc.stats()["hits"] >= 1
+
+    inc.remove_cached_data(key=key)
+    assert not inc.has_data(key=key)
+    assert inc(1) == 2
+    assert calls == [1, -1, 2, 1]
+
+
+def test_reshard(tmp_path, define, calls):
+    flat = define(make_cache(tmp_path, manifest=True))
+    for x in range(5):
+        flat(x)
+
+    moves = reshard(flat.fs, str(tmp_path), depth=2)
+    assert len(moves) == 10 and len(flat.list_cached_data()) == 5
+    reshard(flat.fs, str(tmp_path), depth=2, dry_run=False)
+
+    sharded = define(make_cache(tmp_path, shard_depth=2, manifest=True))
+    assert [sharded(x) for x in range(5)] == [1, 2, 3, 4, 5]
+    assert calls == list(range(5))
+    assert len(sharded.list_cached_data()) == 5
+
+    # And back again, removing the emptied shard directories
+    main([str(tmp_path), "--from-depth", "2", "--depth", "0", "--apply"])
+    assert all(len(name.rsplit("/", 1)[-1]) == 64 or "." in name for name in flat.fs.ls(flat.path()))
+    assert [flat(x) for x in range(5)] == [1, 2, 3, 4, 5]
+    assert calls == list(range(5))
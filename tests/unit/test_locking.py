@@ -0,0 +1,164 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import pytest
+
+from deche.core import Cache
+from deche.locking import Lease
+from deche.locking import SingleFlight
+
+
+def test_single_flight():
+    flight = SingleFlight()
+    calls = []
+    event = threading.Event()
+
+    def func():
+        calls.append(1)
+        event.wait(1)
+        return len(calls)
+
+    with ThreadPoolExecutor(4) as pool:
+        futures = [pool.submit(flight.do, "key", func) for _ in range(4)]
+        time.sleep(0.05)
+        event.set()
+    assert [f.result() for f in futures] == [1, 1, 1, 1]
+    assert len(calls) == 1
+    assert len(flight) == 0
+
+
+def test_single_flight_decorated(c: Cache):
+    calls = []
+
+    @c
+    def slow_add(a, b):
+        calls.append((a, b))
+        time.sleep(0.1)
+        return a + b
+
+    with ThreadPoolExecutor(4) as pool:
+        results = list(pool.map(lambda _: slow_add(1, 2), range(4)))
+    assert results == [3, 3, 3, 3]
+    assert len(calls) == 1
+
+
+def test_single_flight_exception(c: Cache):
+    calls = []
+
+    @c
+    def slow_divide(n):
+        calls.append(n)
+        time.sleep(0.1)
+        return 1 / n
+
+    def call(_):
+        try:
+            slow_divide(0)
+        except ZeroDivisionError as e:
+            return e
+
+    with ThreadPoolExecutor(4) as pool:
+        results = list(pool.map(call, range(4)))
+    assert all(isinstance(r, ZeroDivisionError) for r in results)
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_single_flight_async(c: Cache):
+    calls = []
+
+    @c
+    async def slow_add(a, b):
+        calls.append((a, b))
+        await asyncio.sleep(0.05)
+        return a + b
+
+    assert await asyncio.gather(*(slow_add(1, 2) for _ in range(4))) == [3, 3, 3, 3]
+    assert len(calls) == 1
+
+
+def test_lease_across_caches(tmp_path):
+    calls = []
+
+    def slow_add(a, b):
+        calls.append((a, b))
+        time.sleep(0.2)
+        return a + b
+
+    # Separate instances don't share single-flight state, as with separate processes
+    workers = [
+        Cache(fs_protocol="file", prefix=str(tmp_path), lease_ttl=10, lease_poll_interval=0.01)(slow_add)
+        for _ in range(2)
+    ]
+    with ThreadPoolExecutor(2) as pool:
+        results = list(pool.map(lambda worker: worker(1, 2), workers))
+    assert results == [3, 3]
+    assert len(calls) == 1
+    assert workers[0].is_valid(1, 2)
+    assert not workers[0].deche.fs.exists(f"{workers[0].path()}/{workers[0].tokenize(1, 2)}.lock")
+
+
+def test_expired_lease_is_broken(c: Cache):
+    lock = "/leases/key.lock"
+    # Written without a heartbeat, as if by a worker that died
+    c.fs.pipe_file(lock, b"dead")
+    start = time.time()
+    lease = Lease(c.fs, lock, ttl=0.1, poll_interval=0.01)
+    assert lease.acquire()
+    assert time.time() - start >= 0.05
+    lease.release()
+    assert not c.fs.exists(lock)
+
+
+def test_lease_is_renewed(c: Cache):
+    lock, acquired = "/leases/key.lock", []
+    holder = Lease(c.fs, lock, ttl=0.1, poll_interval=0.01)
+    assert not holder.acquire()
+    waiter = Lease(c.fs, lock, ttl=0.1, poll_interval=0.01)
+    thread = threading.Thread(target=lambda: acquired.append(waiter.acquire()))
+    thread.start()
+    # Held for several ttls without being broken
+    time.sleep(0.4)
+    assert not acquired and c.fs.cat_file(lock) == holder.owner
+    holder.release()
+    thread.join(5)
+    assert acquired == [True] and c.fs.cat_file(lock) == waiter.owner
+    waiter.release()
+
+
+def test_release_checks_owner(c: Cache):
+    lock = "/leases/key.lock"
+    lease = Lease(c.fs, lock, ttl=10)
+    lease.acquire()
+    # Broken and taken over by another worker
+    c.fs.pipe_file(lock, b"other")
+    lease.release()
+    assert c.fs.cat_file(lock) == b"other"
+
+
+def test_lease_held_until_written_behind(c: Cache):
+    calls, release, write_store = [], threading.Event(), c._write_store
+    cache = c.replace(write_behind=True, lease_ttl=10, lease_poll_interval=0.01)
+
+    @cache
+    def add(a, b):
+        calls.append((a, b))
+        return a + b
+
+    def slow_write_store(*args):
+        release.wait(5)
+        return write_store(*args)
+
+    lock = f"{add.path()}/{add.tokenize(1, 2)}.lock"
+    with mock.patch.object(cache, "_write_store", side_effect=slow_write_store):
+        assert add(1, 2) == 3
+        assert c.fs.exists(lock)
+        # Another worker waits for the write, rather than recomputing
+        other = c.replace(lease_ttl=10, lease_poll_interval=0.01)(add.func)
+        threading.Timer(0.1, release.set).start()
+        assert other(1, 2) == 3
+    cache.flush()
+    assert not c.fs.exists(lock) and calls == [(1, 2)]
@@ -0,0 +1,186 @@
+from unittest import mock
+
+import pytest
+
+from deche.core import Cache
+from deche.manifest import MANIFEST_DIR
+from deche.manifest import MAX_FILES
+from deche.manifest import Kind
+from deche.manifest import Manifest
+
+
+@pytest.fixture()
+def mc(c: Cache):
+    return c.replace(manifest=True)
+
+
+def test_manifest_listing(mc: Cache):
+    @mc
+    def divide(a, b):
+        return a / b
+
+    divide(1, 2)
+    divide(2, 1)
+    with pytest.raises(ZeroDivisionError):
+        divide(1, 0)
+
+    keys = sorted([divide.tokenize(1, 2), divide.tokenize(2, 1)])
+    # The first read reconciles the manifest with a listing, once
+    assert divide.list_cached_data() == keys
+    with mock.patch.object(mc.fs, "glob", side_effect=AssertionError("listed the directory")):
+        assert divide.list_cached_data() == keys
+        assert divide.list_cached_inputs() == sorted(keys + [divide.tokenize(1, 0)])
+        assert divide.list_cached_exceptions() == [divide.tokenize(1, 0)]
+        assert divide.list_cached_data(key_only=False) == [f"{divide.path()}/{key}" for key in keys]
+        assert divide.has_data(kwargs=dict(a=1, b=2))
+        assert divide.has_exception(kwargs=dict(a=1, b=0))
+        assert not divide.has_data(kwargs=dict(a=1, b=0))
+
+        divide.remove_all_cached_exceptions()
+        assert divide.list_cached_exceptions() == []
+        divide.remove_cached_data(kwargs=dict(a=1, b=2))
+        assert divide.list_cached_data() == [divide.tokenize(2, 1)]
+    # Nothing from the manifest directory is reported as data without the manifest
+    assert MANIFEST_DIR not in str(mc.replace(manifest=False)(divide.func).list_cached_data())
+
+
+def test_manifest_backfill(c: Cache):
+    def add(a, b):
+        return a + b
+
+    # Entries written before the manifest was turned on
+    c(add).map([dict(a=1, b=2), dict(a=2, b=3)])
+    add = c.replace(manifest=True)(add)
+    keys = sorted([add.tokenize(1, 2), add.tokenize(2, 3)])
+    assert add.list_cached_data() == keys
+    assert add.has_data(kwargs=dict(a=1, b=2))
+    assert sorted(add.query(a=1)) == [add.tokenize(1, 2)]
+    with mock.patch.object(c.fs, "glob", side_effect=AssertionError("listed the directory")):
+        assert add.list_cached_inputs() == keys
+
+
+def test_manifest_external_removal(mc: Cache):
+    calls = []
+
+    @mc
+    def add(a, b):
+        calls.append((a, b))
+        return a + b
+
+    add.map([dict(a=1, b=2), dict(a=2, b=3), dict(a=3, b=4)])
+    # Removed by something that doesn't record removals in the manifest
+    mc.fs.rm([f"{add.path()}/{add.tokenize(1, 2)}", f"{add.path()}/{add.tokenize(2, 3)}"])
+    assert not add.has_data(kwargs=dict(a=1, b=2))
+    assert add.tokenize(1, 2) not in add.list_cached_data()
+    assert add.map([dict(a=2, b=3)]) == [5]
+    assert calls[3:] == [(2, 3)]
+
+    # Until it's reconciled again, the manifest still lists what hasn't been checked
+    mc.fs.rm(f"{add.path()}/{add.tokenize(3, 4)}")
+    assert add.tokenize(3, 4) in add.list_cached_data()
+    reconciling = mc.replace(manifest_reconcile_interval=0)(add.func)
+    assert reconciling.list_cached_data() == sorted([add.tokenize(2, 3)])
+
+
+def test_manifest_input_summary(mc: Cache):
+    @mc
+    def func(a, b, c=None):
+        return a
+
+    func(1, "x" * 1000, c=[1, 2])
+    record = mc._manifest.entries(func.path(), kind=Kind.inputs)[func.tokenize(1, "x" * 1000, c=[1, 2])]
+    assert record["inputs"] == {"a": 1, "b": "x" * 100, "c": {"type": "list"}}
+    assert record["size"] > 0
+
+
+def test_manifest_shared_between_instances(mc: Cache):
+    def add(a, b):
+        return a + b
+
+    mc(add)(1, 2)
+    other = mc.replace()(add)
+    assert other.list_cached_data() == [other.tokenize(1, 2)]
+    assert other.map([dict(a=1, b=2), dict(a=2, b=3)]) == [3, 5]
+    assert sorted(mc(add).list_cached_data()) == sorted([other.tokenize(1, 2), other.tokenize(2, 3)])
+
+
+def test_manifest_map_hits(mc: Cache):
+    calls = []
+
+    @mc.replace(cache_ttl=60)
+    def add(a, b):
+        calls.append((a, b))
+        return a + b
+
+    assert add.map([dict(a=1, b=2), dict(a=2, b=3)]) == [3, 5]
+    with mock.patch.object(mc.fs, "ls", wraps=mc.fs.ls) as mock_ls:
+        assert add.map([dict(a=1, b=2), dict(a=2, b=3)]) == [3, 5]
+    assert all(call.args[0].endswith(MANIFEST_DIR) for call in mock_ls.call_args_list)
+    assert len(calls) == 2
+
+
+def test_manifest_segments_compaction(c: Cache):
+    manifest = Manifest(c.fs, append=False)
+    for i in range(MAX_FILES + 1):
+        manifest.add("/segments", f"key{i}", Kind.data, size=i)
+        manifest.flush()
+    manifest.remove("/segments", "key0", Kind.data)
+    assert len(manifest.entries("/segments", kind=Kind.data)) == MAX_FILES
+    assert len(c.fs.ls(f"/segments/{MANIFEST_DIR}")) == 1
+    # A fresh reader sees the same state from the index
+    assert Manifest(c.fs, append=False).entries("/segments", kind=Kind.data) == manifest.entries(
+        "/segments", kind=Kind.data
+    )
+
+
+def test_manifest_compaction_keeps_removals(c: Cache):
+    writer = Manifest(c.fs, append=False, reconcile_interval=3600)
+    writer.add("/segments", "key", Kind.data)
+    writer.flush()
+    reader = Manifest(c.fs, append=False)
+    assert list(reader.entries("/segments", kind=Kind.data)) == ["key"]
+
+    writer.remove("/segments", "key", Kind.data)
+    writer.flush()
+    writer.entries("/segments")
+    writer.compact("/segments")
+    # The reader only sees the index, which still carries the removal
+    assert reader.entries("/segments", kind=Kind.data) == {}
+
+    # Removals older than the reconcile interval are dropped
+    stale = Manifest(c.fs, append=False, reconcile_interval=0)
+    stale.entries("/segments")
+    stale.compact("/segments")
+    assert c.fs.cat(c.fs.ls(f"/segments/{MANIFEST_DIR}", detail=False)[0]) == b""
+
+
+@pytest.mark.parametrize("manifest", [True, False])
+def test_query(c: Cache, manifest):
+    @c.replace(manifest=manifest)
+    def price(symbol, day, adjusted=False):
+        if day < 0:
+            raise ValueError(day)
+        return f"{symbol}-{day}-{adjusted}"
+
+    for symbol in ("AAPL", "MSFT", "X" * 200):
+        for day in range(3):
+            price(symbol, day)
+    price("AAPL", 0, adjusted=True)
+    with pytest.raises(ValueError):
+        price("AAPL", -1)
+
+    assert sorted(price.query(symbol="AAPL")) == sorted(
+        [price.tokenize("AAPL", day) for day in (0, 1, 2, -1)] + [price.tokenize("AAPL", 0, adjusted=True)]
+    )
+    assert price.query(symbol="AAPL", day=1) == [price.tokenize("AAPL", 1)]
+    assert price.query(symbol="X" * 200, day=lambda d: d >= 1) == sorted(
+        price.tokenize("X" * 200, day) for day in (1, 2)
+    )
+    # Bools don't match ints
+    assert price.query(day=0, adjusted=0) == []
+    assert price.query(symbol="AAPL", adjusted=True, load_results=True) == {
+        price.tokenize("AAPL", 0, adjusted=True): "AAPL-0-True"
+    }
+    assert price.query(symbol="AAPL", day=-1, load_results=True) == {}
+    with pytest.raises(ValueError):
+        price.query(ticker="AAPL")
@@ -0,0 +1,90 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+from unittest import mock
+
+import pytest
+
+from deche.core import Cache
+
+
+def test_map(c: Cache):
+    calls = []
+
+    @c
+    def add(a, b=1):
+        calls.append((a, b))
+        return a + b
+
+    add(a=0)
+    result = add.map([dict(a=0), dict(a=1), dict(a=2, b=2), dict(a=1)])
+    assert result == [1, 2, 4, 2]
+    assert sorted(calls) == [(0, 1), (1, 1), (2, 2)]
+    assert add.load_cached_inputs(kwargs=dict(a=2, b=2)) == dict(a=2, b=2)
+
+
+def test_map_hits_use_single_listing(c: Cache):
+    calls = []
+
+    @c
+    def add(a, b=1):
+        calls.append((a, b))
+        return a + b
+
+    add.map([dict(a=i) for i in range(10)])
+    with mock.patch.object(c.fs, "exists", wraps=c.fs.exists) as mock_exists, mock.patch.object(
+        c.fs, "ls", wraps=c.fs.ls
+    ) as mock_ls:
+        assert add.map([dict(a=i) for i in range(10)]) == list(range(1, 11))
+    assert len(calls) == 10
+    assert mock_ls.call_count == 1
+    assert not mock_exists.called
+
+
+def test_map_exceptions(c: Cache):
+    calls = []
+
+    @c
+    def divide(n):
+        calls.append(n)
+        return 1 / n
+
+    result = divide.map([dict(n=1), dict(n=0)], return_exceptions=True)
+    assert result[0] == 1
+    assert isinstance(result[1], ZeroDivisionError)
+    with pytest.raises(ZeroDivisionError):
+        divide.map([dict(n=1), dict(n=0)])
+    assert len(calls) == 2
+    assert divide.has_exception(kwargs=dict(n=0))
+
+
+def test_map_process_pool(c: Cache):
+    @c
+    def square(x):
+        return x**2
+
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        assert square.map([dict(x=i) for i in range(4)], executor=executor) == [0, 1, 4, 9]
+    assert square.is_valid(x=3)
+
+
+def test_map_times_each_call(c: Cache):
+    @c
+    def slow(x):
+        time.sleep(0.05)
+        return x
+
+    with mock.patch.object(Cache, "_record_compute") as record:
+        assert slow.map([dict(x=i) for i in range(4)], max_workers=1) == [0, 1, 2, 3]
+    seconds = [call.args[1] for call in record.call_args_list]
+    # Each call's own time, not the time since the batch started
+    assert len(seconds) == 4 and all(0.05 <= s < 0.1 for s in seconds)
+
+
+@pytest.mark.asyncio
+async def test_async_map(c: Cache):
+    @c
+    async def add(a, b=1):
+        return a + b
+
+    assert await add.map([dict(a=i) for i in range(3)], max_workers=2) == [1, 2, 3]
+    assert len(add.list_cached_data()) == 3
@@ -0,0 +1,121 @@
+import time
+from unittest import mock
+
+import pytest
+
+from deche.core import Cache
+from deche.memory import MISSING
+from deche.memory import MemoryTier
+
+
+def test_memory_tier_lru_eviction():
+    tier = MemoryTier(max_entries=2)
+    tier.put("a", 1, nbytes=1)
+    tier.put("b", 2, nbytes=1)
+    assert tier.get("a") == 1
+    tier.put("c", 3, nbytes=1)
+    assert tier.get("b") is MISSING
+    assert tier.get("a") == 1
+    assert tier.get("c") == 3
+
+
+def test_memory_tier_max_bytes():
+    tier = MemoryTier(max_bytes=10)
+    tier.put("a", 1, nbytes=6)
+    tier.put("b", 2, nbytes=6)
+    assert "a" not in tier
+    assert tier.nbytes == 6
+    tier.put("c", 3, nbytes=11)
+    assert "c" not in tier
+    assert len(tier) == 1
+
+
+def test_memory_tier_expiry():
+    tier = MemoryTier(max_entries=10)
+    tier.put("a", 1, nbytes=1, expires_at=time.time() - 1)
+    assert tier.get("a") is MISSING
+    assert tier.nbytes == 0
+
+
+def test_memory_tier_skips_backend(c: Cache):
+    @c.replace(memory_tier_max_entries=10)
+    def add(a, b):
+        return a + b
+
+    assert add(1, 2) == 3
+    with mock.patch.object(Cache, "read") as mock_read, mock.patch.object(Cache, "valid") as mock_valid:
+        assert add(1, 2) == 3
+    assert not mock_read.called
+    assert not mock_valid.called
+
+
+def test_memory_tier_isolates_callers(c: Cache):
+    @c.replace(memory_tier_max_entries=10)
+    def make(a):
+        return [a]
+
+    make(1).append("mutated")
+    hit = make(1)
+    assert hit == [1]
+    hit.append("mutated")
+    assert make(1) == [1]
+
+
+def test_memory_tier_populated_on_load(c: Cache):
+    @c
+    def add(a, b):
+        return a + b
+
+    add(1, 2)
+
+    @c.replace(memory_tier_max_entries=10)
+    def add(a, b):  # noqa: F811
+        return a + b
+
+    assert len(add.deche._memory_tier) == 0
+    assert add(1, 2) == 3
+    assert len(add.deche._memory_tier) == 1
+
+
+def test_memory_tier_cached_exception(c: Cache):
+    @c.replace(memory_tier_max_entries=10)
+    def divide(n):
+        return 1 / n
+
+    with pytest.raises(ZeroDivisionError):
+        divide(0)
+    with mock.patch.object(Cache, "read") as mock_read:
+        with pytest.raises(ZeroDivisionError):
+            divide(0)
+    assert not mock_read.called
+
+
+def test_memory_tier_remove(c: Cache):
+    calls = []
+
+    @c.replace(memory_tier_max_entries=10)
+    def add(a, b):
+        calls.append((a, b))
+        return a + b
+
+    add(1, 2)
+    add.remove_cached_data(kwargs=dict(a=1, b=2))
+    add(1, 2)
+    assert len(calls) == 2
+
+
+def test_memory_tier_ttl(tmp_path):
+    c = Cache(fs_protocol="file", prefix=str(tmp_path), cache_ttl=0.1, memory_tier_max_entries=10)
+    calls = []
+
+    @c
+    def add(a, b):
+        calls.append((a, b))
+        return a + b
+
+    add(1, 2)
+    add(1, 2)
+    assert len(calls) == 1
+    time.sleep(0.11)
+    add(1, 2)
+    assert len(calls) == 2
@@ -0,0 +1,123 @@
+import urllib.request
+from collections import Counter
+
+import pytest
+
+from deche.core import Cache
+from deche.metrics import REGISTRY
+from deche.metrics import Registry
+from deche.metrics import prometheus_text
+from deche.metrics import start_http_server
+
+
+@pytest.fixture(autouse=True)
+def clear_registry():
+    REGISTRY.clear()
+    yield
+    REGISTRY.clear()
+
+
+def test_hits_and_misses(c: Cache):
+    @c
+    def inc(x):
+        return x + 1
+
+    assert inc(1) == inc(1) == inc(1) == 2
+    assert inc(2) == 3
+    stats = inc.stats()
+    assert (stats["hits"], stats["misses"]) == (2, 2)
+    assert stats["hit_rate"] == 0.5
+    assert stats["bytes_written"] > 0 and stats["bytes_read"] > 0
+    assert stats["compute_seconds"]["count"] == 2
+    assert stats["serialize_seconds"]["count"] >= 2
+    assert stats["deserialize_seconds"]["count"] == 2
+
+    inc.stats(reset=True)
+    assert inc.stats()["hits"] == 0
+
+
+def test_exception_hits(c: Cache):
+    @c
+    def fail(x):
+        raise ValueError(x)
+
+    for _ in range(3):
+        with pytest.raises(ValueError):
+            fail(1)
+    stats = fail.stats()
+    assert (stats["hits"], stats["exception_hits"], stats["misses"]) == (0, 2, 1)
+
+
+def test_map_metrics(c: Cache):
+    @c
+    def inc(x):
+        return x + 1
+
+    inc(1)
+    assert inc.map([dict(x=1), dict(x=2), dict(x=3)]) == [2, 3, 4]
+    stats = inc.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 3)
+
+
+def test_memory_hits(c: Cache):
+    @c.replace(memory_tier_max_entries=10)
+    def inc(x):
+        return x + 1
+
+    assert inc(1) == inc(1) == 2
+    stats = inc.stats()
+    assert stats["memory_hits"] == 1 and stats["hits"] == 1
+
+
+def test_exporter_and_disabled(c: Cache):
+    exported = []
+
+    @c.replace(metrics_exporter=lambda function, metric, value: exported.append((function, metric)))
+    def inc(x):
+        return x + 1
+
+    inc(1), inc(1)
+    assert {function for function, _ in exported} == {inc.path()}
+    # Each observation is exported exactly once; the miss writes both the output and its inputs
+    assert Counter(metric for _, metric in exported) == {
+        "misses": 1,
+        "compute_seconds": 1,
+        "serialize_seconds": 1,
+        "write_seconds": 2,
+        "bytes_written": 2,
+        "hits": 1,
+        "read_seconds": 1,
+        "bytes_read": 1,
+        "deserialize_seconds": 1,
+        "compute_seconds_saved": 1,
+    }
+
+    @c.replace(metrics=False)
+    def dec(x):
+        return x - 1
+
+    dec(1), dec(1)
+    assert dec.stats()["hits"] == 0
+
+
+def test_prometheus_text():
+    registry = Registry()
+    registry.get('prefix/module.f"n').incr("hits", 3)
+    registry.get('prefix/module.f"n').observe("read_seconds", 0.002)
+    text = prometheus_text(registry)
+    assert '# TYPE deche_hits_total counter\ndeche_hits_total{function="prefix/module.f\\"n"} 3' in text
+    assert 'deche_read_seconds_bucket{function="prefix/module.f\\"n",le="0.001"} 0' in text
+    assert 'deche_read_seconds_bucket{function="prefix/module.f\\"n",le="+Inf"} 1' in text
+    assert 'deche_read_seconds_count{function="prefix/module.f\\"n"} 1' in text
+
+
+def test_http_server():
+    registry = Registry()
+    registry.get("f").incr("misses")
+    server = start_http_server(0, addr="127.0.0.1", registry=registry)
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.server_address[1]}/metrics") as response:
+            body = response.read().decode()
+    finally:
+        server.shutdown()
+    assert 'deche_misses_total{function="f"} 1' in body
@@ -0,0 +1,222 @@
+import asyncio
+import os
+import threading
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from deche.core import DEFAULT_DESERIALIZER
+from deche.core import DEFAULT_SERIALIZER
+from deche.core import Cache
+from deche.core import CacheExpiryMode
+from deche.serializers import ArrowStreamSerializer
+from deche.serializers import OffloadedSerializer
+from deche.serializers import PickleStreamSerializer
+from deche.serializers import ZeroCopyPickleSerializer
+from deche.serializers import _process_pool
+from deche.serializers import payload_nbytes
+
+
+@pytest.fixture()
+def stream_cache(tmp_path):
+    return Cache(fs_protocol="file", prefix=str(tmp_path), output_stream_serializer=PickleStreamSerializer())
+
+
+def test_pickle_stream_roundtrip():
+    serializer = PickleStreamSerializer()
+    value = {"a": np.arange(10), "b": "x"}
+    result = serializer.loads(serializer.dumps(value))
+    assert result["b"] == "x"
+    assert (result["a"] == value["a"]).all()
+
+
+def test_arrow_stream_roundtrip():
+    serializer = ArrowStreamSerializer()
+    df = pd.DataFrame({"a": [1, 2, 3], "b": ["x", "y", "z"]})
+    pd.testing.assert_frame_equal(serializer.loads(serializer.dumps(df)), df)
+    table = pa.table({"a": [1, 2]})
+    assert serializer.loads(serializer.dumps(table)).equals(table)
+
+
+def test_stream_serializer_hit_does_not_read_bytes(stream_cache: Cache):
+    calls = []
+
+    @stream_cache
+    def make(n):
+        calls.append(n)
+        return np.arange(n)
+
+    assert (make(10) == np.arange(10)).all()
+    with mock.patch.object(Cache, "read") as mock_read:
+        assert (make(10) == np.arange(10)).all()
+    assert not mock_read.called
+    assert len(calls) == 1
+    assert make.load_cached_inputs(kwargs=dict(n=10)) == dict(n=10)
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        dict(memory_tier_max_entries=10),
+        dict(optimistic_reads=True, cache_ttl=60),
+        dict(cache_ttl=60, cache_expiry_mode=CacheExpiryMode.APPEND),
+    ],
+)
+def test_stream_serializer_options(stream_cache: Cache, options):
+    calls = []
+
+    @stream_cache.replace(**options)
+    def make(n):
+        calls.append(n)
+        if n < 0:
+            raise ValueError(n)
+        return list(range(n))
+
+    assert make(3) == make(3) == [0, 1, 2]
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            make(-1)
+    assert make.map([dict(n=3), dict(n=4)]) == [[0, 1, 2], [0, 1, 2, 3]]
+    assert calls == [3, -1, 4]
+
+
+@pytest.mark.asyncio
+async def test_stream_serializer_async(stream_cache: Cache):
+    @stream_cache
+    async def make(n):
+        return list(range(n))
+
+    assert await make(3) == await make(3) == [0, 1, 2]
+
+
+def test_stream_serializer_peak_memory(stream_cache: Cache):
+    arr = np.random.rand(1_000_000)
+    path = f"{stream_cache.prefix}/array"
+    tracemalloc.start()
+    try:
+        stream_cache.write_output(path=path, output=arr)
+        _, write_peak = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        result = stream_cache.read_output(path=path)
+        _, read_peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert (result == arr).all()
+    assert write_peak < 0.5 * arr.nbytes
+    assert read_peak < 1.5 * arr.nbytes
+
+
+def test_zero_copy_pickle_roundtrip():
+    serializer = ZeroCopyPickleSerializer()
+    value = {"a": np.arange(10), "b": np.ones((3, 3)).T, "df": pd.DataFrame({"x": [1.0, 2.0]}), "c": "x"}
+    data = serializer.dumps(value)
+
+    result = serializer.loads(data)
+    assert result["a"].flags.writeable
+    assert (result["a"] == value["a"]).all() and (result["b"] == value["b"]).all() and result["c"] == "x"
+    pd.testing.assert_frame_equal(result["df"], value["df"])
+
+    buffer = memoryview(data)
+    result = serializer.load_buffer(buffer)
+    assert (result["a"] == value["a"]).all()
+    assert not result["a"].flags.writeable
+    assert np.shares_memory(result["a"], np.frombuffer(buffer, dtype=np.uint8))
+
+
+@pytest.mark.parametrize("protocol", ["file", "memory"])
+def test_zero_copy_reads(tmp_path, protocol):
+    prefix = str(tmp_path) if protocol == "file" else "/zero-copy"
+    c = Cache(fs_protocol=protocol, prefix=prefix, zero_copy_reads=True)
+    assert isinstance(c.output_stream_serializer, ZeroCopyPickleSerializer)
+    calls = []
+
+    @c
+    def make(n):
+        calls.append(n)
+        return np.arange(n)
+
+    assert make(1000).flags.writeable
+    first = make(1000)
+    assert not first.flags.writeable
+    assert (first == np.arange(1000)).all()
+    assert len(calls) == 1
+
+    # Rewriting a cached file must not invalidate arrays still mapped from it
+    c.write_output(path=f"{make.path()}/{make.tokenize(1000)}", output=np.zeros(10))
+    assert first.sum() == np.arange(1000).sum()
+    assert (make(1000) == np.zeros(10)).all()
+    assert not [f for f in c.fs.ls(make.path(), detail=False) if f.endswith(".tmp")]
+
+
+def test_zero_copy_arrow(tmp_path):
+    c = Cache(
+        fs_protocol="file", prefix=str(tmp_path), zero_copy_reads=True, output_stream_serializer=ArrowStreamSerializer()
+    )
+
+    @c
+    def make(n):
+        return pa.table({"a": np.arange(n)})
+
+    assert make(10).equals(make(10))
+
+
+def test_payload_nbytes():
+    assert payload_nbytes(b"abc") == 3
+    assert payload_nbytes(np.zeros(10)) == 80
+    assert payload_nbytes(pd.DataFrame({"a": np.zeros(10)})) >= 80
+    assert payload_nbytes(pa.table({"a": np.zeros(10)})) == 80
+    assert payload_nbytes([1, 2, 3]) == 0
+
+
+def test_offloaded_serializer():
+    pid = OffloadedSerializer(lambda value: os.getpid(), threshold=100)
+    assert pid(b"small") == os.getpid()
+    assert pid(np.zeros(100)) != os.getpid()
+    # Workers are spawned rather than forked from a process with threads running
+    assert _process_pool()._mp_context.get_start_method() == "spawn"
+
+    with ThreadPoolExecutor(1) as executor:
+        serializer = OffloadedSerializer(DEFAULT_SERIALIZER, executor=executor, threshold=100)
+        deserializer = OffloadedSerializer(DEFAULT_DESERIALIZER, executor=executor, threshold=100)
+        c = Cache(fs_protocol="memory", output_serializer=serializer, output_deserializer=deserializer)
+
+        @c
+        def make(n):
+            return np.arange(n)
+
+        assert (make(1000) == make(1000)).all() and (make(1) == np.arange(1)).all()
+
+
+@pytest.mark.asyncio
+async def test_offloaded_serializer_is_awaited():
+    # Serializing waits on the event loop, so would deadlock if it blocked the loop (or ran outside the executor)
+    started, loop_ran = threading.Event(), asyncio.Event()
+
+    def serialize(value):
+        started.set()
+        assert threading.current_thread().name.startswith("offload")
+        return DEFAULT_SERIALIZER(value)
+
+    with ThreadPoolExecutor(1, thread_name_prefix="offload") as executor:
+        serializer = OffloadedSerializer(serialize, executor=executor, threshold=100)
+        deserializer = OffloadedSerializer(DEFAULT_DESERIALIZER, executor=executor, threshold=100)
+        c = Cache(fs_protocol="memory", output_serializer=serializer, output_deserializer=deserializer)
+
+        @c
+        async def make(n):
+            return np.arange(n)
+
+        async def while_serializing():
+            while not started.is_set():
+                await asyncio.sleep(0.001)
+            loop_ran.set()
+
+        with mock.patch.object(OffloadedSerializer, "__call__", side_effect=AssertionError("blocked on the executor")):
+            values, _ = await asyncio.gather(make(1000), while_serializing())
+            assert loop_ran.is_set() and (values == np.arange(1000)).all()
+            assert (await make(1000) == np.arange(1000)).all()
@@ -0,0 +1,101 @@
+import time
+from unittest import mock
+
+import pytest
+
+from deche.core import Cache
+from deche.core import CacheExpiryMode
+from deche.sweep import main
+from deche.sweep import sweep
+
+
+@pytest.fixture()
+def append_cache(tmp_path):
+    return Cache(fs_protocol="file", prefix=str(tmp_path), cache_ttl=60, cache_expiry_mode=CacheExpiryMode.APPEND)
+
+
+def make_versions(cache: Cache, n=3):
+    @cache
+    def add(a, b):
+        return a + b
+
+    path = f"{add.path()}/{add.tokenize(1, 2)}"
+    add(1, 2)
+    for _ in range(n - 1):
+        time.sleep(0.001)
+        cache.write_output(path=path, output=3)
+    return add
+
+
+def test_sweep_old_versions(append_cache: Cache):
+    add = make_versions(append_cache)
+    # Listing works under directories containing "-<digits>", i.e. pytest's tmp_path
+    assert add.list_cached_data() == [add.tokenize(1, 2)]
+    assert len(append_cache.fs.ls(add.path())) == 5
+
+    report = add.sweep(keep_versions=1)
+    assert len(report.old_versions) == 2 and not report.expired and not report.orphaned_inputs
+    assert report.nbytes > 0 and not report.removed
+    assert len(append_cache.fs.ls(add.path())) == 5
+
+    report = add.sweep(keep_versions=1, dry_run=False)
+    assert report.removed
+    assert len(append_cache.fs.ls(add.path())) == 3
+    assert add(1, 2) == 3
+
+
+def test_sweep_expired_and_orphans(append_cache: Cache):
+    add = make_versions(append_cache)
+    with pytest.raises(TypeError):
+        add(1, None)
+    later = time.time() + 3600 * 2
+    report = sweep(append_cache.fs, append_cache.prefix, cache_ttl=60, now=later)
+    assert len(report.expired) == 4
+    # Inputs of the expired call are orphaned, those of the cached exception are not
+    assert report.orphaned_inputs == [f"{add.path()}/{add.tokenize(1, 2)}.inputs"]
+
+    report = sweep(append_cache.fs, append_cache.prefix, cache_ttl=60, now=later, orphan_min_age=later)
+    assert not report.orphaned_inputs
+
+
+def test_sweep_cli(append_cache: Cache, capsys):
+    add = make_versions(append_cache)
+    main([f"file://{append_cache.prefix}", "--keep-versions", "0", "-v"])
+    assert "Would remove 3 files" in capsys.readouterr().out
+    main([f"file://{append_cache.prefix}", "--keep-versions", "0", "--delete"])
+    assert "Removed 3 files" in capsys.readouterr().out
+    assert sorted(append_cache.fs.ls(add.path(), detail=False)) == sorted(
+        f"{add.path()}/{add.tokenize(1, 2)}{ext}" for ext in ("", ".inputs")
+    )
+
+
+def test_remove_all_batched(c: Cache):
+    @c
+    def invert(n):
+        return 1 / n
+
+    for _ in range(2):
+        with pytest.raises(ZeroDivisionError):
+            invert(0)
+        with pytest.raises(ZeroDivisionError):
+            invert(0.0)
+        with mock.patch.object(c.fs, "rm", wraps=c.fs.rm) as mock_rm:
+            invert.remove_all_cached_exceptions()
+        assert mock_rm.call_count == 1
+        assert invert.list_cached_exceptions() == []
+
+
+@pytest.mark.parametrize("shard_depth", [0, 1])
+def test_sweep_records_manifest_removals(tmp_path, shard_depth):
+    cache = Cache(fs_protocol="file", prefix=str(tmp_path), cache_ttl=60, manifest=True, shard_depth=shard_depth)
+
+    @cache
+    def add(a, b):
+        return a + b
+
+    add(1, 2), add(2, 3)
+    assert len(add.list_cached_data()) == 2
+    report = sweep(cache.fs, cache.prefix, cache_ttl=60, now=time.time() + 3600 * 2, dry_run=False)
+    assert len(report.expired) == 2 and len(report.orphaned_inputs) == 2
+    assert add.list_cached_data() == [] and add.list_cached_inputs() == []
+    assert not add.has_data(kwargs=dict(a=1, b=2))
@@ -0,0 +1,115 @@
+import os
+import threading
+import time
+from unittest import mock
+
+import pytest
+
+from deche.core import Cache
+from deche.tiers import Tier
+from deche.tiers import WritePolicy
+
+
+def tiered(c: Cache, tmp_path, *names, **kwargs) -> Cache:
+    return c.replace(tiers=[Tier(prefix=str(tmp_path / name)) for name in names], **kwargs)
+
+
+def in_tier(cache: Cache, func, tier: int, x, ext="") -> bool:
+    tier = cache._tiers[tier]
+    return tier.fs.exists(f"{cache._tier_path(tier, func.path())}/{func.tokenize(x)}{ext}")
+
+
+def test_write_through(c: Cache, tmp_path, define, calls):
+    cache = tiered(c, tmp_path, "disk")
+    inc = define(cache)
+    assert inc(1) == 2
+    assert in_tier(cache, inc, 0, 1) and in_tier(cache, inc, 0, 1, ext=".inputs")
+    assert inc.has_data(kwargs=dict(x=1))
+
+    # Served from the tier, without touching the store
+    with mock.patch.object(cache.fs, "cat_file", wraps=cache.fs.cat_file) as mock_cat_file:
+        assert inc(1) == 2
+    mock_cat_file.assert_not_called()
+    assert calls == [1]
+
+
+def test_promotion(c: Cache, tmp_path, define, calls):
+    inc = define(c)
+    assert inc(1) == 2
+    with pytest.raises(ValueError):
+        inc(-1)
+
+    cache = tiered(c, tmp_path, "fast", "slow")
+    inc = define(cache)
+    assert inc(1) == 2
+    assert in_tier(cache, inc, 0, 1) and in_tier(cache, inc, 1, 1)
+    with pytest.raises(ValueError):
+        inc(-1)
+    assert in_tier(cache, inc, 0, -1, ext=".exc")
+
+    # A hit in the slower tier is copied into the faster one
+    cache._tiers[0].fs.rm(str(tmp_path / "fast"), recursive=True)
+    assert inc.map([dict(x=1), dict(x=2)]) == [2, 3]
+    assert in_tier(cache, inc, 0, 1) and in_tier(cache, inc, 0, 2)
+    assert calls == [1, -1, 2]
+
+
+def test_promotion_keeps_mtime(tmp_path, define, calls):
+    store = Cache(fs_protocol="file", prefix=str(tmp_path / "store"), cache_ttl=60)
+    inc = define(store)
+    inc(1)
+    stored = f"{inc.path()}/{inc.tokenize(1)}"
+    os.utime(stored, (time.time() - 30, time.time() - 30))
+
+    cache = tiered(store, tmp_path, "disk")
+    inc = define(cache)
+    assert inc(1) == 2
+    copied = f"{cache._tier_path(cache._tiers[0], inc.path())}/{inc.tokenize(1)}"
+    assert os.stat(copied).st_mtime == os.stat(stored).st_mtime
+    assert calls == [1]
+
+
+def test_remove(c: Cache, tmp_path, define, calls):
+    cache = tiered(c, tmp_path, "disk", memory_tier_max_entries=10)
+    inc = define(cache)
+    inc(1), inc(2)
+    inc.remove_cached_data(kwargs=dict(x=1))
+    assert not in_tier(cache, inc, 0, 1)
+    assert inc(1) == 2
+    cache._remove_paths([f"{inc.path()}/{inc.tokenize(2)}"])
+    assert not in_tier(cache, inc, 0, 2)
+    assert calls == [1, 2, 1]
+
+
+def test_write_back(c: Cache, tmp_path, define, calls):
+    cache = tiered(c, tmp_path, "disk", tier_write_policy=WritePolicy.BACK)
+    inc = define(cache)
+    release, write_store = threading.Event(), cache._write_store
+
+    def slow_write_store(*args):
+        release.wait(5)
+        return write_store(*args)
+
+    with mock.patch.object(cache, "_write_store", side_effect=slow_write_store):
+        start = time.perf_counter()
+        assert inc(1) == 2
+        assert time.perf_counter() - start < 1
+        assert in_tier(cache, inc, 0, 1) and not inc.has_data(kwargs=dict(x=1))
+        assert inc(1) == 2
+        release.set()
+        cache.flush()
+    assert inc.has_data(kwargs=dict(x=1)) and calls == [1]
+
+
+@pytest.mark.asyncio
+async def test_async(c: Cache, tmp_path):
+    calls = []
+
+    @tiered(c, tmp_path, "disk")
+    async def ainc(x):
+        calls.append(x)
+        return x + 1
+
+    assert await ainc(1) == await ainc(1) == 2
+    assert calls == [1]
+    assert ainc.has_data(kwargs=dict(x=1))